@@ -0,0 +1,149 @@
+"""
+Cluster-first routing report: solve corpus instances (benchmarks/route_corpus.py)
+with /optimize mode "cluster" and with a monolithic baseline, and print the
+per-partition solve times and the total cost of both.
+
+The monolithic baseline is route-first, cluster-second: one tour over every
+bin with the single-truck solver, cut into consecutive truckloads, each trip
+starting at the container like the cluster routes do. Keep the comparison to
+sizes where one tour over every bin is still tractable.
+
+Usage (from smartTrash_API/):
+    python -m benchmarks.cluster_report
+    python -m benchmarks.cluster_report --sizes 1000 2000 --trucks 6 --method sweep --time-budget 4
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from benchmarks.route_corpus import LAYOUTS, make_instance
+
+RESULTS_DIR = "generated_files/benchmarks"
+
+
+def fleet_instance(layout, size, trucks, seed):
+    """Corpus instance whose truck holds about 1 / trucks of the total waste."""
+    instance = make_instance(layout, size, 1.0, seed)
+    container = instance["container"]
+    container["volume"] = round(container["volume"] / trucks, 2)
+    container["weight"] = round(container["weight"] / trucks, 2)
+    return instance
+
+
+def monolithic(instance, time_budget):
+    """One tour over all bins, then cut into consecutive truckloads (open trips from the container)."""
+    from services.distance_matrix import DistanceMatrix
+    from services.fleet_routing import bin_load
+    from services.rotage import optimize_waste_collection
+
+    container = instance["container"]
+    bins = json.loads(json.dumps(instance["bins"]))
+    request = {
+        "container": {**container, "volume": float("inf"), "weight": float("inf")},
+        "bins": bins,
+        "time_budget": time_budget,
+    }
+    started_at = time.perf_counter()
+    ordered_bins, _, _, _, _ = optimize_waste_collection(request)
+    index = {b["name"]: i + 1 for i, b in enumerate(bins)}
+    matrix = DistanceMatrix([container] + bins).matrix
+
+    trips, trip, load = [], [], np.zeros(2)
+    capacity = np.array([container["volume"], container["weight"]])
+    for b in ordered_bins:
+        volume_weight = np.array(bin_load(b))
+        if trip and (load + volume_weight > capacity).any():
+            trips.append(trip)
+            trip, load = [], np.zeros(2)
+        trip.append(index[b["name"]])
+        load += volume_weight
+    if trip:
+        trips.append(trip)
+    total_distance = sum(matrix[0, trip[0]] + sum(matrix[a, b] for a, b in zip(trip, trip[1:])) for trip in trips)
+    return {
+        "time_s": round(time.perf_counter() - started_at, 4),
+        "trips": len(trips),
+        "collected": len(ordered_bins),
+        "total_distance": round(float(total_distance), 4),
+    }
+
+
+def clustered(instance, time_budget, method):
+    from services.rotage import optimize_waste_collection
+
+    request = json.loads(json.dumps({k: instance[k] for k in ("container", "bins")}))
+    request.update({"mode": "cluster", "cluster_method": method, "time_budget": time_budget})
+    started_at = time.perf_counter()
+    ordered_bins, _, _, total_distance, stats = optimize_waste_collection(request)
+    return {
+        "time_s": round(time.perf_counter() - started_at, 4),
+        "partition_time_s": stats["partition_time_s"],
+        "pool_start_s": stats["pool_start_s"],
+        "budget_overshoot_s": stats["budget_overshoot_s"],
+        "partitions": [
+            {"bins": route["bins"], "collected": len(route["ordered_bins"]),
+             "solve_time_s": route["solve_time_s"], "total_distance": round(route["total_distance"], 4)}
+            for route in stats["routes"]
+        ],
+        "collected": len(ordered_bins),
+        "total_distance": round(float(total_distance), 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cluster-first routing report")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[500, 1000, 2000])
+    parser.add_argument("--layouts", nargs="+", default=LAYOUTS, choices=LAYOUTS)
+    parser.add_argument("--trucks", type=int, default=4, help="truckloads in the total waste")
+    parser.add_argument("--method", default="kmeans", choices=["kmeans", "sweep"])
+    parser.add_argument("--time-budget", type=float, default=2.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--skip-monolithic", action="store_true", help="cluster mode only, for city-scale sizes")
+    parser.add_argument("--out")
+    args = parser.parse_args()
+
+    from services.cluster_routing import shutdown_cluster_pool, warm_cluster_pool
+    from services.distance_cache import set_cache_directory
+
+    set_cache_directory(None)  # keep benchmark points out of the on-disk distance cache
+    report = {}
+    try:
+        # Like the API at startup (CLUSTER_WARMUP_ON_STARTUP): worker spawn is not part of a request
+        print(f"Partition workers started in {warm_cluster_pool():.3f} s")
+        for size in args.sizes:
+            for layout in args.layouts:
+                instance = fleet_instance(layout, size, args.trucks, args.seed)
+                name = f"{layout}-{size}-t{args.trucks}-s{args.seed}"
+                cluster = clustered(instance, args.time_budget, args.method)
+                base = None if args.skip_monolithic else monolithic(instance, args.time_budget)
+                report[name] = {"cluster": cluster, "monolithic": base}
+
+                print(f"\n{name}: {len(cluster['partitions'])} partitions in {cluster['partition_time_s']:.3f} s")
+                for p, partition in enumerate(cluster["partitions"]):
+                    print(f"  partition {p:3d} {partition['collected']:5d}/{partition['bins']:<5d} bins | "
+                          f"{partition['solve_time_s']:7.3f} s | {partition['total_distance']:9.3f} km")
+                line = f"  cluster    {cluster['time_s']:7.3f} s | {cluster['total_distance']:9.3f} km | " \
+                       f"{cluster['collected']} bins | pool start {cluster['pool_start_s']:.3f} s | " \
+                       f"over budget {cluster['budget_overshoot_s']:.3f} s"
+                if base:
+                    gap = 100 * (cluster["total_distance"] / base["total_distance"] - 1) \
+                        if base["total_distance"] else 0.0
+                    line += f"\n  monolithic {base['time_s']:7.3f} s | {base['total_distance']:9.3f} km | " \
+                            f"{base['collected']} bins in {base['trips']} trips | cluster cost {gap:+.2f}%"
+                print(line)
+    finally:
+        shutdown_cluster_pool()
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    out = args.out or os.path.join(RESULTS_DIR, f"cluster_{args.method}.json")
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump({"trucks": args.trucks, "method": args.method, "time_budget": args.time_budget,
+                   "results": report}, f, indent=2)
+    print(f"\nReport written to {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Notification delivery throughput, offline: a burst of bins crossing the
+full/gas thresholds goes through NotificationService with the in-process
+FakeTransport (simulated FCM round-trip latency), sent either
+- "per-message": one round-trip per alert (previous messaging.send behaviour)
+- "batched": queued and flushed in send_each batches of FCM_BATCH_SIZE
+- "dispatcher": submitted to the async NotificationDispatcher (worker pool,
+  per-topic rate limit disabled so only delivery throughput is measured)
+
+Usage (from smartTrash_API/):
+    python -m benchmarks.notification_benchmark
+    python -m benchmarks.notification_benchmark --bins 5000 --latency 0.08 --gas-ratio 0.2
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import time
+
+import numpy as np
+
+from others.models import TrashData
+from services.notification_dispatcher import NotificationDispatcher
+from services.notification_service import NotificationService
+from services.notification_transport import FakeTransport
+from utils.constants import FCM_BATCH_SIZE, TRASH_FULL_THRESHOLD
+
+
+def alert_burst(count, gas_ratio, seed=0):
+    """Bins that are all over the full threshold, a share of them with a dangerous gas level too."""
+    rng = np.random.default_rng(seed)
+    return [
+        TrashData(
+            bin_id=f"bin_{i}",
+            name=f"Bin {i}",
+            trash_level=float(rng.uniform(TRASH_FULL_THRESHOLD, 100)),
+            gaz_level=float(rng.uniform(14, 20) if rng.random() < gas_ratio else rng.uniform(0, 4)),
+            humidity=float(rng.uniform(20, 80)),
+            temperature=float(rng.uniform(10, 35)),
+            location={"latitude": 36.8 + float(rng.random()) * 0.1, "longitude": 10.1 + float(rng.random()) * 0.1},
+            trash_type="plastic",
+            weight=float(rng.uniform(1, 40)),
+        )
+        for i in range(count)
+    ]
+
+
+async def run_dispatcher(bins, transport):
+    dispatcher = NotificationDispatcher(transport, topic_rate=float("inf"), topic_burst=len(bins) * 3)
+    service = NotificationService(db_mongo=None, transport=transport, dispatcher=dispatcher)
+    await dispatcher.start()
+    for bin_data in bins:
+        service._process_bin_data(bin_data.bin_id, bin_data)
+    metrics = dispatcher.metrics()
+    while metrics["queue_depth"] or metrics["in_flight"] or metrics["retry_pending"]:
+        await asyncio.sleep(0.005)
+        metrics = dispatcher.metrics()
+    await dispatcher.stop()
+
+
+def run(bins, mode, latency, per_message, batch_size):
+    # Baseline: one messaging.send per message, i.e. a round-trip per message
+    transport = FakeTransport(latency=latency, per_message=per_message,
+                              batch_size=1 if mode == "per-message" else batch_size)
+    started_at = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):  # one log line per message otherwise
+        if mode == "dispatcher":
+            asyncio.run(run_dispatcher(bins, transport))
+        else:
+            service = NotificationService(db_mongo=None, transport=transport)
+            for bin_data in bins:
+                service._process_bin_data(bin_data.bin_id, bin_data)  # batches of 1 are sent as they are queued
+            service.flush()
+    elapsed = time.perf_counter() - started_at
+    return {
+        "messages": len(transport.sent),
+        "round_trips": transport.calls,
+        "time_s": elapsed,
+        "messages_per_s": len(transport.sent) / elapsed if elapsed else float("inf"),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Notification delivery throughput with a fake FCM transport")
+    parser.add_argument("--bins", type=int, default=1000, help="bins crossing the threshold in one pass")
+    parser.add_argument("--gas-ratio", type=float, default=0.1, help="share of bins with a gas alert as well")
+    parser.add_argument("--latency", type=float, default=0.05, help="simulated seconds per FCM round-trip")
+    parser.add_argument("--per-message", type=float, default=0.0002, help="simulated seconds per message in a batch")
+    parser.add_argument("--batch-size", type=int, default=FCM_BATCH_SIZE)
+    args = parser.parse_args()
+
+    bins = alert_burst(args.bins, args.gas_ratio)
+    print(f"{args.bins} bins, {args.latency * 1000:.0f} ms per round-trip, batches of {args.batch_size}\n")
+    results = {}
+    for mode in ("per-message", "batched", "dispatcher"):
+        r = results[mode] = run(bins, mode, args.latency, args.per_message, args.batch_size)
+        print(f"{mode:12s} {r['messages']:6d} messages | {r['round_trips']:6d} round-trips | "
+              f"{r['time_s']:8.3f} s | {r['messages_per_s']:10.1f} msg/s")
+    speedup = results["per-message"]["time_s"] / results["batched"]["time_s"]
+    print(f"\nbatched is x{speedup:.1f} faster")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""
+Compare the classifier preprocessing paths on large phone-sized photos:
+- "torchvision": full decode + convert("RGB") + transforms (previous path)
+- "fast": draft-mode JPEG decode + resize + normalisation into a preallocated tensor
+
+Reports per-image latency and peak memory (each method runs in its own
+process so peak RSS is not shared), plus the mean pixel difference between
+the two outputs.
+
+Usage (from smartTrash_API/):
+    python -m benchmarks.preprocess_benchmark
+    python -m benchmarks.preprocess_benchmark --images path/to/photos --runs 5
+"""
+import argparse
+import io
+import multiprocessing
+import os
+import resource
+import time
+
+import numpy as np
+from PIL import Image
+
+PHOTO_SIZE = (4032, 3024)  # 12 MP
+
+
+def synthetic_photos(count, size=PHOTO_SIZE, seed=0):
+    """Smooth gradients plus noise, closer to a photo than pure noise once JPEG-encoded."""
+    rng = np.random.default_rng(seed)
+    width, height = size
+    photos = []
+    for _ in range(count):
+        x = np.linspace(0, 1, width, dtype=np.float32)
+        y = np.linspace(0, 1, height, dtype=np.float32)[:, None]
+        base = np.stack([x * y, (1 - x) * y, x * (1 - y)], axis=-1) * rng.uniform(120, 255, 3)
+        noise = rng.normal(0, 12, (height, width, 3))
+        image = Image.fromarray(np.clip(base + noise, 0, 255).astype(np.uint8), "RGB")
+        buffer = io.BytesIO()
+        image.save(buffer, "JPEG", quality=90)
+        photos.append(buffer.getvalue())
+    return photos
+
+
+def load_photos(directory):
+    photos = []
+    for name in sorted(os.listdir(directory)):
+        if name.lower().endswith((".jpg", ".jpeg", ".png")):
+            with open(os.path.join(directory, name), "rb") as f:
+                photos.append(f.read())
+    return photos
+
+
+def reset_peak_rss():
+    """Reset the kernel peak RSS counter (Linux only) so the peak only covers preprocessing."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def max_rss_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # ru_maxrss is in KB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def current_rss_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return max_rss_mb()
+
+
+def run_method(method, photos, runs, queue):
+    import torch
+    from torchvision import transforms
+    from predictions.prediction_type import decode_image, normalize_into
+
+    torch.set_num_threads(1)
+    transform = transforms.Compose([
+        transforms.Resize((224, 224)),
+        transforms.ToTensor(),
+        transforms.Normalize([0.5] * 3, [0.5] * 3),
+    ])
+    buffer = torch.empty((1, 3, 224, 224))
+
+    def torchvision_path(data):
+        image = Image.open(io.BytesIO(data)).convert("RGB")
+        return transform(image).unsqueeze(0)
+
+    def fast_path(data):
+        return normalize_into([decode_image(data)], buffer).clone()
+
+    prepare = torchvision_path if method == "torchvision" else fast_path
+    prepare(photos[0])  # warm-up outside the measurement
+    reset_peak_rss()
+    baseline_rss = current_rss_mb()
+    latencies = []
+    outputs = []
+    for run in range(runs):
+        for data in photos:
+            started_at = time.perf_counter()
+            tensor = prepare(data)
+            latencies.append((time.perf_counter() - started_at) * 1000)
+            if run == 0:
+                outputs.append(tensor.numpy())
+    queue.put({
+        "method": method,
+        "mean_ms": float(np.mean(latencies)),
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "peak_rss_increase_mb": max_rss_mb() - baseline_rss,
+        "outputs": outputs,
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark classifier image preprocessing")
+    parser.add_argument("--images", help="directory of photos (default: synthetic 12 MP JPEGs)")
+    parser.add_argument("--count", type=int, default=8, help="number of synthetic photos")
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    photos = load_photos(args.images) if args.images else synthetic_photos(args.count)
+    if not photos:
+        print("No photos to benchmark")
+        return
+    print(f"{len(photos)} photos, mean size {np.mean([len(p) for p in photos]) / 1e6:.2f} MB")
+
+    context = multiprocessing.get_context("spawn")
+    results = {}
+    for method in ("torchvision", "fast"):
+        queue = context.Queue()
+        process = context.Process(target=run_method, args=(method, photos, args.runs, queue))
+        process.start()
+        results[method] = queue.get()
+        process.join()
+
+    for method, r in results.items():
+        print(f"{method:12s} mean {r['mean_ms']:8.2f} ms | p50 {r['p50_ms']:8.2f} ms | "
+              f"p95 {r['p95_ms']:8.2f} ms | peak RSS +{r['peak_rss_increase_mb']:.1f} MB")
+    speedup = results["torchvision"]["mean_ms"] / results["fast"]["mean_ms"]
+    diff = np.mean([
+        np.abs(a - b).mean()
+        for a, b in zip(results["torchvision"]["outputs"], results["fast"]["outputs"])
+    ])
+    print(f"speedup x{speedup:.2f} | mean abs difference of normalised pixels {diff:.4f} (range [-1, 1])")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+"""
+Compare int8 quantised models with the fp32 weights in weights_pth/.
+
+Reports per model: latency (mean/p50/p95), runtime memory (resident memory
+added by loading the model and peak RSS increase while predicting; each
+precision runs in its own process so they do not share the heap), serialized
+state_dict size and output drift against fp32, so quantisation can be
+enabled per model in utils/constants.QUANTIZATION with evidence.
+
+Usage (from smartTrash_API/):
+    python -m benchmarks.quantization_eval
+    python -m benchmarks.quantization_eval --model ht --samples 8 --runs 3
+    python -m benchmarks.quantization_eval --model trash_type --mode static --images path/to/images
+"""
+import argparse
+import io
+import json
+import multiprocessing
+import time
+
+import numpy as np
+import pandas as pd
+import torch
+
+from benchmarks.preprocess_benchmark import current_rss_mb, max_rss_mb, reset_peak_rss
+from utils.constants import INFERENCE_TORCH_THREADS, TYPE_CALIBRATION_DIR, TYPE_MODEL_PATH
+
+
+def state_dict_mb(model):
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+    return buffer.getbuffer().nbytes / 1e6
+
+
+def time_calls(fn, inputs, runs):
+    """Run fn on every input `runs` times; return (outputs of the last run, latencies in ms)."""
+    latencies = []
+    outputs = []
+    for _ in range(runs):
+        outputs = []
+        for x in inputs:
+            started_at = time.perf_counter()
+            outputs.append(fn(x))
+            latencies.append((time.perf_counter() - started_at) * 1000)
+    return outputs, latencies
+
+
+def latency_summary(latencies):
+    return {
+        "mean_ms": round(float(np.mean(latencies)), 3),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 3),
+    }
+
+
+def drift_summary(reference, candidate):
+    diff = np.abs(np.asarray(reference, dtype=float) - np.asarray(candidate, dtype=float))
+    return {
+        "mean_abs_diff": round(float(diff.mean()), 4),
+        "max_abs_diff": round(float(diff.max()), 4),
+    }
+
+
+def make_inputs(name, samples, rng, images_dir):
+    """Picklable inputs, shared by both precisions."""
+    if name == "level":
+        from predictions import predictionLvl
+        # Plausible sequences: heights decreasing as the bin fills
+        return [
+            list(np.sort(predictionLvl.scaler.inverse_transform(rng.random((predictionLvl.n_input, 1))).flatten())[::-1])
+            for _ in range(samples)
+        ]
+    if name == "ht":
+        inputs = []
+        for _ in range(samples):
+            start = pd.Timestamp("2025-06-01") + pd.Timedelta(hours=int(rng.integers(0, 24 * 180)))
+            inputs.append(pd.DataFrame({
+                "time": pd.date_range(start, periods=7, freq="h"),
+                "temp": rng.uniform(10, 40, 7),
+                "rhum": rng.uniform(30, 90, 7),
+            }))
+        return inputs
+    from predictions.quantization import list_calibration_images
+    images = list_calibration_images(images_dir, limit=samples)
+    if images:
+        return images
+    print(f"No images in '{images_dir}', using random inputs (top-1 agreement is not meaningful)")
+    return [rng.uniform(-1, 1, (1, 3, 224, 224)).astype(np.float32) for _ in range(samples)]
+
+
+def load(name, quantization):
+    """(torch module, predict(input), prepare(input)) for one model at one precision."""
+    if name == "level":
+        from predictions import predictionLvl
+        model = predictionLvl.load_model(quantization)
+
+        def predict(heights):
+            return predictionLvl.predict_next_height(heights, model, predictionLvl.scaler, predictionLvl.n_input)
+
+        return model, predict, lambda x: x
+
+    if name == "ht":
+        from predictions.predictionTH import load_weather_model
+        model = load_weather_model(7, quantization)
+
+        def predict(df):
+            # One day ahead keeps the evaluation short; drift compounds the same way over 7 days
+            return model.predict_next_days(df, n_days=1)
+
+        return model, predict, lambda x: x
+
+    from predictions.prediction_type import TypePredictionmodel
+    classifier = TypePredictionmodel(TYPE_MODEL_PATH, quantization=quantization)
+
+    def predict(image):
+        with torch.no_grad():
+            return torch.softmax(classifier.model(image), dim=1).numpy()[0]
+
+    def prepare(x):
+        return classifier.prepare_image(x) if isinstance(x, str) else torch.from_numpy(x)
+
+    return classifier.model, predict, prepare
+
+
+def run_precision(name, quantization, inputs, runs, queue):
+    """Child process: load one model at one precision, then time its predictions."""
+    try:
+        torch.set_num_threads(INFERENCE_TORCH_THREADS)  # same setting as the API
+        if name == "level":
+            from predictions import predictionLvl  # noqa: F401 -- loads weights at import, keep that out of the delta
+        before_load = current_rss_mb()
+        model, predict, prepare = load(name, quantization)
+        load_rss = current_rss_mb() - before_load
+        prepared = [prepare(x) for x in inputs]
+        predict(prepared[0])  # warm-up outside the measurement
+        reset_peak_rss()
+        before_predict = current_rss_mb()
+        outputs, latencies = time_calls(predict, prepared, runs)
+        queue.put({
+            "load_rss_mb": round(load_rss, 1),
+            "peak_predict_rss_mb": round(max_rss_mb() - before_predict, 1),
+            "state_dict_mb": round(state_dict_mb(model), 3),
+            **latency_summary(latencies),
+            "outputs": [np.asarray(o, dtype=float) for o in outputs],
+        })
+    except Exception as e:
+        queue.put({"error": str(e)})
+
+
+def evaluate(name, mode, samples, runs, rng, images_dir):
+    inputs = make_inputs(name, samples, rng, images_dir)
+    context = multiprocessing.get_context("spawn")
+    result = {"model": name, "samples": len(inputs)}
+    for precision, quantization in (("fp32", None), ("int8", mode)):
+        queue = context.Queue()
+        process = context.Process(target=run_precision, args=(name, quantization, inputs, runs, queue))
+        process.start()
+        result[precision] = queue.get()
+        process.join()
+        if "error" in result[precision]:
+            raise RuntimeError(f"{precision}: {result[precision]['error']}")
+    fp32_out, int8_out = result["fp32"].pop("outputs"), result["int8"].pop("outputs")
+    result["drift"] = drift_summary(fp32_out, int8_out)
+    if name == "trash_type":
+        agreement = np.mean([np.argmax(a) == np.argmax(b) for a, b in zip(fp32_out, int8_out)])
+        result["drift"]["top1_agreement"] = round(float(agreement), 4)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate int8 quantisation against fp32 weights")
+    parser.add_argument("--model", choices=["level", "ht", "trash_type", "all"], default="all")
+    parser.add_argument("--mode", choices=["dynamic", "static"], default="dynamic",
+                        help="quantisation mode (static only applies to trash_type)")
+    parser.add_argument("--samples", type=int, default=16)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--images", default=TYPE_CALIBRATION_DIR, help="images for the classifier")
+    parser.add_argument("--output", help="write the results as JSON")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    models = ["level", "ht", "trash_type"] if args.model == "all" else [args.model]
+    results = []
+    for name in models:
+        mode = args.mode if name == "trash_type" else "dynamic"
+        try:
+            results.append(evaluate(name, mode, args.samples, args.runs, rng, args.images))
+        except Exception as e:
+            print(f"Evaluation failed for '{name}': {e}")
+
+    for r in results:
+        print(f"\n=== {r['model']} ({r['samples']} samples) ===")
+        for precision in ("fp32", "int8"):
+            stats = r[precision]
+            print(f"{precision}: load RSS +{stats['load_rss_mb']} MB | predict peak RSS +{stats['peak_predict_rss_mb']} MB | "
+                  f"state_dict {stats['state_dict_mb']} MB | mean {stats['mean_ms']} ms | "
+                  f"p50 {stats['p50_ms']} ms | p95 {stats['p95_ms']} ms")
+        speedup = r["fp32"]["mean_ms"] / r["int8"]["mean_ms"] if r["int8"]["mean_ms"] else float("nan")
+        print(f"speedup x{speedup:.2f} | drift {r['drift']}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
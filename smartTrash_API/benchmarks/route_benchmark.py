@@ -0,0 +1,208 @@
+"""
+Route optimisation benchmark: solve the synthetic corpus (benchmarks/route_corpus.py)
+with the optimiser of the current tree and record, per instance, the solve
+time, tour length, capacity utilisation, collected value and the gap to the
+best known solution. Two result files (e.g. before/after a change to
+services/rotage.py) can then be compared.
+
+Usage (from smartTrash_API/):
+    python -m benchmarks.route_benchmark run --label before
+    git checkout my-branch
+    python -m benchmarks.route_benchmark run --label after --update-best
+    python -m benchmarks.route_benchmark compare generated_files/benchmarks/before.json \\
+        generated_files/benchmarks/after.json
+
+    # quicker subset
+    python -m benchmarks.route_benchmark run --label quick --sizes 10 50 100 --ratios 0.6
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from benchmarks.route_corpus import CAPACITY_RATIOS, LAYOUTS, SIZES, generate_corpus
+
+RESULTS_DIR = "generated_files/benchmarks"
+BEST_KNOWN_PATH = "benchmarks/best_known.json"
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except Exception:
+        return None
+
+
+def load_json(path, default=None):
+    if not os.path.exists(path):
+        return default
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def collected_value(bins):
+    """Priority value of the collected bins, with the same weights as the selection."""
+    from services.bin_selection import bin_values
+
+    return float(bin_values(bins)[0].sum()) if bins else 0.0
+
+
+def solve_instance(instance, time_budget, repeats):
+    from services.rotage import optimize_waste_collection
+
+    runs = []
+    for _ in range(repeats):
+        request = json.loads(json.dumps({k: instance[k] for k in ("container", "bins")}))
+        request["time_budget"] = time_budget
+        started_at = time.perf_counter()
+        ordered_bins, total_volume, total_weight, total_distance, stats = optimize_waste_collection(request)
+        runs.append((time.perf_counter() - started_at, ordered_bins, total_volume, total_weight,
+                     total_distance, stats))
+    # Keep the median-time run
+    runs.sort(key=lambda run: run[0])
+    elapsed, ordered_bins, total_volume, total_weight, total_distance, stats = runs[len(runs) // 2]
+    container = instance["container"]
+    return {
+        "bins": len(instance["bins"]),
+        "selected": len(ordered_bins),
+        "time_s": round(elapsed, 4),
+        "distance_time_s": stats.get("distance_time_s"),
+        "solve_time_s": stats.get("solve_time_s"),
+        "timed_out": stats.get("timed_out", False),
+        "total_distance": round(float(total_distance), 4),
+        "value": round(collected_value(ordered_bins), 4),
+        "volume_utilisation": round(total_volume / container["volume"], 4) if container["volume"] else None,
+        "weight_utilisation": round(total_weight / container["weight"], 4) if container["weight"] else None,
+    }
+
+
+def add_gaps(results, best_known):
+    """Gap to the best known tour length and collected value, in percent (positive is worse)."""
+    for name, result in results.items():
+        best = best_known.get(name)
+        if not best:
+            result["distance_gap_pct"] = result["value_gap_pct"] = None
+            continue
+        result["distance_gap_pct"] = round(100 * (result["total_distance"] / best["total_distance"] - 1), 3) \
+            if best["total_distance"] else 0.0
+        result["value_gap_pct"] = round(100 * (1 - result["value"] / best["value"]), 3) if best["value"] else 0.0
+
+
+def update_best_known(results, best_known, label):
+    """
+    An instance's best known solution is replaced when a run collects at least
+    as much value with a shorter tour, or strictly more value.
+    """
+    updated = 0
+    for name, result in results.items():
+        best = best_known.get(name)
+        better = best is None or result["value"] > best["value"] + 1e-9 or (
+            result["value"] >= best["value"] - 1e-9 and result["total_distance"] < best["total_distance"] - 1e-9)
+        if better:
+            best_known[name] = {"total_distance": result["total_distance"], "value": result["value"],
+                                "source": label}
+            updated += 1
+    return updated
+
+
+def run(args):
+    from services.distance_cache import set_cache_directory
+
+    set_cache_directory(None)  # keep benchmark points out of the on-disk distance cache
+    corpus = generate_corpus(args.sizes, args.layouts, args.ratios, args.seeds)
+    best_known = load_json(args.best_known, {})
+    results = {}
+    for instance in corpus:
+        results[instance["name"]] = solve_instance(instance, args.time_budget, args.repeats)
+        r = results[instance["name"]]
+        print(f"{instance['name']:28s} {r['selected']:5d}/{r['bins']:<5d} bins | {r['time_s']:7.3f} s | "
+              f"{r['total_distance']:9.3f} km | volume {r['volume_utilisation']:.0%}")
+
+    if args.update_best:
+        updated = update_best_known(results, best_known, args.label)
+        with open(args.best_known, "w", encoding="utf-8") as f:
+            json.dump(best_known, f, indent=2, sort_keys=True)
+        print(f"{updated} best known solutions updated in {args.best_known}")
+    add_gaps(results, best_known)
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    out = args.out or os.path.join(RESULTS_DIR, f"{args.label}.json")
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump({
+            "label": args.label,
+            "commit": git_commit(),
+            "created_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "time_budget": args.time_budget,
+            "results": results,
+        }, f, indent=2)
+    print(f"Results written to {out}")
+
+
+def compare(args):
+    base, new = load_json(args.base), load_json(args.new)
+    names = [name for name in base["results"] if name in new["results"]]
+    if not names:
+        print("No instance in common")
+        return 1
+    print(f"base: {base['label']} ({base.get('commit')})  new: {new['label']} ({new.get('commit')})\n")
+    print(f"{'instance':28s} {'time base':>10s} {'time new':>10s} {'x':>6s} "
+          f"{'km base':>10s} {'km new':>10s} {'dist %':>8s} {'value %':>8s}")
+
+    time_ratios, distance_changes, regressions = [], [], []
+    for name in names:
+        b, n = base["results"][name], new["results"][name]
+        time_ratio = n["time_s"] / b["time_s"] if b["time_s"] else 1.0
+        distance_change = 100 * (n["total_distance"] / b["total_distance"] - 1) if b["total_distance"] else 0.0
+        value_change = 100 * (n["value"] / b["value"] - 1) if b["value"] else 0.0
+        time_ratios.append(time_ratio)
+        distance_changes.append(distance_change)
+        flag = ""
+        # Shorter routes that collect less are not an improvement
+        if value_change < -args.tolerance or (value_change <= args.tolerance and distance_change > args.tolerance):
+            regressions.append(name)
+            flag = "  <- worse"
+        print(f"{name:28s} {b['time_s']:10.3f} {n['time_s']:10.3f} {time_ratio:6.2f} "
+              f"{b['total_distance']:10.3f} {n['total_distance']:10.3f} {distance_change:+8.2f} "
+              f"{value_change:+8.2f}{flag}")
+
+    print(f"\n{len(names)} instances | time x{np.exp(np.mean(np.log(time_ratios))):.2f} (geometric mean) | "
+          f"distance {np.mean(distance_changes):+.2f}% (mean) | {len(regressions)} quality regressions "
+          f"beyond {args.tolerance}%")
+    return 1 if regressions and args.fail_on_regression else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Route optimisation benchmark")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="solve the corpus and record results")
+    run_parser.add_argument("--label", required=True)
+    run_parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    run_parser.add_argument("--layouts", nargs="+", default=LAYOUTS, choices=LAYOUTS)
+    run_parser.add_argument("--ratios", type=float, nargs="+", default=CAPACITY_RATIOS)
+    run_parser.add_argument("--seeds", type=int, nargs="+", default=[0])
+    run_parser.add_argument("--time-budget", type=float, default=2.0)
+    run_parser.add_argument("--repeats", type=int, default=1, help="runs per instance, the median time is kept")
+    run_parser.add_argument("--best-known", default=BEST_KNOWN_PATH)
+    run_parser.add_argument("--update-best", action="store_true", help="record better solutions as best known")
+    run_parser.add_argument("--out")
+
+    compare_parser = commands.add_parser("compare", help="compare two result files")
+    compare_parser.add_argument("base")
+    compare_parser.add_argument("new")
+    compare_parser.add_argument("--tolerance", type=float, default=0.5, help="allowed quality change in percent")
+    compare_parser.add_argument("--fail-on-regression", action="store_true")
+
+    args = parser.parse_args()
+    if args.command == "run":
+        run(args)
+    else:
+        sys.exit(compare(args))
+
+
+if __name__ == "__main__":
+    main()
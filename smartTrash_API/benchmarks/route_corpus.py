@@ -0,0 +1,99 @@
+"""
+Reproducible synthetic route optimisation instances.
+
+Each instance is a /optimize request body (container + bins) named
+"<layout>-<bins>-r<capacity ratio>-s<seed>", for example "clustered-500-r0.6-s0":
+- layout "uniform": bins spread evenly over a ~10 km city square
+- layout "clustered": bins grouped around neighbourhood centres
+- capacity ratio: truck capacity as a fraction of the total waste to collect
+  (below 1 the optimiser has to choose bins, above 1 everything fits)
+
+Usage (from smartTrash_API/):
+    python -m benchmarks.route_corpus --out generated_files/route_corpus.json
+"""
+import argparse
+import json
+import zlib
+
+import numpy as np
+
+CITY_CENTER = (36.8065, 10.1815)
+CITY_SPAN = 0.09  # degrees, about 10 km
+CLUSTER_SPREAD = 0.004  # degrees, about 400 m
+BIN_VOLUMES = [120, 240, 360, 660, 1100]  # standard wheelie bin and container sizes (litres)
+
+SIZES = [10, 50, 100, 250, 500, 1000, 2000, 5000]
+LAYOUTS = ["uniform", "clustered"]
+CAPACITY_RATIOS = [0.3, 0.6, 1.1]
+
+
+def instance_name(layout, size, ratio, seed):
+    return f"{layout}-{size}-r{ratio}-s{seed}"
+
+
+def make_instance(layout, size, ratio, seed=0):
+    """One instance; the same arguments always give the same bins."""
+    name = instance_name(layout, size, ratio, seed)
+    rng = np.random.default_rng(zlib.crc32(name.encode()))
+    lat0 = CITY_CENTER[0] - CITY_SPAN / 2
+    lon0 = CITY_CENTER[1] - CITY_SPAN / 2
+
+    if layout == "uniform":
+        points = rng.random((size, 2)) * CITY_SPAN
+    elif layout == "clustered":
+        centers = rng.random((max(2, size // 50), 2)) * CITY_SPAN
+        labels = rng.integers(0, len(centers), size)
+        points = centers[labels] + rng.normal(0, CLUSTER_SPREAD, (size, 2))
+        points = np.clip(points, 0, CITY_SPAN)
+    else:
+        raise ValueError(f"Unknown layout '{layout}'")
+
+    fill = rng.uniform(10, 100, size)
+    volumes = rng.choice(BIN_VOLUMES, size)
+    weights = volumes * rng.uniform(0.1, 0.3, size)  # kg, depends on the waste density
+    bins = [
+        {
+            "name": f"bin_{i}",
+            "location": {"latitude": float(lat0 + lat), "longitude": float(lon0 + lon)},
+            "capacity": round(float(fill[i]), 2),
+            "volume": float(volumes[i]),
+            "weight": round(float(weights[i]), 2),
+        }
+        for i, (lat, lon) in enumerate(points)
+    ]
+
+    demand_volume = float((volumes * fill / 100).sum())
+    demand_weight = float((weights * fill / 100).sum())
+    depot = rng.random(2) * CITY_SPAN
+    container = {
+        "name": "truck",
+        "location": {"latitude": float(lat0 + depot[0]), "longitude": float(lon0 + depot[1])},
+        "volume": round(demand_volume * ratio, 2),
+        "weight": round(demand_weight * ratio, 2),
+    }
+    return {"name": name, "container": container, "bins": bins}
+
+
+def generate_corpus(sizes=SIZES, layouts=LAYOUTS, ratios=CAPACITY_RATIOS, seeds=(0,)):
+    return [
+        make_instance(layout, size, ratio, seed)
+        for seed in seeds for size in sizes for layout in layouts for ratio in ratios
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write the synthetic route corpus as JSON")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--layouts", nargs="+", default=LAYOUTS, choices=LAYOUTS)
+    parser.add_argument("--ratios", type=float, nargs="+", default=CAPACITY_RATIOS)
+    parser.add_argument("--seeds", type=int, nargs="+", default=[0])
+    parser.add_argument("--out", default="generated_files/route_corpus.json")
+    args = parser.parse_args()
+    corpus = generate_corpus(args.sizes, args.layouts, args.ratios, args.seeds)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(corpus, f)
+    print(f"{len(corpus)} instances written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+"""
+Admin command: build the road graph used by DISTANCE_METHOD = "road" from a
+local OpenStreetMap extract (needs pyosmium: pip install osmium).
+
+Usage (from smartTrash_API/):
+    python -m others.build_road_graph path/to/extract.osm.pbf
+    python -m others.build_road_graph path/to/extract.osm.pbf --out statics/road_graph.npz
+"""
+import argparse
+
+from services.road_network import build_graph_from_pbf
+from utils.constants import ROAD_GRAPH_PATH
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the CSR road graph from an OSM extract")
+    parser.add_argument("pbf", help="OSM extract (.osm.pbf)")
+    parser.add_argument("--out", default=ROAD_GRAPH_PATH)
+    args = parser.parse_args()
+    stats = build_graph_from_pbf(args.pbf, args.out)
+    print(f"Road graph saved to {args.out}: {stats['nodes']} nodes, {stats['edges']} edges")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,10 @@
+import threading
 from pymongo import MongoClient
 from datetime import datetime, timedelta
 from typing import Dict, Any, List
 import pandas as pd
 from collections import deque
+from utils.constants import RECENT_WINDOW_SIZE
 
 class MongoDB:
     def __init__(self):
@@ -15,12 +17,32 @@ class MongoDB:
             # Collections
             self.bins_history = self.db['bins_history']
             self.bins_current = self.db['bins_current']
+            self.bins_recent = self.db['bins_recent']
+            self.predictions = self.db['predictions']
+            self.forecast_accuracy = self.db['forecast_accuracy']
+            self.notification_dead_letters = self.db['notification_dead_letters']
+            self.shared_state = self.db['shared_state']
+            self.leases = self.db['leases']
+            self.alert_state = self.db['alert_state']
+            self.report_jobs = self.db['report_jobs']
+            self.route_jobs = self.db['route_jobs']
             
             # Create indexes for better query performance
             self.bins_history.create_index([("bin_id", 1), ("timestamp", 1)])
             self.bins_history.create_index([("trash_type", 1)])
             self.bins_history.create_index([("trash_level", 1)])
             self.bins_current.create_index([("bin_id", 1)], unique=True)
+            self.bins_current.create_index([("geo", "2dsphere")])
+            self.bins_current.create_index([("location.latitude", 1), ("location.longitude", 1)])
+            self.bins_recent.create_index([("bin_id", 1)], unique=True)
+            self.predictions.create_index([("model", 1), ("bin_id", 1), ("run_time", -1)])
+            self.predictions.create_index([("evaluated", 1), ("horizon_end", 1)])
+            self.forecast_accuracy.create_index(
+                [("model", 1), ("model_version", 1), ("bin_id", 1), ("field", 1)], unique=True
+            )
+            self.notification_dead_letters.create_index([("failed_at", -1)])
+            self.report_jobs.create_index([("finished_at", 1)])
+            self.route_jobs.create_index([("finished_at", 1), ("updated_at", 1)])
             print("Successfully connected to MongoDB")
             
         except Exception as e:
@@ -42,13 +64,78 @@ class MongoDB:
         # Store in history
         self.bins_history.insert_one(history_doc)
         
-        # Update current state
+        # Update current state (with a GeoJSON point for the 2dsphere index)
+        current = {'timestamp': timestamp, **data}
+        geo = self._geo_point(data.get('location'))
+        if geo is not None:
+            current['geo'] = geo
         self.bins_current.update_one(
             {'bin_id': bin_id},
-            {'$set': {'timestamp': timestamp, **data}},
+            {'$set': current},
             upsert=True
         )
+
+        # Keep a fixed-length window of the latest readings for predictor warm start
+        self.bins_recent.update_one(
+            {'bin_id': bin_id},
+            {'$push': {'readings': {
+                '$each': [self._recent_reading(history_doc)],
+                '$slice': -RECENT_WINDOW_SIZE
+            }}},
+            upsert=True
+        )
+
+    @staticmethod
+    def _geo_point(location: Any):
+        if not isinstance(location, dict) or location.get('latitude') is None or location.get('longitude') is None:
+            return None
+        return {'type': 'Point', 'coordinates': [float(location['longitude']), float(location['latitude'])]}
+
+    @staticmethod
+    def _recent_reading(doc: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            'timestamp': doc.get('timestamp'),
+            'temperature': doc.get('temperature'),
+            'humidity': doc.get('humidity'),
+            'trash_level': doc.get('trash_level'),
+        }
+
+    def get_recent_readings(self) -> Dict[str, List[Dict[str, Any]]]:
+        """Return the last readings of each bin from bins_recent, in chronological order."""
+        return {
+            doc['bin_id']: doc.get('readings', [])
+            for doc in self.bins_recent.find({}, {'_id': 0, 'bin_id': 1, 'readings': 1})
+        }
+
+    def rebuild_bins_recent(self) -> int:
+        """
+        Rebuild bins_recent from bins_history.
+        Uses the (bin_id, timestamp) index to read only the last readings of each bin.
+        Returns the number of bins rebuilt.
+        """
+        bin_ids = self.bins_history.distinct('bin_id')
+        for bin_id in bin_ids:
+            cursor = self.bins_history.find(
+                {'bin_id': bin_id},
+                {'_id': 0, 'timestamp': 1, 'temperature': 1, 'humidity': 1, 'trash_level': 1}
+            ).sort('timestamp', -1).limit(RECENT_WINDOW_SIZE)
+            readings = [self._recent_reading(doc) for doc in reversed(list(cursor))]
+            self.bins_recent.update_one(
+                {'bin_id': bin_id},
+                {'$set': {'readings': readings}},
+                upsert=True
+            )
+        self.bins_recent.delete_many({'bin_id': {'$nin': bin_ids}})
+        return len(bin_ids)
     
+    def ensure_bins_recent(self) -> int:
+        """Rebuild bins_recent when it is empty but history exists (first start after deploy)."""
+        if self.bins_recent.find_one({}, {'_id': 1}) is not None:
+            return 0
+        if self.bins_history.find_one({}, {'_id': 1}) is None:
+            return 0
+        return self.rebuild_bins_recent()
+
     def get_large_dataset(self, pipeline):
         """Use MongoDB aggregation for large datasets"""
         return self.db.bins_history.aggregate(pipeline, allowDiskUse=True)
@@ -58,27 +145,9 @@ class MongoDB:
         Return last 7 records of temperature and humidity for each bin as a DataFrame:
         columns: ['time', 'temp', 'rhum']
         """
-        pipeline = [
-            {"$sort": {"bin_id": 1, "timestamp": -1}},
-            {"$group": {
-                "_id": "$bin_id",
-                "records": {
-                    "$push": {
-                        "timestamp": "$timestamp",
-                        "temperature": "$temperature",
-                        "humidity": "$humidity"
-                    }
-                }
-            }},
-            {"$project": {
-                "records": {"$slice": ["$records", 7]}
-            }}
-        ]
-        results = list(self.bins_history.aggregate(pipeline))
         bins = {}
-        for doc in results:
-            bin_id = doc["_id"]
-            records = list(reversed(doc["records"]))  # chronological order
+        for bin_id, readings in self.get_recent_readings().items():
+            records = readings[-7:]  # already in chronological order
             # Build DataFrame with required columns and rename
             df = pd.DataFrame(records)
             if not df.empty:
@@ -96,4 +165,92 @@ class MongoDB:
         """
         Return all historical bin data as a list of dicts.
         """
-        return list(self.bins_history.find({}, {'_id': 0}))
\ No newline at end of file
+        return list(self.bins_history.find({}, {'_id': 0}))
+
+    def history_fingerprint(self) -> str:
+        """Cheap identifier of the current history content: document count and newest _id."""
+        latest = self.bins_history.find_one({}, {'_id': 1}, sort=[('_id', -1)])
+        return f"{self.bins_history.estimated_document_count()}-{latest['_id'] if latest else 'empty'}"
+
+    def backfill_geo(self) -> int:
+        """Add the GeoJSON point to bins_current documents stored before it existed."""
+        result = self.bins_current.update_many(
+            {'geo': {'$exists': False}, 'location.latitude': {'$type': 'number'}, 'location.longitude': {'$type': 'number'}},
+            [{'$set': {'geo': {'type': 'Point', 'coordinates': ['$location.longitude', '$location.latitude']}}}]
+        )
+        return result.modified_count
+
+    def get_bin_locations(self) -> List[Dict[str, Any]]:
+        """Location and a few display fields of every bin, for the in-memory spatial index."""
+        cursor = self.bins_current.find(
+            {'location': {'$exists': True}},
+            {'_id': 0, 'bin_id': 1, 'location': 1, 'name': 1, 'trash_level': 1, 'trash_type': 1}
+        )
+        return [spatial_entry(doc['bin_id'], doc) for doc in cursor]
+
+    def find_bins_near(self, latitude: float, longitude: float, k: int = None,
+                       radius_km: float = None) -> List[Dict[str, Any]]:
+        """Nearest bins from the 2dsphere index, closest first (distance_km added)."""
+        geo_near = {
+            'near': {'type': 'Point', 'coordinates': [longitude, latitude]},
+            'distanceField': 'distance_m',
+            'key': 'geo',
+            'spherical': True,
+        }
+        if radius_km is not None:
+            geo_near['maxDistance'] = radius_km * 1000
+        pipeline = [{'$geoNear': geo_near}]
+        if k is not None:
+            pipeline.append({'$limit': k})
+        pipeline.append({'$project': {'_id': 0, 'bin_id': 1, 'location': 1, 'name': 1, 'trash_level': 1,
+                                      'trash_type': 1, 'distance_m': 1}})
+        return [
+            {**spatial_entry(doc['bin_id'], doc), 'distance_km': round(doc['distance_m'] / 1000, 4)}
+            for doc in self.bins_current.aggregate(pipeline)
+        ]
+
+    def find_bins_in_bbox(self, min_lat: float, min_lon: float, max_lat: float, max_lon: float,
+                          limit: int = None) -> List[Dict[str, Any]]:
+        """
+        Bins inside a latitude/longitude box (min_lon > max_lon crosses the antimeridian),
+        same semantics as BinSpatialIndex.bbox. Plain range queries on the stored
+        coordinates: GeoJSON polygon edges are geodesics, not lines of constant latitude.
+        """
+        if min_lon <= max_lon:
+            lon_filter = {'location.longitude': {'$gte': min_lon, '$lte': max_lon}}
+        else:
+            lon_filter = {'$or': [{'location.longitude': {'$gte': min_lon}},
+                                  {'location.longitude': {'$lte': max_lon}}]}
+        cursor = self.bins_current.find(
+            {'location.latitude': {'$gte': min_lat, '$lte': max_lat}, **lon_filter},
+            {'_id': 0, 'bin_id': 1, 'location': 1, 'name': 1, 'trash_level': 1, 'trash_type': 1}
+        )
+        if limit:
+            cursor = cursor.limit(limit)
+        return [spatial_entry(doc['bin_id'], doc) for doc in cursor]
+
+
+def spatial_entry(bin_id: str, doc: Dict[str, Any]) -> Dict[str, Any]:
+    """Flat bin record used by the spatial index and the /bins/nearby and /bins/bbox endpoints."""
+    location = doc.get('location') or {}
+    return {
+        'bin_id': bin_id,
+        'latitude': location.get('latitude'),
+        'longitude': location.get('longitude'),
+        'name': doc.get('name'),
+        'trash_level': doc.get('trash_level'),
+        'trash_type': doc.get('trash_type'),
+    }
+
+
+_shared_db = None
+_shared_db_lock = threading.Lock()
+
+
+def get_db_mongo() -> MongoDB:
+    """The process-wide MongoDB connection, shared by run.py, the routers and the services."""
+    global _shared_db
+    with _shared_db_lock:
+        if _shared_db is None:
+            _shared_db = MongoDB()
+        return _shared_db
@@ -40,11 +40,59 @@ class Container(BaseModel):
 class WasteCollectionRequest(BaseModel):
     container: Container
     bins: List[Bin]
+    time_budget: Optional[float] = None  # solver time budget in seconds
+    mode: str = "single"  # "single" (one route) or "cluster" (one route per geographic partition, solved in parallel)
+    partitions: Optional[int] = None  # cluster mode: number of partitions, defaults to total demand / truck capacity
+    cluster_method: Optional[str] = None  # cluster mode: "kmeans" or "sweep"
 
 class WasteCollectionResponse(BaseModel):
     ordered_bins: List[Dict]
     total_volume: float
     total_weight: float
+    total_distance: Optional[float] = None  # route length in km
+    solve_stats: Optional[Dict] = None
+    routes: Optional[List[Dict]] = None  # cluster mode: one route per partition
+
+class FleetCollectionRequest(BaseModel):
+    trucks: List[Container]
+    bins: List[Bin]
+    depot: Optional[BinLocation] = None  # start and end of every route, defaults to the first truck's location
+    time_budget: Optional[float] = None  # solver time budget in seconds
+
+class TruckRoute(BaseModel):
+    truck: str
+    ordered_bins: List[Dict]
+    total_volume: float
+    total_weight: float
+    total_distance: float  # closed route length in km
+
+class FleetCollectionResponse(BaseModel):
+    routes: List[TruckRoute]
+    unassigned_bins: List[Dict]  # bins no truck could take in this plan
+    total_distance: float
+    solve_stats: Optional[Dict] = None
+
+class InsertionRequest(BaseModel):
+    current_position: BinLocation  # where the truck is now
+    route: List[Bin]  # bins still to collect, in driving order
+    new_bins: List[Bin]  # bins that crossed the threshold during the run
+    remaining_volume: float  # truck capacity left now (before collecting `route`)
+    remaining_weight: float
+    repair: bool = True  # short local search after the insertions
+    time_budget: Optional[float] = None  # repair budget in seconds
+
+class InsertionResponse(BaseModel):
+    ordered_bins: List[Dict]
+    inserted: List[Dict]  # name, position in ordered_bins, added distance in that order, cost when first inserted
+    rejected: List[Dict]  # name, reason
+    total_distance: float
+    added_distance: float
+    solve_stats: Optional[Dict] = None
+
+class OptimizationJobRequest(BaseModel):
+    # exactly one of the two: a single-truck /optimize request or a /optimize/fleet request
+    route: Optional[WasteCollectionRequest] = None
+    fleet: Optional[FleetCollectionRequest] = None
 
 # Structure for storing gas information
 class GazInfo(BaseModel):
@@ -1,7 +1,7 @@
-# Shared state for prediction endpoints and background tasks
+# Shared state for prediction endpoints and background tasks.
+# Written by the leader worker's prediction loops, read by every API worker
+# (see others.shared_state.SharedSnapshot); run.py binds them to MongoDB.
+from others.shared_state import SharedSnapshot
 
-last_level_prediction = {}
-level_prediction_timestamp = {}
-
-last_ht_prediction = {}
-ht_prediction_timestamp = {}
\ No newline at end of file
+level_predictions = SharedSnapshot("level_prediction")
+ht_predictions = SharedSnapshot("ht_prediction")
@@ -0,0 +1,219 @@
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from pymongo import UpdateOne
+
+from utils.constants import LEVEL_PREDICTION_INTERVAL, MODEL_VERSIONS, QUANTIZATION
+from utils.helper import to_python_type
+
+
+def level_targets(run_time: datetime, prediction: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """The level model forecasts the next reading after one prediction interval."""
+    start = run_time + timedelta(seconds=LEVEL_PREDICTION_INTERVAL)
+    return [{
+        "field": "trash_level",
+        "agg": "first",
+        "start": start,
+        "end": start + timedelta(seconds=LEVEL_PREDICTION_INTERVAL),
+        "value": float(prediction["predicted_level"]),
+    }]
+
+
+def ht_targets(run_time: datetime, prediction: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """The HT model forecasts daily aggregates for the next 7 days."""
+    targets = []
+    series = [
+        ("avg_temp", "temperature", "mean"),
+        ("avg_rhum", "humidity", "mean"),
+        ("min_temp", "temperature", "min"),
+        ("max_temp", "temperature", "max"),
+    ]
+    for key, field, agg in series:
+        for day, value in enumerate(prediction.get(key, [])):
+            targets.append({
+                "field": key,
+                "source": field,
+                "agg": agg,
+                "start": run_time + timedelta(days=day),
+                "end": run_time + timedelta(days=day + 1),
+                "value": float(value),
+            })
+    return targets
+
+
+def model_version(model: str) -> str:
+    """Model version tag, including the quantisation setting."""
+    version = MODEL_VERSIONS.get(model, "unknown")
+    if QUANTIZATION.get(model):
+        version += f"-int8-{QUANTIZATION[model]}"
+    return version
+
+
+TARGET_BUILDERS = {
+    "level": level_targets,
+    "ht": ht_targets,
+}
+
+
+def aggregate(values: List[float], agg: str) -> Optional[float]:
+    if not values:
+        return None
+    if agg == "first":
+        return values[0]
+    if agg == "min":
+        return min(values)
+    if agg == "max":
+        return max(values)
+    return sum(values) / len(values)
+
+
+# --- Prediction Store ---
+class PredictionStore:
+    """
+    Persists every prediction run in the `predictions` collection, reloads the
+    latest ones at startup and tracks forecast accuracy once the real readings
+    have arrived.
+    """
+
+    def __init__(self, db_mongo):
+        self.db_mongo = db_mongo
+
+    def save_run(self, model: str, predictions: Dict[str, Any], run_time: datetime):
+        """Store one prediction run, one document per bin."""
+        if not predictions:
+            return
+        version = model_version(model)
+        build_targets = TARGET_BUILDERS[model]
+        docs = []
+        for bin_id, prediction in predictions.items():
+            prediction = to_python_type(prediction)
+            targets = build_targets(run_time, prediction)
+            docs.append({
+                "model": model,
+                "model_version": version,
+                "bin_id": bin_id,
+                "run_time": run_time,
+                "prediction": prediction,
+                "targets": targets,
+                "horizon_end": max(t["end"] for t in targets) if targets else run_time,
+                "evaluated": False,
+            })
+        self.db_mongo.predictions.insert_many(docs)
+
+    def load_latest(self, model: str) -> Dict[str, Dict[str, Any]]:
+        """Return {bin_id: {"prediction": ..., "run_time": ...}} for the last run of each bin."""
+        pipeline = [
+            {"$match": {"model": model}},
+            {"$sort": {"bin_id": 1, "run_time": -1}},
+            {"$group": {
+                "_id": "$bin_id",
+                "prediction": {"$first": "$prediction"},
+                "run_time": {"$first": "$run_time"},
+            }},
+        ]
+        return {
+            doc["_id"]: {"prediction": doc["prediction"], "run_time": doc["run_time"]}
+            for doc in self.db_mongo.predictions.aggregate(pipeline)
+        }
+
+    def evaluate_matured(self, now: Optional[datetime] = None) -> int:
+        """
+        Join forecasts whose horizon has passed with the readings stored in
+        bins_history and accumulate the errors in `forecast_accuracy`.
+        Returns the number of predictions evaluated.
+        """
+        now = now or datetime.now()
+        matured = self.db_mongo.predictions.find(
+            {"evaluated": False, "horizon_end": {"$lte": now}}
+        )
+        evaluated = 0
+        for doc in matured:
+            targets = doc.get("targets", [])
+            errors = []
+            if targets:
+                readings = list(self.db_mongo.bins_history.find(
+                    {
+                        "bin_id": doc["bin_id"],
+                        "timestamp": {
+                            "$gte": min(t["start"] for t in targets),
+                            "$lt": max(t["end"] for t in targets),
+                        },
+                    },
+                    {"_id": 0, "timestamp": 1, "trash_level": 1, "temperature": 1, "humidity": 1},
+                ).sort("timestamp", 1))
+                for target in targets:
+                    source = target.get("source", target["field"])
+                    values = [
+                        r[source] for r in readings
+                        if target["start"] <= r["timestamp"] < target["end"] and r.get(source) is not None
+                    ]
+                    actual = aggregate(values, target["agg"])
+                    if actual is not None:
+                        errors.append({"field": target["field"], "error": target["value"] - actual})
+
+            # Claim the prediction before accumulating, so it is never counted twice
+            claimed = self.db_mongo.predictions.update_one(
+                {"_id": doc["_id"], "evaluated": False},
+                {"$set": {"evaluated": True, "errors": errors}}
+            )
+            if claimed.modified_count != 1:
+                continue
+            self._accumulate(doc, errors)
+            evaluated += 1
+        return evaluated
+
+    def _accumulate(self, doc: Dict[str, Any], errors: List[Dict[str, Any]]):
+        operations = [
+            UpdateOne(
+                {
+                    "model": doc["model"],
+                    "model_version": doc["model_version"],
+                    "bin_id": doc["bin_id"],
+                    "field": e["field"],
+                },
+                {"$inc": {"count": 1, "sum_error": e["error"], "sum_abs_error": abs(e["error"])}},
+                upsert=True,
+            )
+            for e in errors
+        ]
+        if operations:
+            self.db_mongo.forecast_accuracy.bulk_write(operations, ordered=False)
+
+    def accuracy(self, model: Optional[str] = None, bin_id: Optional[str] = None) -> Dict[str, Any]:
+        """MAE and bias per bin and per model version."""
+        query = {}
+        if model:
+            query["model"] = model
+        if bin_id:
+            query["bin_id"] = bin_id
+        per_bin = []
+        per_model = {}
+        for doc in self.db_mongo.forecast_accuracy.find(query, {"_id": 0}):
+            count = doc["count"] or 1
+            per_bin.append({
+                "model": doc["model"],
+                "model_version": doc["model_version"],
+                "bin_id": doc["bin_id"],
+                "field": doc["field"],
+                "count": doc["count"],
+                "mae": doc["sum_abs_error"] / count,
+                "bias": doc["sum_error"] / count,
+            })
+            key = (doc["model"], doc["model_version"], doc["field"])
+            totals = per_model.setdefault(key, {"count": 0, "sum_error": 0.0, "sum_abs_error": 0.0})
+            totals["count"] += doc["count"]
+            totals["sum_error"] += doc["sum_error"]
+            totals["sum_abs_error"] += doc["sum_abs_error"]
+
+        models = [
+            {
+                "model": m,
+                "model_version": v,
+                "field": f,
+                "count": t["count"],
+                "mae": t["sum_abs_error"] / (t["count"] or 1),
+                "bias": t["sum_error"] / (t["count"] or 1),
+            }
+            for (m, v, f), t in per_model.items()
+        ]
+        return {"models": models, "bins": per_bin}
@@ -0,0 +1,17 @@
+"""
+Admin command: rebuild the bins_recent window from bins_history.
+
+Usage (from smartTrash_API/):
+    python -m others.rebuild_bins_recent
+"""
+from others.database import MongoDB
+
+
+def main():
+    db_mongo = MongoDB()
+    count = db_mongo.rebuild_bins_recent()
+    print(f"bins_recent rebuilt for {count} bins")
+
+
+if __name__ == "__main__":
+    main()
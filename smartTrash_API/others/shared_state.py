@@ -0,0 +1,156 @@
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Tuple
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from utils.constants import LEADER_LEASE_TTL, SHARED_STATE_REFRESH
+from utils.helper import to_python_type
+
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+
+# --- Shared Snapshot ---
+class SharedSnapshot:
+    """
+    A {key: value} mapping written by the leader worker and read by every
+    API worker. Backed by one document of the `shared_state` collection;
+    reads never touch MongoDB, every worker calls refresh() in a background
+    task (see run.py) every `refresh_interval` seconds. Without a collection
+    (no MongoDB) it is a plain in-process mapping.
+    """
+
+    def __init__(self, name: str, refresh_interval: float = SHARED_STATE_REFRESH):
+        self.name = name
+        self.refresh_interval = refresh_interval
+        self.collection = None
+        self._values = {}
+        self._timestamps = {}
+        self._version = 0
+        self._lock = threading.Lock()
+
+    def bind(self, collection):
+        self.collection = collection
+
+    def refresh(self) -> bool:
+        """Load the published snapshot if its version changed (blocking); returns whether it did."""
+        if self.collection is None:
+            return False
+        head = self.collection.find_one({"_id": self.name}, {"version": 1})
+        if head is None or head["version"] == self._version:
+            return False
+        doc = self.collection.find_one({"_id": self.name})
+        with self._lock:
+            if doc["version"] <= self._version:  # update() published a newer one meanwhile
+                return False
+            self._values = doc.get("values", {})
+            self._timestamps = doc.get("timestamps", {})
+            self._version = doc["version"]
+        return True
+
+    def get(self) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """(values, timestamps) as of the last refresh(); memory only. Treat both as read-only."""
+        with self._lock:
+            return self._values, self._timestamps
+
+    def values(self) -> Dict[str, Any]:
+        return self.get()[0]
+
+    def update(self, values: Dict[str, Any], timestamps: Dict[str, Any], replace: bool = False):
+        """Merge (or replace) entries and publish the new snapshot to the other workers."""
+        values, timestamps = to_python_type(values), to_python_type(timestamps)
+        with self._lock:
+            # New dicts rather than in-place updates, readers may still hold the previous ones
+            self._values = dict(values) if replace else {**self._values, **values}
+            self._timestamps = dict(timestamps) if replace else {**self._timestamps, **timestamps}
+            if self.collection is None:
+                self._version += 1
+                return
+            doc = self.collection.find_one_and_update(
+                {"_id": self.name},
+                {"$set": {"values": self._values, "timestamps": self._timestamps, "updated_at": datetime.now(),
+                          "writer": WORKER_ID},
+                 "$inc": {"version": 1}},
+                upsert=True, return_document=ReturnDocument.AFTER, projection={"version": 1},
+            )
+            self._version = doc["version"]
+
+
+# --- Leader Lease ---
+class LeaderLease:
+    """
+    Leader election between API workers with a lease document in the `leases`
+    collection: the holder renews it well before `ttl` runs out, any worker
+    takes it over once it has expired. Without a collection every process
+    is its own leader. Side effects should check holds(): is_leader alone
+    stays True while a blocked event loop lets the lease run out.
+    """
+
+    def __init__(self, name: str = "background", ttl: float = LEADER_LEASE_TTL, collection=None):
+        self.name = name
+        self.ttl = ttl
+        self.collection = collection
+        self.is_leader = False
+        self._valid_until = 0.0  # monotonic time the lease we hold runs out, counted from the request
+
+    def acquire(self) -> bool:
+        """Take or renew the lease; returns whether this worker is the leader."""
+        if self.collection is None:
+            self.is_leader = True
+            return True
+        requested_at = time.monotonic()
+        now = datetime.utcnow()
+        try:
+            self.collection.find_one_and_update(
+                {"_id": self.name, "$or": [{"holder": WORKER_ID}, {"expires_at": {"$lt": now}}]},
+                {"$set": {"holder": WORKER_ID, "expires_at": now + timedelta(seconds=self.ttl), "renewed_at": now}},
+                upsert=True,
+            )
+            self.is_leader = True
+            self._valid_until = requested_at + self.ttl
+        except DuplicateKeyError:  # the lease exists and another worker holds it
+            self.is_leader = False
+        return self.is_leader
+
+    def holds(self) -> bool:
+        """Whether the lease is ours and has not run out since the last renewal (no MongoDB call)."""
+        if self.collection is None:
+            return self.is_leader
+        return self.is_leader and time.monotonic() < self._valid_until
+
+    def release(self):
+        if self.collection is not None and self.is_leader:
+            self.collection.delete_one({"_id": self.name, "holder": WORKER_ID})
+        self.is_leader = False
+        self._valid_until = 0.0
+
+    def holder(self) -> Optional[Dict[str, Any]]:
+        if self.collection is None:
+            return {"holder": WORKER_ID}
+        return self.collection.find_one({"_id": self.name}, {"_id": 0})
+
+
+# --- Alert State Store ---
+class AlertStateStore:
+    """Per-bin alert state (active alerts and last levels), persisted so a new leader does not re-alert."""
+
+    def __init__(self, collection=None):
+        self.collection = collection
+
+    def load(self) -> Dict[str, Dict[str, Any]]:
+        if self.collection is None:
+            return {}
+        return {doc.pop("_id"): doc for doc in self.collection.find({})}
+
+    def save(self, bin_id: str, state: Dict[str, Any]):
+        if self.collection is None:
+            return
+        try:
+            self.collection.update_one({"_id": bin_id}, {"$set": state}, upsert=True)
+        except Exception as e:
+            print(f"Failed to store alert state for bin '{bin_id}': {e}")
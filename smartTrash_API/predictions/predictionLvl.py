@@ -3,6 +3,7 @@ import torch.nn as nn
 import joblib
 import numpy as np
 import pandas as pd
+from utils.constants import QUANTIZATION
 
 # Re-define the model class (must match exactly)
 class LSTMModel(nn.Module):
@@ -20,10 +21,18 @@ class LSTMModel(nn.Module):
         predictions = self.linear(lstm_out.view(len(input_seq), -1))
         return predictions[-1]
 
+def load_model(quantization=None):
+    """Load the fp32 weights, optionally with int8 dynamic quantisation."""
+    model = LSTMModel()
+    model.load_state_dict(torch.load('weights_pth/model.pth'))
+    model.eval()  # Set to evaluation mode
+    if quantization:
+        from predictions.quantization import quantize_dynamic_lstm
+        model = quantize_dynamic_lstm(model)
+    return model
+
 # Load the model
-model = LSTMModel()
-model.load_state_dict(torch.load('weights_pth/model.pth'))
-model.eval()  # Set to evaluation mode
+model = load_model(QUANTIZATION.get("level"))
 scaler = joblib.load('weights_pth/scaler.pkl')
 
 n_input = 14  # Same as before
@@ -55,10 +64,33 @@ def predict_next_height(latest_heights, model, scaler, n_input=14):
     predicted_height = prediction.numpy().reshape(-1, 1)[0][0] * 100.0
     return predicted_height
 
-def next_level(next_real_level = None):
+# Per-bin height history, seeded from the default sequence above
+bin_heights = {}
+
+def level_to_height(levels):
+    """Convert trash levels (%) to the heights the model was trained on."""
+    levels = np.array(levels, dtype=float).reshape(-1, 1) / 100.0
+    return scaler.inverse_transform(levels).flatten()
+
+def warm_start(recent_readings):
+    """
+    Seed per-bin histories from the bins_recent window.
+    recent_readings: {bin_id: [{"trash_level": ...}, ...]} in chronological order
+    """
+    for bin_id, readings in recent_readings.items():
+        levels = [r['trash_level'] for r in readings if r.get('trash_level') is not None]
+        history = deque(last_heights, maxlen=n_input)
+        if levels:
+            history.extend(level_to_height(levels[-n_input:]))
+        bin_heights[bin_id] = history
+
+def next_level(next_real_level = None, bin_id = None):
+    heights = last_heights
+    if bin_id is not None:
+        if bin_id not in bin_heights:
+            bin_heights[bin_id] = deque(last_heights, maxlen=n_input)
+        heights = bin_heights[bin_id]
     if next_real_level is not None:
-        next_real_height = scaler.inverse_transform(np.array(next_real_level/100.0).reshape(-1, 1))[0][0]
-        last_heights.append(next_real_height)
-    prediction = predict_next_height(list(last_heights), model, scaler)
+        heights.append(level_to_height([next_real_level])[0])
+    prediction = predict_next_height(list(heights), model, scaler)
     return prediction
-
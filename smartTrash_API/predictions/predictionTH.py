@@ -5,6 +5,7 @@ from sklearn.preprocessing import MinMaxScaler
 from torch import nn
 import joblib
 from others.database import MongoDB
+from utils.constants import QUANTIZATION
 from collections import deque
 
 class WeatherLSTMPredictor(nn.Module):
@@ -132,23 +133,31 @@ import pandas as pd
 import numpy as np
 DEVICE = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
 
+def load_weather_model(sequence_length=7, quantization=None):
+    """Load the fp32 weights and scalers, optionally with int8 dynamic quantisation (CPU only)."""
+    model = WeatherLSTMPredictor(sequence_length=sequence_length)
+    model.load_state_dict(torch.load('./weights_pth/best_model.pth', map_location=DEVICE))
+    model.scaler_rhum = joblib.load('./weights_pth/scaler_rhum.pkl')
+    model.scaler_temp = joblib.load('./weights_pth/scaler_temp.pkl')
+    model.to(DEVICE)
+    model.eval()
+    if quantization and DEVICE.type == 'cpu':
+        from predictions.quantization import quantize_dynamic_lstm
+        model = quantize_dynamic_lstm(model)
+    return model
+
 class HTPredictor:
-    def __init__(self):
+    def __init__(self, db_mongo=None):
         self.model = None
         self.sequence_length = 7  # 7 records (days or hours, as you wish)
         self.init_model()
-        self.db = MongoDB()
+        self.db = db_mongo or MongoDB()
         self.bin_sequences = {}  # {bin_id: deque([dict, ...], maxlen=7)}
         self._load_initial_sequences()
 
     def init_model(self):
         """Initialize the model and load saved weights."""
-        self.model = WeatherLSTMPredictor(sequence_length=self.sequence_length)
-        self.model.load_state_dict(torch.load('./weights_pth/best_model.pth', map_location=DEVICE))
-        self.model.scaler_rhum = joblib.load('./weights_pth/scaler_rhum.pkl')
-        self.model.scaler_temp = joblib.load('./weights_pth/scaler_temp.pkl')
-        self.model.to(DEVICE)
-        self.model.eval()
+        self.model = load_weather_model(self.sequence_length, QUANTIZATION.get("ht"))
 
     def _load_initial_sequences(self):
         """Load last 7 records for each bin from the database into deques."""
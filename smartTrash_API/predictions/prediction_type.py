@@ -1,10 +1,42 @@
+import io
+import threading
+import numpy as np
 import torch
 import torch.nn as nn
 from torchvision import models, transforms
 from PIL import Image
+from utils.constants import CLASSIFICATION_TOP_K, MAX_UPLOAD_BYTES, TYPE_CALIBRATION_DIR
+
+IMAGE_SIZE = 224
+
+def decode_image(data, size=IMAGE_SIZE):
+    """
+    Decode image bytes straight to a (3, size, size) uint8 tensor.
+    JPEGs are decoded at reduced scale (draft mode) so a 12 MP photo is never
+    expanded to full resolution; the final bilinear resize matches transforms.Resize.
+    """
+    if len(data) > MAX_UPLOAD_BYTES:
+        raise ValueError(f"Image too large ({len(data)} bytes, max {MAX_UPLOAD_BYTES})")
+    try:
+        image = Image.open(io.BytesIO(data))
+        image.draft("RGB", (size, size))
+        image = image.convert("RGB").resize((size, size), Image.BILINEAR)
+    except (OSError, SyntaxError) as e:  # PIL's errors for unknown or truncated files
+        raise ValueError(f"Cannot decode image: {e}") from e
+    return torch.from_numpy(np.array(image)).permute(2, 0, 1)  # a writable copy, torch warns on read-only arrays
+
+def normalize_into(images, out):
+    """
+    Write normalised images into a preallocated float tensor.
+    Same result as ToTensor + Normalize([0.5]*3, [0.5]*3): x / 127.5 - 1
+    """
+    for i, image in enumerate(images):
+        out[i].copy_(image)
+    out.mul_(1 / 127.5).sub_(1.0)
+    return out
 
 class TypePredictionmodel:
-    def __init__(self, file_path):
+    def __init__(self, file_path, quantization=None):
         self.model = self.get_densenet201(num_classes=10)
         self.model.load_state_dict(torch.load(file_path, map_location=torch.device('cpu')))
         self.model.eval()
@@ -13,7 +45,11 @@ class TypePredictionmodel:
             transforms.ToTensor(),
             transforms.Normalize([0.5]*3, [0.5]*3)
         ])
+        if quantization:
+            from predictions.quantization import quantize_classifier
+            self.model = quantize_classifier(self.model, quantization, self.prepare_image, TYPE_CALIBRATION_DIR)
         self.class_names = ['battery','organic','cardboard','clothes','glass','metal','paper','plastic','shoes','trash']
+        self._buffers = threading.local()  # per-thread preallocated batch tensor
 
     def get_densenet201(self, num_classes):
         model = models.densenet201(pretrained=False)
@@ -26,6 +62,40 @@ class TypePredictionmodel:
         image = self.transform(image).unsqueeze(0)  # Add batch dimension
         return image
     
+    def prepare_image_bytes(self, data):
+        """Decode an uploaded image from memory; returns a (3, 224, 224) uint8 tensor."""
+        return decode_image(data)
+
+    def _batch_buffer(self, size):
+        buffer = getattr(self._buffers, "tensor", None)
+        if buffer is None or buffer.shape[0] < size:
+            buffer = torch.empty((size, 3, IMAGE_SIZE, IMAGE_SIZE))
+            self._buffers.tensor = buffer
+        return buffer[:size]
+
+    def predict_batch(self, images, top_k=CLASSIFICATION_TOP_K):
+        """
+        Classify a batch of prepared images in one forward pass.
+        images: float tensor (N, 3, 224, 224) or list of uint8 (3, 224, 224) tensors
+        Returns one {"predicted_class", "top_k", "probabilities"} dict per image.
+        """
+        if isinstance(images, (list, tuple)):
+            images = normalize_into(images, self._batch_buffer(len(images)))
+        with torch.no_grad():
+            probabilities = torch.softmax(self.model(images), dim=1)
+        results = []
+        for row in probabilities:
+            values, indices = row.topk(min(top_k, len(self.class_names)))
+            results.append({
+                "predicted_class": self.class_names[int(row.argmax())],
+                "top_k": [
+                    {"class": self.class_names[int(i)], "probability": float(v)}
+                    for v, i in zip(values, indices)
+                ],
+                "probabilities": row.tolist(),
+            })
+        return results
+
     def predict(self, image_path):
         image = self.prepare_image(image_path)
         with torch.no_grad():
@@ -0,0 +1,56 @@
+import os
+from typing import Iterable, Optional
+
+import torch
+from torch import nn
+from torch.ao.quantization import get_default_qconfig_mapping, quantize_dynamic
+from torch.ao.quantization.quantize_fx import convert_fx, prepare_fx
+
+CALIBRATION_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+
+
+def quantize_dynamic_lstm(model: nn.Module) -> nn.Module:
+    """int8 dynamic quantisation of the LSTM and Linear layers (weights int8, activations float)."""
+    return quantize_dynamic(model, {nn.LSTM, nn.Linear}, dtype=torch.qint8)
+
+
+def quantize_static_cnn(model: nn.Module, calibration_batches: Iterable[torch.Tensor],
+                        example_input: torch.Tensor) -> nn.Module:
+    """
+    Post-training static int8 quantisation (FX graph mode) of a CNN.
+    calibration_batches: representative inputs used to observe activation ranges
+    """
+    model.eval()
+    qconfig_mapping = get_default_qconfig_mapping(torch.backends.quantized.engine)
+    prepared = prepare_fx(model, qconfig_mapping, example_inputs=(example_input,))
+    with torch.no_grad():
+        for batch in calibration_batches:
+            prepared(batch)
+    return convert_fx(prepared)
+
+
+def list_calibration_images(directory: str, limit: int = 64):
+    if not directory or not os.path.isdir(directory):
+        return []
+    files = sorted(
+        os.path.join(directory, f) for f in os.listdir(directory)
+        if f.lower().endswith(CALIBRATION_EXTENSIONS)
+    )
+    return files[:limit]
+
+
+def quantize_classifier(model: nn.Module, mode: str, prepare_image,
+                        calibration_dir: Optional[str] = None) -> nn.Module:
+    """
+    Quantise the trash type classifier.
+    mode "static" needs calibration images; without them it falls back to
+    dynamic quantisation, which only covers the final Linear layer.
+    """
+    if mode == "static":
+        images = list_calibration_images(calibration_dir)
+        if images:
+            batches = (prepare_image(path) for path in images)
+            example_input = torch.zeros(1, 3, 224, 224)
+            return quantize_static_cnn(model, batches, example_input)
+        print(f"No calibration images in '{calibration_dir}', using dynamic quantisation")
+    return quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
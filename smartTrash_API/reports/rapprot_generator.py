@@ -35,7 +35,7 @@ def load_and_clean_data(raw_data):
 # -----------------------------
 # 2. ANALYSES VISUELLES
 # -----------------------------
-def plot_distributions(df):
+def plot_distributions(df, workdir="."):
     fig, axs = plt.subplots(2, 2, figsize=(20, 20))
     sns.set_theme(style="whitegrid")
 
@@ -53,10 +53,10 @@ def plot_distributions(df):
     axs[1, 1].set_ylabel("")
 
     plt.tight_layout()
-    plt.savefig("rapport_analytique.png")
+    plt.savefig(os.path.join(workdir, "rapport_analytique.png"))
     plt.close()
 
-def plot_time_analysis(df):
+def plot_time_analysis(df, workdir="."):
     df['hour'] = df['timestamp'].dt.hour
     df['date'] = df['timestamp'].dt.date
 
@@ -70,16 +70,16 @@ def plot_time_analysis(df):
     axs[1].set_xlabel("Date")
 
     plt.tight_layout()
-    plt.savefig("analyse_temporelle.png")
+    plt.savefig(os.path.join(workdir, "analyse_temporelle.png"))
     plt.close()
 
-def plot_correlation_heatmap(df):
+def plot_correlation_heatmap(df, workdir="."):
     plt.figure(figsize=(10, 6))
     corr = df[['trash_level', 'gaz_level', 'temperature', 'humidity', 'water_level', 'weight']].corr()
     sns.heatmap(corr, annot=True, cmap='coolwarm', fmt=".2f", linewidths=0.5)
     plt.title("Corrélation entre les variables")
     plt.tight_layout()
-    plt.savefig("correlation_heatmap.png")
+    plt.savefig(os.path.join(workdir, "correlation_heatmap.png"))
     plt.close()
 
 # -----------------------------
@@ -114,7 +114,7 @@ def generate_nlp_summary(df):
     )
     return resume
 
-def export_pdf_report(df, filename="statics/rapport_final_fr.pdf"):
+def export_pdf_report(df, filename="statics/rapport_final_fr.pdf", workdir="."):
     styles = getSampleStyleSheet()
     styles.add(ParagraphStyle(name='TitreCentre', parent=styles['Title'], alignment=1))
     styles.add(ParagraphStyle(name='EnteteSection', fontSize=14, leading=16, spaceAfter=12, textColor=colors.HexColor("#2E4053"), alignment=1))
@@ -171,18 +171,21 @@ def export_pdf_report(df, filename="statics/rapport_final_fr.pdf"):
 
     # GRAPHIQUES
     story.append(Paragraph("📊 ANALYSES VISUELLES", styles['EnteteSection']))
-    if os.path.exists("rapport_analytique.png"):
-        story.append(Image("rapport_analytique.png", width=500, height=400))
+    distributions_png = os.path.join(workdir, "rapport_analytique.png")
+    time_png = os.path.join(workdir, "analyse_temporelle.png")
+    heatmap_png = os.path.join(workdir, "correlation_heatmap.png")
+    if os.path.exists(distributions_png):
+        story.append(Image(distributions_png, width=500, height=400))
 
-    if os.path.exists("analyse_temporelle.png"):
+    if os.path.exists(time_png):
         story.append(PageBreak())
         story.append(Paragraph("📆 ANALYSE TEMPORELLE", styles['EnteteSection']))
-        story.append(Image("analyse_temporelle.png", width=500, height=300))
+        story.append(Image(time_png, width=500, height=300))
 
-    if os.path.exists("correlation_heatmap.png"):
+    if os.path.exists(heatmap_png):
         story.append(PageBreak())
         story.append(Paragraph("🔗 MATRICE DE CORRÉLATION", styles['EnteteSection']))
-        story.append(Image("correlation_heatmap.png", width=500, height=300))
+        story.append(Image(heatmap_png, width=500, height=300))
 
     # TABLE RÉCAPITULATIVE
     story.append(PageBreak())
@@ -231,17 +234,19 @@ def export_pdf_report(df, filename="statics/rapport_final_fr.pdf"):
     doc.build(story)
     print(f"📄 Rapport PDF généré : {filename}")
 
-def generate_rapport_form_data(data, filename="statics/rapport_final_fr.pdf"):
+def generate_rapport_form_data(data, filename="statics/rapport_final_fr.pdf", workdir="."):
+    """workdir holds the intermediate PNGs; give each concurrent report its own."""
     if not data:
         print("❗ Aucune donnée disponible pour générer le rapport.")
     else:
         df = load_and_clean_data(data)
-        plot_distributions(df)
-        plot_time_analysis(df)
-        plot_correlation_heatmap(df)
-        export_pdf_report(df, filename)
+        plot_distributions(df, workdir)
+        plot_time_analysis(df, workdir)
+        plot_correlation_heatmap(df, workdir)
+        export_pdf_report(df, filename, workdir)
     # Cleanup generated images
-    for file in ["rapport_analytique.png", "analyse_temporelle.png", "correlation_heatmap.png"]:
+    for name in ["rapport_analytique.png", "analyse_temporelle.png", "correlation_heatmap.png"]:
+        file = os.path.join(workdir, name)
         if os.path.exists(file):
             os.remove(file)
             print(f"🗑️ Fichier supprimé : {file}")
@@ -1,29 +1,144 @@
 import json
-from fastapi import APIRouter, HTTPException
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Query
 from bson.json_util import dumps
 from pymongo.errors import AutoReconnect
 
 
-from others.models import WasteCollectionRequest, WasteCollectionResponse
+from others.models import (
+    FleetCollectionRequest, FleetCollectionResponse, InsertionRequest, InsertionResponse,
+    OptimizationJobRequest, WasteCollectionRequest, WasteCollectionResponse,
+)
 from others.population_stats import get_bin_usage_by_region, get_fill_rate_by_bin, get_population_by_bin, get_trash_weight_correlation
+from services.fleet_routing import optimize_fleet_collection
 from services.rotage import optimize_waste_collection
-from others.database import MongoDB
+from services.route_cache import route_cache
+from services.route_insertion import insert_bins
+from services.route_jobs import route_jobs
+from services.spatial_index import bin_index
+from others.database import get_db_mongo
+from utils.constants import BBOX_MAX_RESULTS, NEARBY_DEFAULT_K
 
 router = APIRouter()
-db_mongo = MongoDB()
+db_mongo = get_db_mongo()
+route_jobs.bind(db_mongo.route_jobs if db_mongo else None)
+
+def solve_route(data: dict) -> dict:
+    ordered_bins, total_volume, total_weight, total_distance, stats = optimize_waste_collection(data)
+    return {
+        "ordered_bins": ordered_bins,
+        "total_volume": total_volume,
+        "total_weight": total_weight,
+        "total_distance": total_distance,
+        "solve_stats": stats,
+        "routes": stats.pop("routes", None)
+    }
 
 @router.post("/optimize", response_model=WasteCollectionResponse)
-async def optimize_route(request: WasteCollectionRequest):
+def optimize_route(request: WasteCollectionRequest):
+    # Plain def: FastAPI runs the solve in its threadpool instead of on the event loop
+    try:
+        # Identical requests are answered from the cache, or wait for the identical solve in progress
+        response, source = route_cache.get_or_compute(request.model_dump(), solve_route)
+        return {**response, "solve_stats": {**(response["solve_stats"] or {}), "cache": source}}
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/optimize/cache")
+def get_route_cache_metrics():
+    """Size, hit rate and in-flight solves of the /optimize response cache."""
+    return route_cache.metrics()
+
+@router.post("/optimize/fleet", response_model=FleetCollectionResponse)
+def optimize_fleet_route(request: FleetCollectionRequest):
+    """Split the bins between several trucks (capacitated routes from a shared depot)."""
     try:
-        ordered_bins, total_volume, total_weight = optimize_waste_collection(request.model_dump())
-        return {
-            "ordered_bins": ordered_bins,
-            "total_volume": total_volume,
-            "total_weight": total_weight
-        }
+        return optimize_fleet_collection(request.model_dump())
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+@router.post("/optimize/insert", response_model=InsertionResponse)
+def insert_into_route(request: InsertionRequest):
+    """Insert newly full bins into a running route at their cheapest feasible positions."""
+    try:
+        return insert_bins(request.model_dump())
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/optimize/jobs", status_code=202)
+def create_optimization_job(request: OptimizationJobRequest):
+    """Start a route (or fleet) optimisation in the background and return its job id."""
+    if (request.route is None) == (request.fleet is None):
+        raise HTTPException(status_code=400, detail="Provide exactly one of 'route' or 'fleet'")
+    kind = "route" if request.route is not None else "fleet"
+    payload = (request.route or request.fleet).model_dump()
+    job_id = route_jobs.submit(kind, payload)
+    return {"job_id": job_id, "status": "queued", "status_url": f"/optimize/jobs/{job_id}"}
+
+@router.get("/optimize/jobs/{job_id}")
+def get_optimization_job(job_id: str):
+    """Status, progress and best solution found so far."""
+    try:
+        return route_jobs.status(job_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+@router.get("/optimize/jobs/{job_id}/result")
+def get_optimization_job_result(job_id: str):
+    try:
+        status = route_jobs.status(job_id)
+        result = route_jobs.result(job_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if status["status"] == "failed":
+        raise HTTPException(status_code=400, detail=status["error"])
+    if result is None:
+        raise HTTPException(status_code=409, detail=f"Job is {status['status']}")
+    return result
+
+@router.delete("/optimize/jobs/{job_id}")
+def cancel_optimization_job(job_id: str):
+    """Cancel a job; a running solve stops and keeps its best solution so far."""
+    try:
+        return route_jobs.cancel(job_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+@router.get("/bins/nearby")
+def bins_nearby(lat: float = Query(..., ge=-90, le=90), lon: float = Query(..., ge=-180, le=180),
+                k: Optional[int] = Query(None, ge=1, le=1000), radius: Optional[float] = Query(None, gt=0)):
+    """Bins closest to a point: the k nearest, those within `radius` km, or the k nearest within the radius."""
+    if k is None and radius is None:
+        k = NEARBY_DEFAULT_K
+    try:
+        if bin_index.loaded:
+            bins = bin_index.nearby(lat, lon, k=k, radius_km=radius)
+        else:
+            bins = db_mongo.find_bins_near(lat, lon, k=k, radius_km=radius)
+        return {"count": len(bins), "bins": bins}
+    except AutoReconnect:
+        raise HTTPException(status_code=503, detail="MongoDB connection lost. Please try again later.")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/bins/bbox")
+def bins_in_bbox(min_lat: float = Query(..., ge=-90, le=90), min_lon: float = Query(..., ge=-180, le=180),
+                 max_lat: float = Query(..., ge=-90, le=90), max_lon: float = Query(..., ge=-180, le=180),
+                 limit: int = Query(BBOX_MAX_RESULTS, ge=1, le=BBOX_MAX_RESULTS)):
+    """Bins inside the map viewport (min_lon > max_lon crosses the antimeridian)."""
+    if min_lat > max_lat:
+        raise HTTPException(status_code=400, detail="min_lat must not exceed max_lat")
+    try:
+        if bin_index.loaded:
+            bins = bin_index.bbox(min_lat, min_lon, max_lat, max_lon, limit=limit)
+        else:
+            bins = db_mongo.find_bins_in_bbox(min_lat, min_lon, max_lat, max_lon, limit=limit)
+        return {"count": len(bins), "bins": bins}
+    except AutoReconnect:
+        raise HTTPException(status_code=503, detail="MongoDB connection lost. Please try again later.")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.get("/resource-management")
 def get_resource_management_data():
     """Endpoint pour la gestion des ressources (utilise bin_data2)"""
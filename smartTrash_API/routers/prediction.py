@@ -1,17 +1,23 @@
-import os
-import tempfile
+import asyncio
 from fastapi import APIRouter, HTTPException, Request
 from typing import Optional
 from utils.helper import to_python_type
+from utils.constants import MAX_UPLOAD_BYTES
 
 # Import prediction state from the new module
-from others.prediction_state import last_level_prediction
-from predictions.prediction_type import TypePredictionmodel
+from others.prediction_state import level_predictions
+from others.database import get_db_mongo
+from others.prediction_store import PredictionStore
+from services.classification_cache import classification_cache
+from services.image_batcher import image_batcher
+from services.inference_executor import inference_executor
 
 router = APIRouter()
+prediction_store = PredictionStore(get_db_mongo())
 
 @router.get("/prediction")
 async def get_prediction(bin_id: Optional[str] = None):
+    last_level_prediction = level_predictions.values()
     if last_level_prediction is None:
         raise HTTPException(status_code=404, detail="No prediction available yet")
     
@@ -22,8 +28,63 @@ async def get_prediction(bin_id: Optional[str] = None):
     
     return last_level_prediction
 
-# Initialize TypePredictionmodel
-predictor = TypePredictionmodel(file_path="weights_pth/densenet201_garbage.pth")
+@router.get("/prediction/accuracy")
+async def get_prediction_accuracy(model: Optional[str] = None, bin_id: Optional[str] = None):
+    """Forecast error (MAE and bias) per model version and per bin."""
+    try:
+        return to_python_type(prediction_store.accuracy(model=model, bin_id=bin_id))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+async def classify_uploads(contents):
+    """
+    Classify uploaded images, answering repeated or near-duplicate photos from
+    the cache and sending only the misses to the micro-batcher.
+    Returns (result, cached, error) triples in input order; uploads that are
+    too large or cannot be decoded get an error message and no result.
+    """
+    lookups = await asyncio.gather(*[
+        inference_executor.submit("preprocess", classification_cache.lookup, data) for data in contents
+    ])
+    results = [(result, True, None) for _, _, result in lookups]
+    # Identical uploads within the request are classified once
+    misses = {}
+    for i, (key, _, result) in enumerate(lookups):
+        if result is not None:
+            continue
+        if len(contents[i]) > MAX_UPLOAD_BYTES:
+            results[i] = (None, False, f"Image too large (max {MAX_UPLOAD_BYTES // (1024 * 1024)} MB)")
+            continue
+        misses.setdefault(key, []).append(i)
+    if misses:
+        first = [positions[0] for positions in misses.values()]
+        images = await asyncio.gather(*[image_batcher.prepare(contents[i]) for i in first], return_exceptions=True)
+        decoded = []
+        for positions, image in zip(misses.values(), images):
+            if isinstance(image, ValueError):  # undecodable upload, see decode_image
+                for i in positions:
+                    results[i] = (None, False, str(image))
+            elif isinstance(image, BaseException):
+                raise image
+            else:
+                decoded.append((positions, image))
+        if decoded:
+            fresh = await image_batcher.classify_many([image for _, image in decoded])
+            for (positions, _), result in zip(decoded, fresh):
+                key, phash, _ = lookups[positions[0]]
+                classification_cache.put(key, phash, result)
+                for i in positions:
+                    results[i] = (result, False, None)
+    return results
+
+def check_upload_size(contents):
+    for data in contents:
+        if len(data) > MAX_UPLOAD_BYTES:
+            raise HTTPException(status_code=413, detail=f"Image too large (max {MAX_UPLOAD_BYTES // (1024 * 1024)} MB)")
+
+def format_result(result, cached):
+    return {"predicted_class": result["predicted_class"], "top_k": result["top_k"], "cached": cached}
+
 # --- trash image prediction endpoint ---
 @router.post("/predict/trash_type")
 async def predict_trash_type(request: Request):
@@ -34,17 +95,47 @@ async def predict_trash_type(request: Request):
         if not file:
             raise HTTPException(status_code=400, detail="No file provided")
         
-        # Save the uploaded file temporarily
-        with tempfile.NamedTemporaryFile(delete=False) as tmp_file:
-            tmp_file.write(file.file.read())
-            tmp_file_path = tmp_file.name
-        
-        # Perform prediction
-        predicted_class = predictor.predict(tmp_file_path)
-        
-        # Clean up temporary file
-        os.remove(tmp_file_path)
+        # Decode from memory and classify as part of the next micro-batch
+        data = await file.read()
+        check_upload_size([data])
+        [(result, cached, error)] = await classify_uploads([data])
+        if error:
+            raise HTTPException(status_code=400, detail=error)
         
-        return {"predicted_class": predicted_class}
+        return format_result(result, cached)
+    except HTTPException:
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error during prediction: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error during prediction: {str(e)}")
+
+@router.post("/predict/trash_type/batch")
+async def predict_trash_type_batch(request: Request):
+    """Classify every image sent in the "files" form field; a bad image only fails its own entry."""
+    try:
+        form = await request.form()
+        files = form.getlist("files")
+
+        if not files:
+            raise HTTPException(status_code=400, detail="No files provided")
+
+        contents = [await file.read() for file in files]
+        results = await classify_uploads(contents)
+
+        return {
+            "predictions": [
+                {"filename": file.filename, **(format_result(result, cached) if error is None else {"error": error})}
+                for file, (result, cached, error) in zip(files, results)
+            ]
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error during prediction: {str(e)}")
+
+@router.get("/inference/metrics")
+async def get_inference_metrics():
+    """Queue depth, concurrency and timings of the inference executor, image batching and result cache."""
+    metrics = inference_executor.metrics()
+    metrics["batching"] = image_batcher.metrics()
+    metrics["classification_cache"] = classification_cache.metrics()
+    return metrics
@@ -1,55 +1,70 @@
 from fastapi import APIRouter
 import os
 from fastapi import HTTPException
-from fastapi.responses import PlainTextResponse, Response, JSONResponse
-import pandas as pd
-from reports.anomalie_comment import AnomalieComment
-from reports.paterns_usage import generate_patern_usage
-from reports.rapprot_generator import generate_rapport_form_data
+from fastapi.responses import FileResponse, PlainTextResponse, JSONResponse
 from utils.constants import REPORT_PATH
-from others.database import MongoDB 
+from others.database import get_db_mongo
+from services.report_jobs import report_jobs
 
 router = APIRouter()
-db_mongo = MongoDB()
+db_mongo = get_db_mongo()
+report_jobs.bind(db_mongo.report_jobs)
 
 
-@router.post("/generate-report")
-async def generate_report():
+@router.post("/generate-report", status_code=202)
+def generate_report():
+    """
+    Start rendering the PDF report in a worker process and return its job.
+    Identical requests share the job, and its PDF while the history is unchanged.
+    """
     try:
-        # 1. Generate the report (your existing logic)
-        db_data = db_mongo.get_all_data() # Replace with your actual data fetching
-        generate_rapport_form_data(db_data, filename=REPORT_PATH) # Generate the PDF and save it
-
-        # 2. Read the generated PDF file's content
-        if not os.path.exists(REPORT_PATH):
-            raise HTTPException(status_code=500, detail="Report file was not generated at the specified path.")
-
-        # Option B: Reading bytes directly and returning (more flexible)
-        with open(REPORT_PATH, "rb") as f:
-            pdf_content = f.read()
-
-        return Response(
-            content=pdf_content,
-            media_type="application/pdf",
-            headers={"Content-Disposition": "attachment; filename=SmartTrash_Rapport.pdf"}
-        )
+        job, source = report_jobs.submit(db_mongo.history_fingerprint())
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erreur lors de la génération du rapport: {e}")
+    job_id = job['job_id']
+    return {
+        **job,
+        "source": source,
+        "status_url": f"/generate-report/jobs/{job_id}",
+        "download_url": f"/generate-report/jobs/{job_id}/download",
+    }
+
+@router.get("/generate-report/jobs/{job_id}")
+def get_report_job(job_id: str):
+    try:
+        return report_jobs.status(job_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Job not found")
 
-from fastapi.responses import FileResponse
+@router.get("/generate-report/jobs/{job_id}/download")
+def download_report(job_id: str):
+    try:
+        path = report_jobs.artifact(job_id)
+        status = report_jobs.status(job_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if status["status"] == "failed":
+        raise HTTPException(status_code=500, detail=status["error"])
+    if path is None:
+        raise HTTPException(status_code=409, detail=f"Job is {status['status']}")
+    return FileResponse(path=path, media_type="application/pdf", filename="SmartTrash_Rapport.pdf")
 
 @router.get("/generated-report.pdf")
 async def serve_pdf():
-    if not os.path.exists(REPORT_PATH):
+    """Latest rendered report."""
+    path = report_jobs.latest() or REPORT_PATH
+    if not os.path.exists(path):
         raise HTTPException(status_code=404, detail="Report file not found.")
     return FileResponse(
-        path=REPORT_PATH,
+        path=path,
         media_type="application/pdf",
         filename="SmartTrash_Rapport.pdf"
     )
 
 @router.get("/anomaly-recommendations")
 async def get_anomaly_recommendations():
+    import pandas as pd
+    from reports.anomalie_comment import AnomalieComment
     try:
         data_raw = db_mongo.get_all_data()
         data = pd.DataFrame(data_raw)
@@ -65,6 +80,7 @@ async def get_markdown_report():
     """
     Serves a Markdown file from the server.
     """
+    from reports.paterns_usage import generate_patern_usage
     data = db_mongo.get_all_data()
     MARKDOWN_FILE_PATH = generate_patern_usage(data)
 
@@ -1,17 +1,28 @@
 from typing import Optional
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from datetime import datetime
 import pandas as pd
 import uvicorn
 import firebase_admin
 from firebase_admin import credentials, db, messaging
 import threading
-from predictions.predictionLvl import next_level
 import asyncio
-from others.database import MongoDB
+from others.database import get_db_mongo, spatial_entry
+from others.prediction_store import PredictionStore
 # --- Import necessary modules ---
 from services.notification_service import NotificationService
+from services.notification_dispatcher import DeadLetterStore, NotificationDispatcher
+from services.notification_transport import FirebaseTransport
+from services.inference_executor import inference_executor
+from services.model_registry import model_registry
+from services.classification_cache import classification_cache
+from services.route_jobs import route_jobs
+from services.report_jobs import report_jobs
+from services.cluster_routing import shutdown_cluster_pool, warm_cluster_pool
+from services.distance_cache import set_cache_writer
+from services.spatial_index import bin_index
 from others.models import TrashData
 # --- Constants ---
 from utils.constants import (
@@ -20,14 +31,15 @@ from utils.constants import (
     HT_PREDICTION_INTERVAL,
     NOTIFICATION_INTERVAL,
     LEVEL_PREDICTION_INTERVAL,
+    ACCURACY_EVALUATION_INTERVAL,
+    MODEL_WARMUP_ON_STARTUP,
+    CLUSTER_WARMUP_ON_STARTUP,
+    LEADER_LEASE_RENEW,
+    SHARED_STATE_REFRESH,
+    SPATIAL_INDEX_REFRESH,
 )
-from predictions.predictionTH import HTPredictor
-from others.prediction_state import (
-    last_level_prediction,
-    level_prediction_timestamp,
-    last_ht_prediction,
-    ht_prediction_timestamp,
-)
+from others.prediction_state import level_predictions, ht_predictions
+from others.shared_state import WORKER_ID, AlertStateStore, LeaderLease
 
 from utils.helper import get_local_ip, to_python_type
 # --- Import prediction endpoints router ---
@@ -57,16 +69,40 @@ app = FastAPI()
 
 # Initialize MongoDB after FastAPI app initialization
 try:
-    db_mongo = MongoDB()
+    db_mongo = get_db_mongo()
 except Exception as e:
     print(f"Failed to initialize MongoDB: {e}")
     print("Starting API without MongoDB functionality")
     db_mongo = None
 
-notification_service = NotificationService(db_mongo=db_mongo)
-
-# After db_mongo and analytics initialization
-ht_predictor = HTPredictor()
+# Alerts are queued by the listener thread and sent by async workers (retries, rate limit, dedup)
+notification_dispatcher = NotificationDispatcher(
+    FirebaseTransport(),
+    dead_letters=DeadLetterStore(db_mongo.notification_dead_letters if db_mongo else None),
+)
+notification_service = NotificationService(
+    db_mongo=db_mongo, dispatcher=notification_dispatcher,
+    state_store=AlertStateStore(db_mongo.alert_state if db_mongo else None),
+)
+prediction_store = PredictionStore(db_mongo) if db_mongo else None
+model_registry.bind(db_mongo)
+
+# State shared by uvicorn workers; only the lease holder runs the listener and background loops
+if db_mongo is not None:
+    level_predictions.bind(db_mongo.shared_state)
+    ht_predictions.bind(db_mongo.shared_state)
+leader_lease = LeaderLease(collection=db_mongo.leases if db_mongo else None)
+def set_shared_file_writer(writer: bool):
+    """Distance and classification cache files have a single writer: the leader (see start/stop_leader_duties)."""
+    set_cache_writer(writer)
+    classification_cache.read_only = not writer
+
+set_shared_file_writer(leader_lease.collection is None)
+leader_tasks = []
+leadership_task = None
+rtdb_listener = None
+leader_active = False  # set by start/stop_leader_duties, read by the listener thread
+listener_lock = threading.Lock()
 
 # CORS middleware
 app.add_middleware(
@@ -82,6 +118,11 @@ app.add_middleware(
 async def read_root():
     return {"message": "Welcome to the Waste Collection Optimization API"}
 
+@app.get("/ready")
+async def readiness():
+    """Per-model load status and load time; 503 until the required models are loaded, failed models listed."""
+    status = model_registry.status()
+    return JSONResponse(content=status, status_code=200 if status["ready"] else 503)
 
 @app.post("/update/{bin_id}")
 async def update_trash_bin(bin_id: str, data: TrashData):
@@ -92,6 +133,22 @@ async def update_trash_bin(bin_id: str, data: TrashData):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/workers/leader")
+async def get_leader():
+    """Which worker holds the background lease (RTDB listener and loops)."""
+    holder = await asyncio.to_thread(leader_lease.holder)
+    return {"worker": WORKER_ID, "is_leader": leader_lease.is_leader, "lease": to_python_type(holder)}
+
+@app.get("/notifications/metrics")
+async def get_notification_metrics():
+    """Dispatcher queue depth, retries, deduplicated alerts, dead letters and send latency."""
+    return notification_dispatcher.metrics()
+
+@app.get("/notifications/dead-letters")
+async def get_dead_letters(limit: int = 100):
+    """Most recent notifications that could not be delivered."""
+    return notification_dispatcher.dead_letters.recent(limit)
+
 @app.get("/read/{bin_id}")
 async def read_trash_bin(bin_id: str):
     try:
@@ -108,10 +165,16 @@ def handle_data_change(event):
         
         if event.data is None:
             return
+        if not leader_lease.holds():
+            # The lease ran out before this worker stepped down: the new leader handles it
+            print("Lease not held, RTDB event ignored")
+            return
 
         try:
+            # Field-level updates (/<bin_id>/trash_level) re-read the whole bin
+            bin_key = event.path.strip('/').split('/')[0]
             all_bins_data = event.data if event.path == '/' else {
-                event.path.strip('/'): db.reference(f"trash_bins/{event.path.strip('/')}").get()
+                bin_key: db.reference(f"trash_bins/{bin_key}").get()
             }
 
             for bin_id, bin_value in all_bins_data.items():
@@ -121,8 +184,14 @@ def handle_data_change(event):
                 try:
                     bin_value['bin_id'] = bin_id  # Ensure bin_id is set
                     bin_data = TrashData(**bin_value)
+                    # Full-bin and gas alerts are evaluated as readings arrive
+                    notification_service._process_bin_data(bin_id, bin_data)
                     # Store in MongoDB
                     db_mongo.store_bin_data(bin_id, bin_value)
+                    # Keep the in-memory spatial index in sync
+                    entry = spatial_entry(bin_id, bin_value)
+                    if entry['latitude'] is not None and entry['longitude'] is not None:
+                        bin_index.upsert(**entry)
                 except Exception as e:
                     print(f"Error processing bin '{bin_id}': {e}")
 
@@ -131,71 +200,229 @@ def handle_data_change(event):
 
 # --- Firebase Listener ---
 def start_rtdb_listener():
-    try:
-        ref = db.reference('trash_bins')
-        print(f"Listening to Firebase RTDB path: {ref.path}")
-        ref.listen(handle_data_change)
-    except Exception as e:
-        print(f"Error starting RTDB listener: {e}")
+    """Open the RTDB stream (blocking); returns its handle, or None if leader duties stopped meanwhile."""
+    global rtdb_listener
+    ref = db.reference('trash_bins')
+    print(f"Listening to Firebase RTDB path: {ref.path}")
+    listener = ref.listen(handle_data_change)
+    with listener_lock:
+        if leader_active:
+            rtdb_listener = listener
+            return listener
+    listener.close()  # stop_leader_duties ran while the stream was opening
+    return None
 
 @app.on_event("startup")
 async def startup_event():
-    print("FastAPI startup event: Initializing Firebase and RTDB listener...")
+    global leadership_task
+    classification_cache.load()
+    await notification_dispatcher.start()
+
+    # Spatial index over bin locations, kept in sync by the RTDB listener
+    if db_mongo is not None:
+        try:
+            db_mongo.backfill_geo()
+            bin_index.load(db_mongo.get_bin_locations())
+        except Exception as e:
+            print(f"Failed to load spatial index: {e}")
+
+    # The level and HT predictors warm-start from bins_recent
+    if db_mongo is not None:
+        try:
+            rebuilt = await asyncio.to_thread(db_mongo.ensure_bins_recent)
+            if rebuilt:
+                print(f"bins_recent was empty, rebuilt from history for {rebuilt} bins")
+        except Exception as e:
+            print(f"Failed to rebuild bins_recent: {e}")
+
+    if MODEL_WARMUP_ON_STARTUP:
+        model_registry.warm_up()
+        print("Model warm-up started in background.")
+
+    if CLUSTER_WARMUP_ON_STARTUP:
+        # Worker spawn and imports would otherwise eat into the first cluster request's time budget
+        asyncio.create_task(asyncio.to_thread(warm_cluster_pool))
+
+    # Prediction endpoints read the snapshots from memory, this keeps them current
+    asyncio.create_task(shared_state_loop())
+
+    print("FastAPI startup event: Initializing Firebase...")
     try:
         initialize_firebase()
-        listener_thread = threading.Thread(target=start_rtdb_listener, daemon=True)
-        listener_thread.start()
-        print("Firebase RTDB listener thread started.")
+    except Exception as e:
+        print(f"Failed to initialize Firebase: {e}")
+        return
+
+    # Every worker serves the API; the one holding the lease also runs the listener and loops
+    leadership_task = asyncio.create_task(leadership_loop())
+    print(f"Worker {WORKER_ID} started, competing for the background lease.")
+
+async def start_leader_duties():
+    global leader_active
+    print(f"Worker {WORKER_ID} is the leader: starting RTDB listener and background loops...")
+    with listener_lock:
+        leader_active = True
+    set_shared_file_writer(True)
+    try:
+        await asyncio.to_thread(notification_service.load_alert_state)
+    except Exception as e:
+        print(f"Failed to restore alert state: {e}")
+
+    try:
+        if await asyncio.to_thread(start_rtdb_listener) is not None:
+            print("Firebase RTDB listener started.")
+    except Exception as e:
+        print(f"Error starting RTDB listener: {e}")
+
+    # Send server IP to Firebase RTDB
+    local_ip = get_local_ip()
+    server_url = f"http://{local_ip}:8000"
+    try:
+        await asyncio.to_thread(db.reference('app_settings/rotageServerUrl').set, server_url)
+        print(f"Server URL '{server_url}' sent to Firebase RTDB.")
+    except Exception as e:
+        print(f"Failed to update server URL in Firebase: {e}")
+
+    # Restore the last stored predictions so /prediction answers right after a restart
+    await asyncio.to_thread(load_stored_predictions)
+
+    # Start prediction loop in background
+    leader_tasks.append(asyncio.create_task(level_prediction_loop()))
+    print("Prediction loop started.")
+    leader_tasks.append(asyncio.create_task(ht_prediction_loop()))
+    print("HT prediction loop started.")
+    leader_tasks.append(asyncio.create_task(scheduled_notification_loop()))
+    print("Scheduled notification loop started.")
+    leader_tasks.append(asyncio.create_task(forecast_accuracy_loop()))
+    print("Forecast accuracy loop started.")
+
+async def stop_leader_duties():
+    global rtdb_listener, leader_active
+    for task in leader_tasks:
+        task.cancel()
+    await asyncio.gather(*leader_tasks, return_exceptions=True)
+    leader_tasks.clear()
+    # A listener still opening sees leader_active False and closes itself
+    with listener_lock:
+        leader_active = False
+        listener, rtdb_listener = rtdb_listener, None
+    set_shared_file_writer(leader_lease.collection is None)
+    if listener is not None:
+        try:
+            await asyncio.to_thread(listener.close)
+        except Exception as e:
+            print(f"Error closing RTDB listener: {e}")
+    print(f"Worker {WORKER_ID} stopped its leader duties.")
 
-        # Send server IP to Firebase RTDB
-        local_ip = get_local_ip()
-        server_url = f"http://{local_ip}:8000"
+async def shared_state_loop():
+    if db_mongo is None:
+        return
+    while True:
+        for snapshot in (level_predictions, ht_predictions):
+            try:
+                await asyncio.to_thread(snapshot.refresh)
+            except Exception as e:
+                print(f"Failed to refresh shared state '{snapshot.name}': {e}")
+        await asyncio.sleep(SHARED_STATE_REFRESH)
+
+async def leadership_loop():
+    last_index_refresh = asyncio.get_running_loop().time()
+    while True:
         try:
-            ref = db.reference('app_settings/rotageServerUrl')
-            ref.set(server_url)
-            print(f"Server URL '{server_url}' sent to Firebase RTDB.")
+            leader = await asyncio.to_thread(leader_lease.acquire)
         except Exception as e:
-            print(f"Failed to update server URL in Firebase: {e}")
+            # Without a renewed lease another worker may take over: step down
+            print(f"Error renewing leader lease: {e}")
+            leader = False
+        try:
+            if leader and not leader_active:
+                await start_leader_duties()
+            elif not leader and leader_active:
+                await stop_leader_duties()
+            now = asyncio.get_running_loop().time()
+            # Followers do not receive RTDB events, reload bin locations from MongoDB instead
+            if not leader and db_mongo is not None and now - last_index_refresh > SPATIAL_INDEX_REFRESH:
+                last_index_refresh = now
+                bin_index.load(await asyncio.to_thread(db_mongo.get_bin_locations))
+        except Exception as e:
+            print(f"Error in leadership_loop: {e}")
+        await asyncio.sleep(LEADER_LEASE_RENEW)
 
-        # Start prediction loop in background
-        asyncio.create_task(level_prediction_loop())
-        print("Prediction loop started.")
-        asyncio.create_task(ht_prediction_loop())
-        print("HT prediction loop started.")
-        asyncio.create_task(scheduled_notification_loop())
-        print("Scheduled notification loop started.")
+def load_stored_predictions():
+    if prediction_store is None:
+        return
+    try:
+        # Another leader already published predictions, nothing to restore
+        level_predictions.refresh()
+        ht_predictions.refresh()
+        if level_predictions.values() or ht_predictions.values():
+            return
+        stored_level = prediction_store.load_latest("level")
+        level_predictions.update(
+            {bin_id: stored["prediction"] for bin_id, stored in stored_level.items()},
+            {bin_id: stored["run_time"] for bin_id, stored in stored_level.items()},
+        )
+        stored_ht = prediction_store.load_latest("ht")
+        ht_predictions.update(
+            {bin_id: stored["prediction"] for bin_id, stored in stored_ht.items()},
+            {bin_id: stored["run_time"].isoformat() for bin_id, stored in stored_ht.items()},
+        )
+        print(f"Restored stored predictions: {len(stored_level)} level, {len(stored_ht)} HT")
+    except Exception as e:
+        print(f"Failed to restore stored predictions: {e}")
 
+def save_predictions(model, predictions, run_time):
+    if prediction_store is None:
+        return
+    try:
+        prediction_store.save_run(model, predictions, run_time)
     except Exception as e:
-        print(f"Failed to initialize Firebase or start RTDB listener: {e}")
+        print(f"Failed to store {model} predictions: {e}")
+
+def predict_levels(bins_data):
+    """Run the level model for every bin (blocking, called from the inference executor)."""
+    level_model = model_registry.get("level")
+    predictions = {}
+    now = datetime.now().isoformat()
+    for bin_id, bin_data in bins_data.items():
+        try:
+            current_level = bin_data['trash_level']
+
+            # Make prediction for this bin
+            predicted_value = level_model.next_level(current_level, bin_id=bin_id)
+
+            predictions[bin_id] = {
+                'predicted_level': float(predicted_value),
+                'current_level': float(current_level),
+                'bin_name': bin_data.get('name', 'Unknown'),
+                'timestamp': now
+            }
+        except Exception as e:
+            print(f"Error predicting for bin {bin_id}: {e}")
+            continue
+    return predictions
+
+def predict_ht(current_state):
+    """Run the HT model for every bin (blocking, called from the inference executor)."""
+    return model_registry.get("ht").predict(current_state)
 
 async def level_prediction_loop():
-    global last_level_prediction, level_prediction_timestamp
     while True:
         try:
-            ref = db.reference('trash_bins')
-            bins_data = ref.get()
+            if not leader_lease.holds():
+                # Lease not renewed in time, the leadership loop steps down or renews it
+                await asyncio.sleep(LEADER_LEASE_RENEW)
+                continue
+            bins_data = await asyncio.to_thread(db.reference('trash_bins').get)
             
             if bins_data:
-                now = datetime.now().isoformat()
-                for bin_id, bin_data in bins_data.items():
-                    try:
-                        current_level = bin_data['trash_level']
-                        
-                        # Make prediction for this bin
-                        predicted_value = next_level(current_level)
-                                                
-                        # Store prediction for this bin
-                        last_level_prediction[bin_id] = {
-                            'predicted_level': float(predicted_value),
-                            'current_level': float(current_level),
-                            'bin_name': bin_data.get('name', 'Unknown'),
-                            'timestamp': now
-                        }
-                        level_prediction_timestamp[bin_id] = datetime.now()                        
-                    except Exception as e:
-                        print(f"Error predicting for bin {bin_id}: {e}")
-                        continue
-                print(f"Level predictions updated at {now}")
+                run_time = datetime.now()
+                predictions = await inference_executor.submit("level", predict_levels, bins_data)
+                # Publish predictions for each bin to every API worker
+                await asyncio.to_thread(level_predictions.update, predictions,
+                                        {bin_id: run_time for bin_id in predictions})
+                await asyncio.to_thread(save_predictions, "level", predictions, run_time)
+                print(f"Level predictions updated at {datetime.now().isoformat()}")
             else:
                 print("No bins data found in Firebase RTDB.")   
             await asyncio.sleep(LEVEL_PREDICTION_INTERVAL)
@@ -204,11 +431,14 @@ async def level_prediction_loop():
             await asyncio.sleep(60)  # Wait a minute before retrying
 
 async def ht_prediction_loop():
-    global last_ht_prediction, ht_prediction_timestamp
     while True:
         try:
+            if not leader_lease.holds():
+                await asyncio.sleep(LEADER_LEASE_RENEW)
+                continue
             # Get current state for all bins from MongoDB
-            bins = list(db_mongo.bins_current.find({}, {'_id': 0, 'bin_id': 1, 'temperature': 1, 'humidity': 1}))
+            bins = await asyncio.to_thread(
+                lambda: list(db_mongo.bins_current.find({}, {'_id': 0, 'bin_id': 1, 'temperature': 1, 'humidity': 1})))
             now = pd.Timestamp.now()
             current_state = {
                 b['bin_id']: {
@@ -218,41 +448,87 @@ async def ht_prediction_loop():
                 }
                 for b in bins
             }
-            predictions = ht_predictor.predict(current_state)
-            last_ht_prediction = predictions
-            ht_prediction_timestamp = {bin_id: now.isoformat() for bin_id in predictions}
+            predictions = await inference_executor.submit("ht", predict_ht, current_state)
+            # Replace the snapshot every API worker reads
+            await asyncio.to_thread(ht_predictions.update, predictions,
+                                    {bin_id: now.isoformat() for bin_id in predictions}, True)
+            await asyncio.to_thread(save_predictions, "ht", predictions, now.to_pydatetime())
             print(f"HT predictions updated at {now}")
             await asyncio.sleep(HT_PREDICTION_INTERVAL)
         except Exception as e:
             print(f"Error in ht_prediction_loop: {e}")
             await asyncio.sleep(60)
 
+def reconcile_notifications() -> int:
+    """Evaluate every bin in bins_current, for readings the RTDB listener missed."""
+    alerts = 0
+    for bin_data in db_mongo.bins_current.find({}, {'_id': 0}):
+        try:
+            # Convert dict to TrashData model
+            bin_obj = TrashData(**bin_data)
+            # Already-alerted bins stay quiet, see NotificationService._process_bin_data
+            alerts += notification_service._process_bin_data(bin_obj.bin_id, bin_obj)
+        except Exception as e:
+            print(f"Error processing bin for scheduled notification: {e}")
+    return alerts
+
 async def scheduled_notification_loop():
+    # Low-frequency reconciliation; alerts are normally raised by handle_data_change
     while True:
         try:
-            # Get all current bins from MongoDB
-            bins = list(db_mongo.bins_current.find({}, {'_id': 0}))
-            for bin_data in bins:
-                try:
-                    # Convert dict to TrashData model
-                    bin_obj = TrashData(**bin_data)
-                    bin_id = bin_obj.bin_id
-                    # This will send notification if threshold is met
-                    notification_service._process_bin_data(bin_id, bin_obj)
-                except Exception as e:
-                    print(f"Error processing bin for scheduled notification: {e}")
-            print(f"Scheduled notifications checked at {datetime.now()}")
+            if not leader_lease.holds():
+                await asyncio.sleep(LEADER_LEASE_RENEW)
+                continue
+            alerts = await asyncio.to_thread(reconcile_notifications)
+            print(f"Notification reconciliation: {alerts} alerts at {datetime.now()}")
             await asyncio.sleep(NOTIFICATION_INTERVAL)
         except Exception as e:
             print(f"Error in scheduled_notification_loop: {e}")
             await asyncio.sleep(60)
 
+async def forecast_accuracy_loop():
+    while True:
+        try:
+            if not leader_lease.holds():
+                await asyncio.sleep(LEADER_LEASE_RENEW)
+                continue
+            if prediction_store is not None:
+                evaluated = await asyncio.to_thread(prediction_store.evaluate_matured)
+                print(f"Forecast accuracy updated: {evaluated} predictions evaluated at {datetime.now()}")
+            await asyncio.sleep(ACCURACY_EVALUATION_INTERVAL)
+        except Exception as e:
+            print(f"Error in forecast_accuracy_loop: {e}")
+            await asyncio.sleep(60)
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    if leadership_task is not None:
+        leadership_task.cancel()
+        await asyncio.gather(leadership_task, return_exceptions=True)
+    try:
+        # Before stepping down: only the leader writes the file
+        await asyncio.to_thread(classification_cache.save)
+    except Exception as e:
+        print(f"Failed to save classification cache: {e}")
+    if leader_active:
+        await stop_leader_duties()
+    try:
+        leader_lease.release()  # lets another worker take over right away
+    except Exception as e:
+        print(f"Failed to release leader lease: {e}")
+    await notification_dispatcher.stop()
+    inference_executor.shutdown()
+    route_jobs.shutdown()
+    report_jobs.shutdown()
+    shutdown_cluster_pool()
+
 # --- Include prediction endpoints router ---
 app.include_router(prediction_router)
 
 # --- Prediction endpoints ---
 @app.get("/prediction/ht")
 async def get_ht_prediction(bin_id: Optional[str] = None):
+    last_ht_prediction = ht_predictions.values()
     if not last_ht_prediction:
         raise HTTPException(status_code=404, detail="No HT prediction available yet")
     result = last_ht_prediction
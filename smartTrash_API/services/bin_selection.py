@@ -0,0 +1,154 @@
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from utils.constants import (
+    DETOUR_SCALE_KM,
+    KNAPSACK_GRID,
+    KNAPSACK_MAX_CELLS,
+    ROUTE_COST_WEIGHT,
+    SELECTION_WEIGHTS,
+)
+
+
+def bin_values(bins: List[Dict]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Priority value of each bin (fullness, waste volume and waste weight with
+    SELECTION_WEIGHTS), plus the waste volume and weight to collect.
+    Normalisations are computed once for the whole list.
+    """
+    fullness = np.array([b['capacity'] for b in bins], dtype=np.float64) / 100
+    volume = np.array([b['volume'] for b in bins], dtype=np.float64)
+    weight = np.array([b['weight'] for b in bins], dtype=np.float64)
+    waste_volume = volume * fullness
+    waste_weight = weight * fullness
+    max_volume = volume.max() or 1.0
+    max_weight = weight.max() or 1.0
+    values = (fullness * SELECTION_WEIGHTS['fullness']
+              + waste_volume / max_volume * SELECTION_WEIGHTS['volume']
+              + waste_weight / max_weight * SELECTION_WEIGHTS['weight'])
+    return values, waste_volume, waste_weight
+
+
+def detour_costs(matrix: np.ndarray, chunk: int = 1024) -> np.ndarray:
+    """
+    Estimated route distance added by each bin: half its two shortest links
+    to the container or another bin. matrix index 0 is the container.
+    """
+    n = len(matrix)
+    costs = np.zeros(n - 1)
+    if n < 2:
+        return costs
+    for start in range(1, n, chunk):
+        rows = matrix[start:start + chunk].copy()
+        rows[np.arange(len(rows)), np.arange(start, start + len(rows))] = np.inf
+        k = min(2, n - 1)
+        nearest = np.partition(rows, k - 1, axis=1)[:, :k]
+        costs[start - 1:start - 1 + len(rows)] = nearest.mean(axis=1)
+    return costs
+
+
+def greedy_selection(values: np.ndarray, volumes: np.ndarray, weights: np.ndarray,
+                     candidates: np.ndarray, capacity_volume: float, capacity_weight: float) -> List[int]:
+    """Deterministic fallback: highest value per unit of (relative) size first, ties by input order."""
+    size = volumes[candidates] / capacity_volume + weights[candidates] / capacity_weight
+    density = values[candidates] / np.maximum(size, 1e-12)
+    order = candidates[np.lexsort((candidates, -density))]
+    return fill_remaining([], order, volumes, weights, capacity_volume, capacity_weight)
+
+
+def fill_remaining(selected: List[int], order: np.ndarray, volumes: np.ndarray, weights: np.ndarray,
+                   capacity_volume: float, capacity_weight: float) -> List[int]:
+    """First-fit of the bins in `order` into the capacity left by `selected`."""
+    selected = list(selected)
+    chosen = set(selected)
+    used_volume = float(volumes[selected].sum()) if selected else 0.0
+    used_weight = float(weights[selected].sum()) if selected else 0.0
+    for i in order:
+        i = int(i)
+        if i in chosen:
+            continue
+        if used_volume + volumes[i] <= capacity_volume and used_weight + weights[i] <= capacity_weight:
+            selected.append(i)
+            chosen.add(i)
+            used_volume += volumes[i]
+            used_weight += weights[i]
+    return selected
+
+
+def knapsack_selection(values: np.ndarray, volumes: np.ndarray, weights: np.ndarray,
+                       candidates: np.ndarray, capacity_volume: float, capacity_weight: float,
+                       grid: int = KNAPSACK_GRID) -> List[int]:
+    """
+    Two-constraint 0/1 knapsack by dynamic programming on a grid x grid
+    discretisation of the capacities. Sizes are rounded up, so the result is
+    always feasible; capacity lost to rounding is then filled first-fit.
+    """
+    size_volume = np.ceil(volumes[candidates] / capacity_volume * grid - 1e-9).astype(int)
+    size_weight = np.ceil(weights[candidates] / capacity_weight * grid - 1e-9).astype(int)
+    best = np.zeros((grid + 1, grid + 1))
+    take = np.zeros((len(candidates), grid + 1, grid + 1), dtype=bool)
+    for k, (sv, sw, value) in enumerate(zip(size_volume, size_weight, values[candidates])):
+        if sv > grid or sw > grid:
+            continue
+        with_item = best[:grid + 1 - sv, :grid + 1 - sw] + value
+        improved = with_item > best[sv:, sw:]
+        take[k, sv:, sw:] = improved
+        best[sv:, sw:] = np.where(improved, with_item, best[sv:, sw:])
+
+    selected = []
+    a, b = grid, grid
+    for k in range(len(candidates) - 1, -1, -1):
+        if take[k, a, b]:
+            selected.append(int(candidates[k]))
+            a -= size_volume[k]
+            b -= size_weight[k]
+    selected.reverse()
+    order = candidates[np.argsort(-values[candidates], kind="stable")]
+    return fill_remaining(selected, order, volumes, weights, capacity_volume, capacity_weight)
+
+
+def select_bins(bins: List[Dict], capacity_volume: float, capacity_weight: float,
+                matrix: Optional[np.ndarray] = None,
+                route_cost_weight: float = ROUTE_COST_WEIGHT) -> Tuple[List[int], Dict]:
+    """
+    Choose which bins to collect with one truck: maximise the total priority
+    value under the volume and weight capacities, where each bin's value is
+    reduced by route_cost_weight per DETOUR_SCALE_KM of estimated detour.
+    Bins whose value does not cover their detour are only taken with the
+    capacity left over once the others are chosen.
+    matrix: distances with the container at index 0 and bins[i] at index i + 1
+    Returns (indices into bins ordered by priority, selection stats).
+    """
+    if not bins:
+        return [], {'method': 'none', 'candidates': 0, 'selected': 0, 'value': 0.0}
+    values, volumes, weights = bin_values(bins)
+    adjusted = values.copy()
+    if matrix is not None and route_cost_weight:
+        costs = detour_costs(matrix)
+        adjusted -= route_cost_weight * costs / DETOUR_SCALE_KM
+
+    fits = (volumes <= capacity_volume) & (weights <= capacity_weight)
+    candidates = np.flatnonzero(fits & (adjusted > 0))
+    costly = np.flatnonzero(fits & (adjusted <= 0))
+
+    if volumes[candidates].sum() <= capacity_volume and weights[candidates].sum() <= capacity_weight:
+        method, selected = 'all', candidates.tolist()
+    elif len(candidates) * (KNAPSACK_GRID + 1) ** 2 <= KNAPSACK_MAX_CELLS:
+        method = 'knapsack'
+        selected = knapsack_selection(adjusted, volumes, weights, candidates, capacity_volume, capacity_weight)
+    else:
+        method = 'greedy'
+        selected = greedy_selection(adjusted, volumes, weights, candidates, capacity_volume, capacity_weight)
+    if len(costly):
+        # Spare capacity still goes to full bins, least penalised first
+        order = costly[np.lexsort((costly, -adjusted[costly]))]
+        selected = fill_remaining(selected, order, volumes, weights, capacity_volume, capacity_weight)
+
+    selected.sort(key=lambda i: (-values[i], i))
+    return selected, {
+        'method': method,
+        'candidates': int(len(candidates)),
+        'selected': len(selected),
+        'value': round(float(values[selected].sum()), 4) if selected else 0.0,
+    }
@@ -0,0 +1,172 @@
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from PIL import Image
+
+from utils.constants import (
+    CLASSIFICATION_TOP_K,
+    CLASSIFICATION_CACHE_PATH,
+    CLASSIFICATION_CACHE_PHASH,
+    CLASSIFICATION_CACHE_PHASH_DISTANCE,
+    CLASSIFICATION_CACHE_SIZE,
+    CLASSIFICATION_CACHE_TTL,
+    TYPE_MODEL_PATH,
+)
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def model_fingerprint() -> str:
+    """What the cached results depend on: classifier version, quantisation, weights file and top-k."""
+    from others.prediction_store import model_version
+    try:
+        stat = os.stat(TYPE_MODEL_PATH)
+        weights = f"{stat.st_size}-{int(stat.st_mtime)}"
+    except OSError:
+        weights = "missing"
+    return f"{model_version('trash_type')}|{weights}|top{CLASSIFICATION_TOP_K}"
+
+
+def perceptual_hash(data: bytes) -> Optional[int]:
+    """64-bit difference hash (dHash): robust to re-encoding and resizing of the same photo."""
+    try:
+        image = Image.open(io.BytesIO(data))
+        image.draft("L", (64, 64))  # cheap reduced-size JPEG decode
+        pixels = list(image.convert("L").resize((9, 8), Image.BILINEAR).getdata())
+    except Exception:
+        return None
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            left = pixels[row * 9 + col]
+            right = pixels[row * 9 + col + 1]
+            value = (value << 1) | (1 if left > right else 0)
+    return value
+
+
+# --- Classification Cache ---
+class ClassificationCache:
+    """
+    Bounded LRU/TTL cache of classification results keyed by the SHA-256 of
+    the image bytes, with an optional perceptual hash to catch near-duplicates.
+    The on-disk copy records the model fingerprint and is dropped when the
+    classifier, its quantisation or its weights change. Every process loads
+    it; only the one that is not read_only (the leader API worker) saves it.
+    """
+
+    def __init__(self, max_entries: int = CLASSIFICATION_CACHE_SIZE,
+                 ttl: float = CLASSIFICATION_CACHE_TTL,
+                 use_phash: bool = CLASSIFICATION_CACHE_PHASH,
+                 phash_distance: int = CLASSIFICATION_CACHE_PHASH_DISTANCE,
+                 path: Optional[str] = CLASSIFICATION_CACHE_PATH,
+                 fingerprint: Optional[str] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.use_phash = use_phash
+        self.phash_distance = phash_distance
+        self.path = path
+        self.fingerprint = fingerprint or model_fingerprint()
+        self.read_only = False
+        self._entries = OrderedDict()  # key -> {"result", "phash", "created_at"}
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "near_hits": 0, "misses": 0, "evictions": 0}
+
+    def _expired(self, entry: Dict[str, Any], now: float) -> bool:
+        return now - entry["created_at"] > self.ttl
+
+    def lookup(self, data: bytes) -> Tuple[str, Optional[int], Optional[Dict[str, Any]]]:
+        """
+        Return (key, phash, result); result is None on a miss.
+        Blocking (hashes the whole image), call it off the event loop.
+        """
+        key = content_hash(data)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if not self._expired(entry, now):
+                    self._entries.move_to_end(key)
+                    self._stats["hits"] += 1
+                    return key, entry["phash"], entry["result"]
+                del self._entries[key]
+
+        phash = perceptual_hash(data) if self.use_phash else None
+        if phash is not None:
+            with self._lock:
+                for other_key, entry in reversed(self._entries.items()):
+                    if entry["phash"] is None or self._expired(entry, now):
+                        continue
+                    if (entry["phash"] ^ phash).bit_count() <= self.phash_distance:
+                        self._entries.move_to_end(other_key)
+                        self._stats["near_hits"] += 1
+                        return key, phash, entry["result"]
+
+        with self._lock:
+            self._stats["misses"] += 1
+        return key, phash, None
+
+    def put(self, key: str, phash: Optional[int], result: Dict[str, Any]):
+        with self._lock:
+            self._entries[key] = {"result": result, "phash": phash, "created_at": time.time()}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def load(self):
+        """Load the on-disk copy, dropping expired entries and results of another model."""
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                stored = json.load(f)
+        except Exception as e:
+            print(f"Failed to load classification cache: {e}")
+            return
+        fingerprint = stored.get("fingerprint") if isinstance(stored, dict) else None
+        if fingerprint != self.fingerprint:
+            print(f"Classification cache built for another model ({fingerprint}), starting empty")
+            return
+        entries = stored["entries"]
+        now = time.time()
+        with self._lock:
+            for key, entry in entries[-self.max_entries:]:
+                if not self._expired(entry, now):
+                    self._entries[key] = entry
+        print(f"Classification cache loaded: {len(self._entries)} entries")
+
+    def save(self):
+        """Write the cache to disk (LRU order is kept); no-op when read_only."""
+        if not self.path or self.read_only:
+            return
+        with self._lock:
+            entries = list(self._entries.items())
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"fingerprint": self.fingerprint, "entries": entries}, f)
+        os.replace(tmp_path, self.path)
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            size = len(self._entries)
+        lookups = stats["hits"] + stats["near_hits"] + stats["misses"]
+        return {
+            "size": size,
+            "max_entries": self.max_entries,
+            "fingerprint": self.fingerprint,
+            **stats,
+            "hit_rate": round((stats["hits"] + stats["near_hits"]) / lookups, 4) if lookups else 0.0,
+        }
+
+
+classification_cache = ClassificationCache()
@@ -0,0 +1,321 @@
+import math
+import multiprocessing
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from services.fleet_routing import bin_load
+from utils.constants import (CLUSTER_CAPACITY_SLACK, CLUSTER_DISPATCH_MARGIN, CLUSTER_MAX_BINS, CLUSTER_METHOD,
+                             CLUSTER_WORKERS, ROUTE_TIME_BUDGET)
+
+EARTH_RADIUS_KM = 6371.0088
+
+_pool = None
+_pool_ready = False  # every worker process has started and imported the solver
+_pool_lock = threading.Lock()
+
+
+def project(bins: List[Dict], origin: Dict) -> np.ndarray:
+    """Local equirectangular x/y in km around `origin`, plenty accurate at city scale."""
+    lat0 = math.radians(origin['location']['latitude'])
+    lon0 = math.radians(origin['location']['longitude'])
+    coords = np.radians(np.array([[b['location']['latitude'], b['location']['longitude']] for b in bins],
+                                 dtype=np.float64).reshape(-1, 2))
+    x = (coords[:, 1] - lon0) * math.cos(lat0) * EARTH_RADIUS_KM
+    y = (coords[:, 0] - lat0) * EARTH_RADIUS_KM
+    return np.column_stack([x, y])
+
+
+def partition_count(loads: np.ndarray, capacity: np.ndarray, max_bins: int = CLUSTER_MAX_BINS) -> int:
+    """Enough partitions for one truckload each, and for no partition to exceed max_bins."""
+    demand = (loads.sum(axis=0) / np.maximum(capacity, 1e-9)).max() * (1 + CLUSTER_CAPACITY_SLACK)
+    return int(min(len(loads), max(1, math.ceil(demand), math.ceil(len(loads) / max_bins))))
+
+
+def kmeans(xy: np.ndarray, k: int, iterations: int = 25, seed: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """Plain Lloyd k-means with k-means++ seeding. Returns (labels, centroids)."""
+    rng = np.random.default_rng(seed)
+    centroids = [xy[rng.integers(len(xy))]]
+    closest = ((xy - centroids[0]) ** 2).sum(axis=1)
+    for _ in range(1, k):
+        total = closest.sum()
+        pick = rng.choice(len(xy), p=closest / total) if total > 0 else rng.integers(len(xy))
+        centroids.append(xy[pick])
+        closest = np.minimum(closest, ((xy - xy[pick]) ** 2).sum(axis=1))
+    centroids = np.array(centroids)
+
+    labels = np.full(len(xy), -1)
+    for _ in range(iterations):
+        distances = ((xy[:, None, :] - centroids[None, :, :]) ** 2).sum(axis=2)
+        new_labels = distances.argmin(axis=1)
+        if np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+        for c in range(k):
+            members = labels == c
+            if members.any():
+                centroids[c] = xy[members].mean(axis=0)
+    return labels, centroids
+
+
+def balance(xy: np.ndarray, labels: np.ndarray, centroids: np.ndarray, loads: np.ndarray,
+            capacity: np.ndarray, max_bins: int = CLUSTER_MAX_BINS, rounds: int = 20) -> np.ndarray:
+    """
+    Move bins out of partitions over truck capacity (or max_bins) into the
+    nearest partition with room, cheapest moves first (smallest increase in
+    distance to the centroid). Partitions that still overflow keep their
+    extra bins; the per-partition selection drops them.
+    """
+    labels = labels.copy()
+    k = len(centroids)
+    for _ in range(rounds):
+        totals = np.zeros((k, 2))
+        np.add.at(totals, labels, loads)
+        counts = np.bincount(labels, minlength=k)
+        over = ((totals > capacity).any(axis=1)) | (counts > max_bins)
+        if not over.any():
+            break
+        distances = np.sqrt(((xy[:, None, :] - centroids[None, :, :]) ** 2).sum(axis=2))
+        moved = 0
+        for c in np.flatnonzero(over)[np.argsort(-(totals[over] / capacity).max(axis=1))]:
+            members = np.flatnonzero(labels == c)
+            others = distances[members].copy()
+            others[:, c] = np.inf
+            others[:, over] = np.inf  # never push bins into another overflowing partition
+            targets = others.argmin(axis=1)
+            penalty = others[np.arange(len(members)), targets] - distances[members, c]
+            for i in np.argsort(penalty):
+                if not ((totals[c] > capacity).any() or counts[c] > max_bins):
+                    break
+                if not np.isfinite(penalty[i]):
+                    break
+                b, t = members[i], targets[i]
+                if (totals[t] + loads[b] > capacity).any() or counts[t] + 1 > max_bins:
+                    continue
+                labels[b] = t
+                totals[c] -= loads[b]
+                totals[t] += loads[b]
+                counts[c] -= 1
+                counts[t] += 1
+                moved += 1
+        if not moved:
+            break
+        for c in range(k):
+            members = labels == c
+            if members.any():
+                centroids[c] = xy[members].mean(axis=0)
+    return labels
+
+
+def sweep(xy: np.ndarray, loads: np.ndarray, capacity: np.ndarray, k: int,
+          max_bins: int = CLUSTER_MAX_BINS) -> np.ndarray:
+    """
+    Classic sweep: bins sorted by polar angle around the container, cut into
+    consecutive sectors of about total demand / k, never above truck capacity.
+    The sweep starts at the widest angular gap so no sector straddles it.
+    """
+    angles = np.arctan2(xy[:, 1], xy[:, 0])
+    order = np.argsort(angles)
+    sorted_angles = angles[order]
+    gaps = np.diff(np.append(sorted_angles, sorted_angles[0] + 2 * np.pi))
+    order = np.roll(order, -(int(gaps.argmax()) + 1))
+
+    target = np.minimum(loads.sum(axis=0) / k, capacity)
+    per_sector = min(max_bins, math.ceil(len(xy) / k))
+    labels = np.empty(len(xy), dtype=int)
+    label, total, count = 0, np.zeros(2), 0
+    for b in order:
+        full = count and ((total + loads[b] > capacity).any() or count >= per_sector
+                          or (total >= target).all())
+        if full:
+            label, total, count = label + 1, np.zeros(2), 0
+        labels[b] = label
+        total += loads[b]
+        count += 1
+    # The sweep wraps around: a small last sector joins the first one when it fits
+    if label:
+        first = labels == 0
+        if (loads[first].sum(axis=0) + total <= capacity).all() and first.sum() + count <= max_bins:
+            labels[labels == label] = 0
+    return labels
+
+
+def partition_bins(bins: List[Dict], container: Dict, partitions: Optional[int] = None,
+                   method: str = CLUSTER_METHOD) -> List[List[int]]:
+    """Split bins into geographic partitions of about one truckload each (lists of bin indices)."""
+    if not bins:
+        return []
+    xy = project(bins, container)
+    loads = np.array([bin_load(b) for b in bins], dtype=np.float64).reshape(-1, 2)
+    capacity = np.array([container['volume'], container['weight']], dtype=np.float64)
+    k = min(len(bins), partitions or partition_count(loads, capacity))
+    if method == "sweep":
+        labels = sweep(xy, loads, capacity, k)
+    elif method == "kmeans":
+        labels, centroids = kmeans(xy, k)
+        if not partitions:  # an explicit partition count is kept as is
+            labels = balance(xy, labels, centroids, loads, capacity)
+    else:
+        raise ValueError(f"Unknown cluster method '{method}'")
+    groups = [np.flatnonzero(labels == c) for c in range(labels.max() + 1)]
+    groups = [g for g in groups if len(g)]
+    # Sectors in angular order around the container, so routes come out in a stable order
+    angle = [float(np.arctan2(*xy[g].mean(axis=0)[::-1])) for g in groups]
+    return [groups[i].tolist() for i in np.argsort(angle)]
+
+
+def solve_partition(data: Dict) -> Dict:
+    """Worker side: one partition through the single-truck pipeline (selection + tour)."""
+    from services.rotage import optimize_waste_collection
+
+    started_at = time.perf_counter()
+    ordered_bins, total_volume, total_weight, total_distance, stats = optimize_waste_collection(
+        {**data, 'mode': 'single'})
+    return {
+        'ordered_bins': ordered_bins,
+        'total_volume': total_volume,
+        'total_weight': total_weight,
+        'total_distance': total_distance,
+        'solve_time_s': round(time.perf_counter() - started_at, 4),
+        'solve_stats': stats,
+    }
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            from services.route_jobs import init_worker
+
+            _pool = ProcessPoolExecutor(max_workers=CLUSTER_WORKERS, mp_context=multiprocessing.get_context("spawn"),
+                                        initializer=init_worker)
+        return _pool
+
+
+def _worker_ready() -> int:
+    import services.rotage  # noqa: F401 -- the solver imports are part of a worker's start-up
+    return multiprocessing.current_process().pid
+
+
+def warm_cluster_pool() -> float:
+    """Start the partition workers and wait until they are ready; returns the seconds it took (0 when already warm)."""
+    global _pool_ready
+    if _pool_ready:
+        return 0.0
+    started_at = time.perf_counter()
+    pool = _get_pool()
+    # Submitted together, so the pool spawns one process per no-op instead of reusing an idle one
+    for future in [pool.submit(_worker_ready) for _ in range(CLUSTER_WORKERS)]:
+        future.result()
+    _pool_ready = True
+    return time.perf_counter() - started_at
+
+
+def shutdown_cluster_pool():
+    global _pool, _pool_ready
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+            _pool_ready = False
+
+
+def optimize_clustered_collection(data: Dict, progress: Optional[Callable[[Dict], None]] = None,
+                                  cancelled: Optional[Callable[[], bool]] = None) -> Tuple[List[Dict], float, float, float, Dict]:
+    """
+    Cluster-first, route-second: partition the bins into truckload-sized
+    areas, solve every area as its own /optimize problem in parallel worker
+    processes and return one route per partition (truck or trip).
+    Args:
+        data: /optimize request with mode "cluster", optionally partitions,
+              cluster_method and time_budget (wall-clock limit for all partitions)
+        cancelled: polled between partitions; partitions already being solved
+                   by a worker run to the end of their budget, only pending
+                   ones are dropped
+    Returns:
+        Same tuple as optimize_waste_collection; stats['routes'] holds the per-partition routes
+    """
+    started_at = time.perf_counter()
+    container = data['container']
+    bins = data['bins']
+    method = data.get('cluster_method') or CLUSTER_METHOD
+    time_budget = data.get('time_budget')
+    time_budget = ROUTE_TIME_BUDGET if time_budget is None else time_budget
+
+    if progress:
+        progress({'phase': 'partitioning'})
+    groups = partition_bins(bins, container, data.get('partitions'), method)
+    partition_time = time.perf_counter() - started_at
+
+    # Worker processes do not start pools of their own (route jobs already run in one)
+    parallel = len(groups) > 1 and multiprocessing.parent_process() is None
+    # Spawning the workers (imports included) is paid before the partitions get their budget
+    pool_start = warm_cluster_pool() if parallel else 0.0
+    # Partitions run in waves of CLUSTER_WORKERS (one after the other when not parallel),
+    # so each gets its share of what is left of the wall-clock limit
+    workers = min(CLUSTER_WORKERS, len(groups)) if parallel else 1
+    waves = math.ceil(len(groups) / workers) if groups else 1
+    overhead = time.perf_counter() - started_at + (CLUSTER_DISPATCH_MARGIN * waves if parallel else 0.0)
+    budget = max(time_budget - overhead, 0.0) / waves
+    requests = [{'container': container, 'bins': [bins[i] for i in group], 'time_budget': budget}
+                for group in groups]
+
+    results = [None] * len(requests)
+    was_cancelled = False
+    if parallel:
+        pool = _get_pool()
+        pending = {pool.submit(solve_partition, request): p for p, request in enumerate(requests)}
+        while pending:
+            done, _ = wait(pending, timeout=0.25, return_when=FIRST_COMPLETED)
+            for future in done:
+                results[pending.pop(future)] = future.result()
+            if progress:
+                progress({'phase': 'partitions', 'progress': 1 - len(pending) / len(requests)})
+            if cancelled and cancelled() and pending:
+                # Only futures not yet started can be cancelled; running partitions finish in the pool
+                for future in pending:
+                    future.cancel()
+                was_cancelled = True
+                break
+    else:
+        for p, request in enumerate(requests):
+            if cancelled and cancelled():
+                was_cancelled = True
+                break
+            results[p] = solve_partition(request)
+            if progress:
+                progress({'phase': 'partitions', 'progress': (p + 1) / len(requests)})
+
+    routes = []
+    for p, result in enumerate(results):
+        if result is None:
+            continue
+        stats = result.pop('solve_stats')
+        routes.append({**result, 'partition': p, 'bins': len(groups[p]),
+                       'timed_out': stats.get('timed_out', False)})
+
+    ordered_bins = [b for route in routes for b in route['ordered_bins']]
+    routed = {b['name'] for b in ordered_bins}
+    total_volume = sum(route['total_volume'] for route in routes)
+    total_weight = sum(route['total_weight'] for route in routes)
+    total_distance = sum(route['total_distance'] for route in routes)
+    stats = {
+        'mode': 'cluster',
+        'cluster_method': method,
+        'partitions': len(groups),
+        'partition_time_s': round(partition_time, 4),
+        'pool_start_s': round(pool_start, 4),
+        'partition_budget_s': round(budget, 4),
+        'parallel': parallel,
+        'partition_solve_times_s': [route['solve_time_s'] for route in routes],
+        'unassigned_bins': [b['name'] for b in bins if b['name'] not in routed],
+        'solve_time_s': round(time.perf_counter() - started_at, 4),
+        'routes': routes,
+    }
+    stats['budget_overshoot_s'] = round(max(stats['solve_time_s'] - time_budget, 0.0), 4)
+    if was_cancelled:
+        stats['cancelled'] = True
+    return ordered_bins, total_volume, total_weight, total_distance, stats
@@ -0,0 +1,265 @@
+import json
+import os
+import threading
+import time
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from utils.constants import (
+    DISTANCE_CACHE_DIR,
+    DISTANCE_CACHE_MAX_POINTS,
+    DISTANCE_CACHE_PRECISION,
+)
+
+MIN_CAPACITY = 256
+
+
+def coordinate_keys(coords: np.ndarray, precision: int = DISTANCE_CACHE_PRECISION) -> List[Tuple[float, float]]:
+    """Rounded (latitude, longitude) pairs used as cache keys (6 decimals is about 0.1 m)."""
+    return [tuple(row) for row in np.round(coords, precision).tolist()]
+
+
+# --- Distance Cache ---
+class DistanceCache:
+    """
+    Pairwise distance matrix for every point seen so far, keyed by rounded
+    coordinates. Only rows and columns of new points are computed; the matrix
+    is kept in memory and mirrored to a memory-mapped .npy plus a JSON index.
+    A moved bin simply becomes a new point. One process writes the files;
+    read-only caches load them once and keep their new distances in memory.
+    New points are appended to the .npy in place; a resize or compaction
+    writes a new generation of it (temp file + rename) before the index
+    points to it, and the index carries a checksum that load() verifies.
+    """
+
+    def __init__(self, method: str, directory: Optional[str] = DISTANCE_CACHE_DIR,
+                 max_points: int = DISTANCE_CACHE_MAX_POINTS, fingerprint: Optional[str] = None,
+                 read_only: bool = False):
+        self.method = method
+        self.fingerprint = fingerprint or method
+        self.read_only = read_only  # keep new distances in memory only (route job workers, follower API workers)
+        self.max_points = max_points
+        self.matrix_path = os.path.join(directory, f"distance_cache_{method}") if directory else None  # + .<generation>.npy
+        self.index_path = os.path.join(directory, f"distance_cache_{method}.json") if directory else None
+        self._index = {}  # key -> row
+        self._keys = []
+        self._coords = np.zeros((0, 2))
+        self._matrix = np.zeros((MIN_CAPACITY, MIN_CAPACITY), dtype=np.float32)
+        self._last_used = np.zeros(MIN_CAPACITY)
+        self._disk = None
+        self._disk_path = None
+        self._generation = 0
+        self._loaded = False
+        self._lock = threading.Lock()
+        self._stats = {"lookups": 0, "points_computed": 0, "compute_time_s": 0.0, "compactions": 0}
+
+    def __len__(self):
+        return len(self._keys)
+
+    def set_read_only(self, read_only: bool):
+        """Switch between writer and reader; a new writer reloads the files so it extends the latest copy."""
+        with self._lock:
+            if read_only == self.read_only:
+                return
+            self.read_only = read_only
+            self._disk = None
+            if not read_only:
+                self._loaded = False
+
+    def _ensure_capacity(self, size: int):
+        capacity = len(self._matrix)
+        if size <= capacity:
+            return
+        while capacity < size:
+            capacity *= 2
+        capacity = max(min(capacity, self.max_points), size)  # doubling past max_points would only waste memory
+        matrix = np.zeros((capacity, capacity), dtype=np.float32)
+        n = len(self._keys)
+        matrix[:n, :n] = self._matrix[:n, :n]
+        self._matrix = matrix
+        self._last_used = np.concatenate([self._last_used, np.zeros(capacity - len(self._last_used))])
+        self._disk = None  # a new generation of the on-disk file is written with the new shape
+
+    def _compact(self, keep: int):
+        """Drop the least recently used points so at most `keep` remain."""
+        n = len(self._keys)
+        rows = np.sort(np.argsort(-self._last_used[:n], kind="stable")[:keep])
+        self._keys = [self._keys[r] for r in rows]
+        self._index = {key: i for i, key in enumerate(self._keys)}
+        self._coords = self._coords[rows]
+        self._matrix[:keep, :keep] = self._matrix[np.ix_(rows, rows)]
+        self._last_used[:keep] = self._last_used[rows]
+        self._disk = None
+        self._stats["compactions"] += 1
+
+    def _add_points(self, keys: List[Tuple[float, float]], coords: np.ndarray):
+        from services.distance_matrix import compute_matrix
+
+        started_at = time.perf_counter()
+        if len(self._keys) + len(keys) > self.max_points:
+            self._compact(self.max_points - len(keys))
+        start = len(self._keys)
+        end = start + len(keys)
+        self._ensure_capacity(end)
+        self._keys.extend(keys)
+        self._coords = np.concatenate([self._coords, coords])
+        for i, key in enumerate(keys, start):
+            self._index[key] = i
+
+        # New rows against every point (old and new), mirrored into the columns
+        rows = compute_matrix(coords, self._coords[:end], method=self.method)
+        self._matrix[start:end, :end] = rows
+        self._matrix[:start, start:end] = rows[:, :start].T
+        self._stats["points_computed"] += len(keys)
+        self._stats["compute_time_s"] += time.perf_counter() - started_at
+        self._persist(start, end)
+
+    def matrix_for(self, coords: np.ndarray) -> np.ndarray:
+        """(n, n) distance matrix for the given [latitude, longitude] rows."""
+        self.load()
+        keys = coordinate_keys(coords)
+        with self._lock:
+            self._stats["lookups"] += 1
+            if len(set(keys)) > self.max_points:
+                # More points than the cache can hold: compute directly without caching
+                from services.distance_matrix import compute_matrix
+                return compute_matrix(coords, method=self.method)
+            missing = {}
+            known = []
+            for key, coord in zip(keys, coords):
+                if key in self._index:
+                    known.append(self._index[key])
+                elif key not in missing:
+                    missing[key] = coord
+            self._last_used[known] = time.time()  # protect them from compaction
+            if missing:
+                self._add_points(list(missing), np.array(list(missing.values())).reshape(-1, 2))
+            rows = np.array([self._index[key] for key in keys], dtype=int)
+            self._last_used[rows] = time.time()
+            return self._matrix[np.ix_(rows, rows)].astype(np.float64)
+
+    @staticmethod
+    def _checksum(matrix: np.ndarray, n: int) -> int:
+        """CRC of the last indexed row, the one a partial write would have left out."""
+        return zlib.crc32(np.ascontiguousarray(matrix[n - 1, :n], dtype=np.float32).tobytes()) if n else 0
+
+    def _write_generation(self, n: int, capacity: int):
+        """Write the matrix to a new generation file; readers of the current index keep the previous one."""
+        self._generation += 1
+        path = f"{self.matrix_path}.{self._generation}.npy"
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        disk = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.float32, shape=(capacity, capacity))
+        disk[:n, :n] = self._matrix[:n, :n]
+        disk.flush()
+        del disk
+        os.replace(tmp_path, path)
+        self._disk = np.load(path, mmap_mode="r+")
+        self._disk_path = path
+
+    def _persist(self, start: int, end: int):
+        """Write the new rows/columns to the memory-mapped file, then the index."""
+        if not self.matrix_path or self.read_only:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.matrix_path) or ".", exist_ok=True)
+            n = len(self._keys)
+            capacity = len(self._matrix)
+            stale = None
+            if self._disk is None or self._disk.shape[0] != capacity:
+                stale = self._disk_path
+                self._write_generation(n, capacity)
+            else:
+                # Only rows/columns past the indexed ones change, readers of the current index are unaffected
+                self._disk[start:end, :end] = self._matrix[start:end, :end]
+                self._disk[:start, start:end] = self._matrix[:start, start:end]
+                self._disk.flush()
+            tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"method": self.method, "fingerprint": self.fingerprint, "keys": self._keys,
+                           "file": os.path.basename(self._disk_path), "generation": self._generation,
+                           "checksum": self._checksum(self._matrix, n)}, f)
+            os.replace(tmp_path, self.index_path)
+            if stale and stale != self._disk_path and os.path.exists(stale):
+                os.remove(stale)
+        except Exception as e:
+            print(f"Failed to save distance cache: {e}")
+            self._disk = None
+
+    def load(self):
+        """Load the on-disk copy once (no-op when missing, unreadable or failing its checksum)."""
+        with self._lock:
+            if self._loaded:
+                return
+            self._loaded = True
+            if not self.index_path or not os.path.exists(self.index_path):
+                return
+            try:
+                with open(self.index_path, "r", encoding="utf-8") as f:
+                    index = json.load(f)
+                if index.get("fingerprint", index.get("method")) != self.fingerprint or "file" not in index:
+                    print("Distance cache on disk does not match, ignoring it")
+                    return
+                path = os.path.join(os.path.dirname(self.index_path), index["file"])
+                disk = np.load(path, mmap_mode="r" if self.read_only else "r+")
+                keys = [tuple(key) for key in index["keys"]]
+                n = len(keys)
+                if disk.shape[0] < n or self._checksum(disk, n) != index["checksum"]:
+                    print("Distance cache on disk is incomplete, ignoring it")
+                    return
+                self._ensure_capacity(disk.shape[0])
+                self._matrix[:n, :n] = disk[:n, :n]
+                self._keys = keys
+                self._index = {key: i for i, key in enumerate(keys)}
+                self._coords = np.array(keys, dtype=np.float64).reshape(-1, 2)
+                self._generation = index.get("generation", 0)
+                self._disk = disk if not self.read_only and disk.shape[0] == len(self._matrix) else None
+                self._disk_path = path
+                print(f"Distance cache loaded ({self.method}): {n} points")
+            except Exception as e:
+                print(f"Failed to load distance cache: {e}")
+
+    def metrics(self) -> Dict:
+        with self._lock:
+            return {
+                "method": self.method,
+                "points": len(self._keys),
+                "max_points": self.max_points,
+                **self._stats,
+                "compute_time_s": round(self._stats["compute_time_s"], 4),
+            }
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+_directory = DISTANCE_CACHE_DIR
+_read_only = False
+
+
+def set_cache_directory(directory: Optional[str]):
+    """Where new caches persist (None keeps them in memory only, e.g. for benchmarks); drops existing caches."""
+    global _directory
+    with _caches_lock:
+        _directory = directory
+        _caches.clear()
+
+
+def set_cache_writer(writer: bool):
+    """Whether this process writes the on-disk caches (only the leader API worker should); existing caches follow."""
+    global _read_only
+    with _caches_lock:
+        _read_only = not writer
+        caches = list(_caches.values())
+    for cache in caches:
+        cache.set_read_only(not writer)
+
+
+def get_distance_cache(method: str, fingerprint: Optional[str] = None) -> DistanceCache:
+    """One shared cache per distance method, replaced when the method's data (fingerprint) changes."""
+    with _caches_lock:
+        cache = _caches.get(method)
+        if cache is None or cache.fingerprint != (fingerprint or method):
+            cache = _caches[method] = DistanceCache(method, directory=_directory, fingerprint=fingerprint,
+                                                    read_only=_read_only)
+        return cache
@@ -0,0 +1,125 @@
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from utils.constants import DISTANCE_CACHE_ENABLED, DISTANCE_METHOD
+
+EARTH_RADIUS_KM = 6371.0088  # mean Earth radius
+
+
+def point_coordinates(points: List[Dict]) -> np.ndarray:
+    """(n, 2) array of [latitude, longitude] in degrees."""
+    return np.array(
+        [[p['location']['latitude'], p['location']['longitude']] for p in points],
+        dtype=np.float64,
+    ).reshape(-1, 2)
+
+
+def unit_vectors(coords: np.ndarray) -> np.ndarray:
+    """[latitude, longitude] in degrees -> points on the unit sphere (chord length grows with distance)."""
+    lat, lon = np.radians(coords[:, 0]), np.radians(coords[:, 1])
+    return np.column_stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)])
+
+
+def chord_to_km(chord):
+    """Unit-sphere chord length -> great-circle distance in km."""
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.clip(np.asarray(chord) / 2, 0.0, 1.0))
+
+
+def km_to_chord(km: float) -> float:
+    return float(2 * np.sin(min(km / (2 * EARTH_RADIUS_KM), np.pi / 2)))
+
+
+def haversine_matrix(coords_a: np.ndarray, coords_b: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Great-circle distances in km between every row of coords_a and coords_b
+    (coords_a with itself when coords_b is None), computed in one vectorised pass.
+    """
+    if coords_b is None:
+        coords_b = coords_a
+    lat_a, lon_a = np.radians(coords_a[:, 0])[:, None], np.radians(coords_a[:, 1])[:, None]
+    lat_b, lon_b = np.radians(coords_b[:, 0])[None, :], np.radians(coords_b[:, 1])[None, :]
+    a = (np.sin((lat_b - lat_a) / 2) ** 2
+         + np.cos(lat_a) * np.cos(lat_b) * np.sin((lon_b - lon_a) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def geodesic_matrix(coords_a: np.ndarray, coords_b: Optional[np.ndarray] = None) -> np.ndarray:
+    """Exact ellipsoidal distances in km (geopy), one call per pair."""
+    from geopy.distance import geodesic
+
+    symmetric = coords_b is None
+    if symmetric:
+        coords_b = coords_a
+    matrix = np.zeros((len(coords_a), len(coords_b)))
+    for i, coord_a in enumerate(coords_a):
+        for j in range(i + 1 if symmetric else 0, len(coords_b)):
+            matrix[i, j] = geodesic(tuple(coord_a), tuple(coords_b[j])).kilometers
+    if symmetric:
+        matrix += matrix.T
+    return matrix
+
+
+def compute_matrix(coords_a: np.ndarray, coords_b: Optional[np.ndarray] = None,
+                   method: str = DISTANCE_METHOD) -> np.ndarray:
+    if method == "geodesic":
+        return geodesic_matrix(coords_a, coords_b)
+    if method == "haversine":
+        return haversine_matrix(coords_a, coords_b)
+    if method == "road":
+        from services.road_network import get_road_network
+        return get_road_network().distance_matrix(coords_a, coords_b)
+    raise ValueError(f"Unknown distance method '{method}'")
+
+
+def method_fingerprint(method: str) -> str:
+    """Identifies the data behind a distance method, so cached distances are dropped when it changes."""
+    if method == "road":
+        from services.road_network import get_road_network
+        return get_road_network().fingerprint
+    return method
+
+
+# --- Distance Matrix ---
+class DistanceMatrix:
+    """
+    Pairwise distances (km) between points indexed by integer position,
+    so the optimiser works on array lookups instead of name-keyed dicts.
+    The first `transient` points (a truck's GPS fix, an ad-hoc depot) are
+    computed directly and kept out of the distance cache.
+    """
+
+    def __init__(self, points: List[Dict], method: str = DISTANCE_METHOD,
+                 use_cache: bool = DISTANCE_CACHE_ENABLED, transient: int = 0):
+        started_at = time.perf_counter()
+        self.names = [p['name'] for p in points]
+        self.coords = point_coordinates(points)
+        self.method = method
+        if use_cache:
+            from services.distance_cache import get_distance_cache
+            cached = get_distance_cache(method, method_fingerprint(method)).matrix_for(self.coords[transient:])
+            if transient:
+                # Distances are symmetric: the transient rows mirror into their columns
+                rows = compute_matrix(self.coords[:transient], self.coords, method=method)
+                self.matrix = np.empty((len(self.coords), len(self.coords)))
+                self.matrix[:transient] = rows
+                self.matrix[transient:, :transient] = rows[:, transient:].T
+                self.matrix[transient:, transient:] = cached
+            else:
+                self.matrix = cached
+        else:
+            self.matrix = compute_matrix(self.coords, method=method)
+        self.build_time = time.perf_counter() - started_at
+
+    def __len__(self):
+        return len(self.names)
+
+    def distance(self, i: int, j: int) -> float:
+        return float(self.matrix[i, j])
+
+    def path_length(self, path: List[int]) -> float:
+        if len(path) < 2:
+            return 0.0
+        path = np.asarray(path)
+        return float(self.matrix[path[:-1], path[1:]].sum())
@@ -0,0 +1,283 @@
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from services.distance_matrix import DistanceMatrix
+from services.tsp_solver import route_length, solve_tsp
+from utils.constants import ROUTE_TIME_BUDGET, SAVINGS_NEIGHBOURS
+
+EPSILON = 1e-9
+
+
+def bin_load(bin: Dict) -> Tuple[float, float]:
+    """Waste volume and weight to collect from a bin."""
+    fill = bin['capacity'] / 100
+    return bin['volume'] * fill, bin['weight'] * fill
+
+
+def fits_some_truck(volume: float, weight: float, trucks: List[Dict]) -> bool:
+    return any(volume <= t['volume'] and weight <= t['weight'] for t in trucks)
+
+
+def savings_pairs(matrix: np.ndarray, neighbours: int) -> List[Tuple[int, int]]:
+    """
+    Clarke-Wright savings s(i, j) = d(0, i) + d(0, j) - d(i, j), restricted to
+    each bin's nearest neighbours, in decreasing order.
+    """
+    n = len(matrix) - 1
+    if n < 2:
+        return []
+    k = min(neighbours, n - 1)
+    bins_matrix = matrix[1:, 1:].copy()
+    np.fill_diagonal(bins_matrix, np.inf)
+    nearest = np.argpartition(bins_matrix, k - 1, axis=1)[:, :k]
+    i_idx = np.repeat(np.arange(n), k)
+    j_idx = nearest.ravel()
+    keep = i_idx < j_idx
+    keep |= ~np.isin(i_idx * n + j_idx, j_idx * n + i_idx)  # pair only listed from one side
+    i_idx, j_idx = i_idx[keep] + 1, j_idx[keep] + 1
+    savings = matrix[0, i_idx] + matrix[0, j_idx] - matrix[i_idx, j_idx]
+    order = np.argsort(-savings, kind="stable")
+    return [(int(i_idx[o]), int(j_idx[o])) for o in order if savings[o] > 0]
+
+
+def clarke_wright(matrix: np.ndarray, loads: np.ndarray, trucks: List[Dict],
+                  nodes: List[int], neighbours: int = SAVINGS_NEIGHBOURS) -> List[List[int]]:
+    """Parallel savings: start with one route per bin and merge route ends while a truck can carry the result."""
+    routes = {i: [i] for i in nodes}
+    route_of = {i: i for i in nodes}
+    route_load = {i: loads[i].copy() for i in nodes}
+
+    for i, j in savings_pairs(matrix, neighbours):
+        if i not in route_of or j not in route_of:
+            continue
+        ri, rj = route_of[i], route_of[j]
+        if ri == rj:
+            continue
+        a, b = routes[ri], routes[rj]
+        if i not in (a[0], a[-1]) or j not in (b[0], b[-1]):
+            continue  # only route ends can be joined
+        load = route_load[ri] + route_load[rj]
+        if not fits_some_truck(load[0], load[1], trucks):
+            continue
+        if a[-1] != i:
+            a = a[::-1]
+        if b[0] != j:
+            b = b[::-1]
+        routes[ri] = a + b
+        route_load[ri] = load
+        for node in b:
+            route_of[node] = ri
+        del routes[rj], route_load[rj]
+
+    return list(routes.values())
+
+
+def assign_routes(routes: List[List[int]], loads: np.ndarray,
+                  trucks: List[Dict]) -> Tuple[Dict[int, List[int]], List[int]]:
+    """
+    Give each route to the smallest free truck that can carry it, biggest
+    routes first. Routes that no free truck can carry whole are then cut
+    into pieces that fill the remaining trucks, largest truck first.
+    Returns ({truck index: route}, bins left without a truck); see insert_leftovers.
+    """
+    def route_total(route):
+        return loads[route].sum(axis=0)
+
+    order = sorted(range(len(routes)), key=lambda r: tuple(-route_total(routes[r])))
+    free = sorted(range(len(trucks)), key=lambda t: (trucks[t]['volume'], trucks[t]['weight']))
+    assigned, leftover = {}, []
+    for r in order:
+        volume, weight = route_total(routes[r])
+        for t in free:
+            if volume <= trucks[t]['volume'] and weight <= trucks[t]['weight']:
+                assigned[t] = routes[r]
+                free.remove(t)
+                break
+        else:
+            leftover.append(routes[r])
+
+    # Leftover routes are spatially coherent, so consecutive bins make a compact piece
+    remaining = [node for route in leftover for node in route]
+    for t in reversed(free):
+        if not remaining:
+            break
+        capacity = np.array([trucks[t]['volume'], trucks[t]['weight']])
+        load = np.zeros(2)
+        piece, rest = [], []
+        for node in remaining:
+            if np.all(load + loads[node] <= capacity):
+                piece.append(node)
+                load += loads[node]
+            else:
+                rest.append(node)
+        if piece:
+            assigned[t] = piece
+        remaining = rest
+    return assigned, remaining
+
+
+def insert_leftovers(matrix: np.ndarray, loads: np.ndarray, trucks: List[Dict],
+                     assigned: Dict[int, List[int]], leftover: List[int]) -> List[int]:
+    """
+    Insert bins left without a truck into routes with spare capacity, at the
+    cheapest feasible position (largest bins first). Returns the bins that still fit nowhere.
+    """
+    route_load = {t: loads[route].sum(axis=0) for t, route in assigned.items()}
+    for t in range(len(trucks)):
+        if t not in assigned:
+            assigned[t], route_load[t] = [], np.zeros(2)
+    remaining = []
+    for node in sorted(leftover, key=lambda i: tuple(-loads[i])):
+        best = None
+        for t, target in assigned.items():
+            load = route_load[t] + loads[node]
+            if load[0] > trucks[t]['volume'] or load[1] > trucks[t]['weight']:
+                continue
+            tour = np.array([0] + target + [0])
+            cost = matrix[tour[:-1], node] + matrix[node, tour[1:]] - matrix[tour[:-1], tour[1:]]
+            p = int(np.argmin(cost))
+            if best is None or cost[p] < best[0]:
+                best = (cost[p], t, p)
+        if best is None:
+            remaining.append(node)
+            continue
+        _, t, p = best
+        assigned[t].insert(p, node)
+        route_load[t] = route_load[t] + loads[node]
+    for t in [t for t, route in assigned.items() if not route]:
+        del assigned[t]
+    return remaining
+
+
+def relocate(matrix: np.ndarray, loads: np.ndarray, trucks: List[Dict],
+             assigned: Dict[int, List[int]], deadline: float) -> int:
+    """Inter-route local search: move single bins to the cheapest position in another truck's route."""
+    moves = 0
+    improved = True
+    while improved and time.perf_counter() < deadline:
+        improved = False
+        for t_from in list(assigned):
+            for node in list(assigned[t_from]):
+                if time.perf_counter() > deadline:
+                    return moves
+                source = [0] + assigned[t_from] + [0]
+                k = source.index(node)
+                gain = matrix[source[k - 1], node] + matrix[node, source[k + 1]] - matrix[source[k - 1], source[k + 1]]
+                best = None
+                for t_to, target in assigned.items():
+                    if t_to == t_from:
+                        continue
+                    load = loads[target].sum(axis=0) + loads[node] if target else loads[node]
+                    if load[0] > trucks[t_to]['volume'] or load[1] > trucks[t_to]['weight']:
+                        continue
+                    tour = np.array([0] + target + [0])
+                    cost = matrix[tour[:-1], node] + matrix[node, tour[1:]] - matrix[tour[:-1], tour[1:]]
+                    p = int(np.argmin(cost))
+                    if cost[p] < gain - EPSILON and (best is None or cost[p] < best[0]):
+                        best = (cost[p], t_to, p)
+                if best is not None:
+                    _, t_to, p = best
+                    assigned[t_from].remove(node)
+                    assigned[t_to].insert(p, node)
+                    moves += 1
+                    improved = True
+    return moves
+
+
+def optimize_fleet_collection(data: Dict, progress: Optional[Callable[[Dict], None]] = None,
+                              cancelled: Optional[Callable[[], bool]] = None) -> Dict:
+    """
+    Capacitated multi-truck routing (CVRP): every route starts and ends at the depot.
+    Args:
+        data: Dictionary with trucks, bins, optional depot location and time budget
+        progress: called with {'phase', 'progress', 'best'} updates while solving (used by route jobs)
+        cancelled: returns True to stop improving and return the current plan
+    Returns:
+        Dictionary with one route per truck (ordered bins and load totals),
+        bins that no truck could take, total distance and solver stats
+    """
+    started_at = time.perf_counter()
+    trucks = data['trucks']
+    bins = data['bins']
+    if not trucks:
+        raise ValueError("At least one truck is required")
+    time_budget = data.get('time_budget')
+    time_budget = ROUTE_TIME_BUDGET if time_budget is None else time_budget
+    deadline = started_at + time_budget
+    depot = {'name': 'depot', 'location': data.get('depot') or trucks[0]['location']}
+
+    if progress:
+        progress({'phase': 'distances'})
+    distances = DistanceMatrix([depot] + bins, transient=1)  # an ad-hoc depot is not cached
+    matrix = distances.matrix
+    loads = np.array([[0.0, 0.0]] + [bin_load(b) for b in bins])
+
+    # Bins too heavy or too big for every truck can never be collected
+    nodes = [i for i in range(1, len(bins) + 1) if fits_some_truck(loads[i][0], loads[i][1], trucks)]
+    unassigned = sorted(set(range(1, len(bins) + 1)) - set(nodes))
+
+    routes = clarke_wright(matrix, loads, trucks, nodes)
+    assigned, leftover = assign_routes(routes, loads, trucks)
+    unassigned.extend(insert_leftovers(matrix, loads, trucks, assigned, leftover))
+    savings_time = time.perf_counter() - started_at
+
+    def report(phase, done):
+        if progress:
+            plan = {trucks[t]['name']: [bins[i - 1]['name'] for i in route] for t, route in assigned.items()}
+            length = sum(route_length(matrix, np.array([0] + route + [0])) for route in assigned.values())
+            progress({'phase': phase, 'progress': done, 'best': {'routes': plan, 'total_distance': length}})
+
+    report('construction', 0.0)
+    relocate_moves = 0
+    if not (cancelled and cancelled()):
+        relocate_moves = relocate(matrix, loads, trucks, assigned, started_at + time_budget / 2)
+
+    # Intra-route improvement, sharing the remaining budget between routes
+    route_stats = []
+    remaining = max(deadline - time.perf_counter(), 0.0)
+    for k, (t, route) in enumerate(assigned.items()):
+        if cancelled and cancelled():
+            break
+        report('improving', k / len(assigned))
+        path, _, stats = solve_tsp(matrix, 0, route, time_budget=remaining / max(len(assigned), 1), closed=True,
+                                   cancelled=cancelled)
+        assigned[t] = path[1:-1]
+        route_stats.append(stats)
+    report('improving', 1.0)
+
+    result_routes = []
+    for t, truck in enumerate(trucks):
+        route = assigned.get(t, [])
+        ordered_bins = []
+        for index in route:
+            bin = bins[index - 1]
+            bin['distance'] = distances.distance(0, index)
+            ordered_bins.append(bin)
+        total = loads[route].sum(axis=0) if route else np.zeros(2)
+        result_routes.append({
+            'truck': truck['name'],
+            'ordered_bins': ordered_bins,
+            'total_volume': float(total[0]),
+            'total_weight': float(total[1]),
+            'total_distance': route_length(matrix, np.array([0] + route + [0])) if route else 0.0,
+        })
+
+    return {
+        'routes': result_routes,
+        'unassigned_bins': [bins[i - 1] for i in sorted(unassigned)],
+        'total_distance': sum(r['total_distance'] for r in result_routes),
+        'solve_stats': {
+            'construction': 'clarke_wright',
+            'savings_routes': len(routes),
+            'distance_time_s': round(distances.build_time, 4),
+            'savings_time_s': round(savings_time, 4),
+            'relocate_moves': relocate_moves,
+            'two_opt_moves': sum(s['two_opt_moves'] for s in route_stats),
+            'or_opt_moves': sum(s['or_opt_moves'] for s in route_stats),
+            'solve_time_s': round(time.perf_counter() - started_at, 4),
+            'time_budget_s': time_budget,
+            'cancelled': bool(cancelled and cancelled()),
+        },
+    }
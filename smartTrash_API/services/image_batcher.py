@@ -0,0 +1,104 @@
+import asyncio
+from typing import Any, Dict, List
+
+from services.inference_executor import inference_executor
+from services.model_registry import model_registry
+from utils.constants import BATCH_MAX_SIZE, BATCH_MAX_WAIT_MS
+
+
+def _prepare(data: bytes):
+    return model_registry.get("trash_type").prepare_image_bytes(data)
+
+
+def _classify_batch(images: List[Any]) -> List[Dict[str, Any]]:
+    return model_registry.get("trash_type").predict_batch(images)
+
+
+# --- Image Micro-Batcher ---
+class ImageMicroBatcher:
+    """
+    Collects images from concurrent requests for a few milliseconds and
+    classifies them in a single batched forward pass.
+    """
+
+    def __init__(self, max_batch_size: int = BATCH_MAX_SIZE, max_wait_ms: float = BATCH_MAX_WAIT_MS):
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue = None
+        self._collector = None
+        self._batch_tasks = set()  # running batches, referenced until they finish
+        self._stats = {"images": 0, "batches": 0, "max_batch": 0}
+
+    def _ensure_collector(self):
+        if self._collector is None or self._collector.done():
+            self._queue = asyncio.Queue()
+            self._collector = asyncio.create_task(self._collect())
+
+    async def prepare(self, data: bytes):
+        """Decode uploaded image bytes into a model input tensor, off the event loop."""
+        return await inference_executor.submit("preprocess", _prepare, data)
+
+    async def classify(self, data: bytes) -> Dict[str, Any]:
+        """Decode the image bytes and classify them as part of the next batch."""
+        image = await self.prepare(data)
+        return (await self.classify_many([image]))[0]
+
+    async def classify_many(self, images: List[Any]) -> List[Dict[str, Any]]:
+        """Queue already prepared image tensors and wait for their results."""
+        self._ensure_collector()
+        loop = asyncio.get_running_loop()
+        futures = []
+        for image in images:
+            future = loop.create_future()
+            await self._queue.put((image, future))
+            futures.append(future)
+        return list(await asyncio.gather(*futures))
+
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            # Run the batch without blocking collection of the next one
+            task = asyncio.create_task(self._run_batch(batch))
+            self._batch_tasks.add(task)
+            task.add_done_callback(self._batch_tasks.discard)
+
+    async def _run_batch(self, batch):
+        images = [image for image, _ in batch]
+        self._stats["images"] += len(batch)
+        self._stats["batches"] += 1
+        self._stats["max_batch"] = max(self._stats["max_batch"], len(batch))
+        try:
+            results = await inference_executor.submit("trash_type", _classify_batch, images)
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+
+    def metrics(self) -> Dict[str, Any]:
+        batches = self._stats["batches"] or 1
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "images": self._stats["images"],
+            "batches": self._stats["batches"],
+            "avg_batch_size": round(self._stats["images"] / batches, 2),
+            "largest_batch": self._stats["max_batch"],
+            "queued": self._queue.qsize() if self._queue else 0,
+            "running_batches": len(self._batch_tasks),
+        }
+
+
+image_batcher = ImageMicroBatcher()
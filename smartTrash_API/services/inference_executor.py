@@ -0,0 +1,136 @@
+import asyncio
+import functools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+from utils.constants import (
+    INFERENCE_INTEROP_THREADS,
+    INFERENCE_MODEL_CONCURRENCY,
+    INFERENCE_TORCH_THREADS,
+    INFERENCE_WORKERS,
+)
+
+
+# --- Inference Executor ---
+class InferenceExecutor:
+    """
+    Runs blocking model inference in a dedicated thread pool so the event loop
+    keeps serving HTTP requests while predictions are computed.
+    Each model has its own concurrency cap. torch's intra-op thread count is
+    process-wide, so it is set once for every model: jobs never wait on each
+    other's setting.
+    """
+
+    def __init__(self, max_workers: int = INFERENCE_WORKERS,
+                 model_concurrency: Dict[str, int] = None,
+                 torch_threads: int = INFERENCE_TORCH_THREADS,
+                 interop_threads: int = INFERENCE_INTEROP_THREADS):
+        self.max_workers = max_workers
+        self.model_concurrency = dict(model_concurrency or INFERENCE_MODEL_CONCURRENCY)
+        self.torch_threads = torch_threads
+        self.interop_threads = interop_threads
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self._interop_lock = threading.Lock()
+        self._interop_configured = False
+        self._semaphores = {}
+        self._stats = {}
+
+    def _init_worker(self):
+        # torch is imported here so the executor itself stays cheap to import
+        import torch
+        torch.set_num_threads(self.torch_threads)
+        with self._interop_lock:
+            if self._interop_configured:
+                return
+            self._interop_configured = True
+            # inter-op threads can only be set once per process
+            try:
+                torch.set_num_interop_threads(self.interop_threads)
+            except RuntimeError as e:
+                print(f"Could not set torch inter-op threads: {e}")
+
+    def _get_pool(self) -> ThreadPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix="inference",
+                    initializer=self._init_worker,
+                )
+            return self._pool
+
+    def _get_semaphore(self, model_name: str) -> asyncio.Semaphore:
+        if model_name not in self._semaphores:
+            limit = self.model_concurrency.get(model_name, 1)
+            self._semaphores[model_name] = asyncio.Semaphore(limit)
+        return self._semaphores[model_name]
+
+    def _get_stats(self, model_name: str) -> Dict[str, Any]:
+        if model_name not in self._stats:
+            self._stats[model_name] = {
+                "queued": 0,
+                "running": 0,
+                "completed": 0,
+                "errors": 0,
+                "wait_time_total": 0.0,
+                "run_time_total": 0.0,
+            }
+        return self._stats[model_name]
+
+    async def submit(self, model_name: str, fn: Callable, *args, **kwargs):
+        """Run fn(*args, **kwargs) in the pool and await its result."""
+        stats = self._get_stats(model_name)
+        semaphore = self._get_semaphore(model_name)
+        submitted_at = time.perf_counter()
+        stats["queued"] += 1
+        async with semaphore:
+            stats["queued"] -= 1
+            stats["running"] += 1
+            started_at = time.perf_counter()
+            try:
+                loop = asyncio.get_running_loop()
+                result = await loop.run_in_executor(self._get_pool(), functools.partial(fn, *args, **kwargs))
+                stats["completed"] += 1
+                return result
+            except Exception:
+                stats["errors"] += 1
+                raise
+            finally:
+                stats["running"] -= 1
+                stats["wait_time_total"] += started_at - submitted_at
+                stats["run_time_total"] += time.perf_counter() - started_at
+
+    def metrics(self) -> Dict[str, Any]:
+        """Queue depth, running jobs and mean timings per model (averaged over successful and failed jobs)."""
+        models = {}
+        for model_name, stats in self._stats.items():
+            finished = (stats["completed"] + stats["errors"]) or 1
+            models[model_name] = {
+                "queued": stats["queued"],
+                "running": stats["running"],
+                "completed": stats["completed"],
+                "errors": stats["errors"],
+                "max_concurrency": self.model_concurrency.get(model_name, 1),
+                "avg_wait_ms": round(stats["wait_time_total"] / finished * 1000, 2),
+                "avg_run_ms": round(stats["run_time_total"] / finished * 1000, 2),
+            }
+        return {
+            "workers": self.max_workers,
+            "torch_threads": self.torch_threads,
+            "interop_threads": self.interop_threads,
+            "queue_depth": sum(s["queued"] for s in self._stats.values()),
+            "models": models,
+        }
+
+    def shutdown(self):
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+
+# Shared executor for background loops and prediction endpoints
+inference_executor = InferenceExecutor()
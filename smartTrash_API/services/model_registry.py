@@ -0,0 +1,114 @@
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from utils.constants import QUANTIZATION, REQUIRED_MODELS, TYPE_MODEL_PATH
+
+
+# --- Model Registry ---
+class ModelRegistry:
+    """
+    Loads each model once, on first use or through a background warm-up,
+    so importing the API does not pay for torch and the model weights.
+    Only required models gate readiness; an optional one that fails to load
+    only disables the endpoints using it.
+    """
+
+    def __init__(self):
+        self.db_mongo = None  # connection the loaders warm-start from, see bind()
+        self._required = set()
+        self._loaders = {}
+        self._models = {}
+        self._locks = {}
+        self._status = {}
+
+    def bind(self, db_mongo):
+        self.db_mongo = db_mongo
+
+    def register(self, name: str, loader: Callable[[], Any], required: bool = True):
+        self._loaders[name] = loader
+        if required:
+            self._required.add(name)
+        self._locks[name] = threading.Lock()
+        self._status[name] = {"status": "not_loaded", "load_time_s": None, "error": None}
+
+    def get(self, name: str) -> Any:
+        """Return the model, loading it if needed (thread-safe)."""
+        if name in self._models:
+            return self._models[name]
+        if name not in self._loaders:
+            raise KeyError(f"Unknown model '{name}'")
+        with self._locks[name]:
+            if name not in self._models:
+                self._load(name)
+        return self._models[name]
+
+    def _load(self, name: str):
+        status = self._status[name]
+        status.update({"status": "loading", "error": None})
+        started_at = time.perf_counter()
+        try:
+            self._models[name] = self._loaders[name]()
+        except Exception as e:
+            status.update({"status": "error", "error": str(e)})
+            raise
+        status.update({
+            "status": "ready",
+            "load_time_s": round(time.perf_counter() - started_at, 3),
+        })
+        print(f"Model '{name}' loaded in {status['load_time_s']}s")
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self._models
+
+    def warm_up(self, names: Optional[Iterable[str]] = None) -> threading.Thread:
+        """Load models in a background thread."""
+        names = list(names or self._loaders)
+
+        def load_all():
+            for name in names:
+                try:
+                    self.get(name)
+                except Exception as e:
+                    print(f"Failed to load model '{name}': {e}")
+
+        thread = threading.Thread(target=load_all, name="model-warmup", daemon=True)
+        thread.start()
+        return thread
+
+    def status(self) -> Dict[str, Any]:
+        models = {name: {**status, "required": name in self._required} for name, status in self._status.items()}
+        return {
+            "ready": all(models[name]["status"] == "ready" for name in self._required),
+            "failed": [name for name, s in models.items() if s["status"] == "error"],
+            "models": models,
+        }
+
+
+# --- Model loaders (heavy imports stay inside) ---
+def load_level_model():
+    from predictions import predictionLvl
+    if model_registry.db_mongo is None:
+        print("No MongoDB connection, level predictor starts without history")
+        return predictionLvl
+    try:
+        predictionLvl.warm_start(model_registry.db_mongo.get_recent_readings())
+    except Exception as e:
+        print(f"Failed to warm-start level predictor: {e}")
+    return predictionLvl
+
+
+def load_ht_model():
+    from predictions.predictionTH import HTPredictor
+    return HTPredictor(db_mongo=model_registry.db_mongo)
+
+
+def load_trash_type_model():
+    from predictions.prediction_type import TypePredictionmodel
+    return TypePredictionmodel(file_path=TYPE_MODEL_PATH, quantization=QUANTIZATION.get("trash_type"))
+
+
+model_registry = ModelRegistry()
+model_registry.register("level", load_level_model, required="level" in REQUIRED_MODELS)
+model_registry.register("ht", load_ht_model, required="ht" in REQUIRED_MODELS)
+model_registry.register("trash_type", load_trash_type_model, required="trash_type" in REQUIRED_MODELS)
@@ -0,0 +1,293 @@
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+from firebase_admin import exceptions, messaging
+
+from services.notification_transport import NotificationTransport
+from utils.constants import (
+    NOTIFY_BACKOFF_BASE,
+    NOTIFY_BACKOFF_MAX,
+    NOTIFY_DEAD_LETTER_SIZE,
+    NOTIFY_DEDUP_WINDOW,
+    NOTIFY_MAX_RETRIES,
+    NOTIFY_TOPIC_BURST,
+    NOTIFY_TOPIC_RATE,
+    NOTIFY_WORKERS,
+)
+
+TRANSIENT_ERRORS = (
+    exceptions.UnavailableError,
+    exceptions.InternalError,
+    exceptions.DeadlineExceededError,
+    exceptions.ResourceExhaustedError,  # includes messaging.QuotaExceededError
+    exceptions.UnknownError,
+)
+
+
+def is_transient(error: Optional[Exception]) -> bool:
+    """FCM errors worth retrying; network and other non-Firebase errors are retried too."""
+    if isinstance(error, exceptions.FirebaseError):
+        return isinstance(error, TRANSIENT_ERRORS)
+    return True
+
+
+class TokenBucket:
+    """`rate` messages per second on average, bursts of up to `burst`. Used from the event loop only."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self) -> bool:
+        """Take one token if one is available right now."""
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    async def acquire(self) -> float:
+        """Take one token, waiting for it if needed; returns the seconds waited."""
+        started_at = time.monotonic()
+        while not self.try_acquire():
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+        return time.monotonic() - started_at
+
+
+# --- Dead Letter Store ---
+class DeadLetterStore:
+    """Notifications that could not be delivered: kept in memory and, when given, in a Mongo collection."""
+
+    def __init__(self, collection=None, max_entries: int = NOTIFY_DEAD_LETTER_SIZE):
+        self.collection = collection
+        self._entries = deque(maxlen=max_entries)
+        self._lock = threading.Lock()
+        self.total = 0
+
+    def add(self, item: Dict[str, Any], reason: str):
+        message = item['message']
+        entry = {
+            'key': list(item['key']) if item['key'] else None,
+            'description': item['description'],
+            'topic': message.topic,
+            'title': message.notification.title if message.notification else None,
+            'body': message.notification.body if message.notification else None,
+            'data': dict(message.data or {}),
+            'attempts': item['attempts'],
+            'reason': reason,
+            'submitted_at': item['submitted_at'],
+            'failed_at': time.time(),
+        }
+        with self._lock:
+            self._entries.append(entry)
+            self.total += 1
+        print(f"Notification dead-lettered ({reason}): {item['description']}")
+        if self.collection is not None:
+            try:
+                self.collection.insert_one(dict(entry))
+            except Exception as e:
+                print(f"Failed to store dead-lettered notification: {e}")
+
+    def recent(self, limit: int = 100) -> List[Dict[str, Any]]:
+        with self._lock:
+            return list(self._entries)[-limit:][::-1]
+
+
+# --- Notification Dispatcher ---
+class NotificationDispatcher:
+    """
+    Delivers FCM messages from an asyncio queue with a pool of worker tasks:
+    batches of whatever is queued (up to the transport batch size), a token
+    bucket per topic, exponential-backoff retries for transient errors, a
+    dedup window per (bin, alert type) and a dead-letter store for the rest.
+    submit() is thread-safe, the RTDB listener thread calls it directly.
+    """
+
+    def __init__(self, transport: NotificationTransport, workers: int = NOTIFY_WORKERS,
+                 dead_letters: Optional[DeadLetterStore] = None,
+                 topic_rate: float = NOTIFY_TOPIC_RATE, topic_burst: int = NOTIFY_TOPIC_BURST,
+                 max_retries: int = NOTIFY_MAX_RETRIES, dedup_window: float = NOTIFY_DEDUP_WINDOW):
+        self.transport = transport
+        self.workers = workers
+        self.dead_letters = dead_letters or DeadLetterStore()
+        self.topic_rate = topic_rate
+        self.topic_burst = topic_burst
+        self.max_retries = max_retries
+        self.dedup_window = dedup_window
+        self._loop = None
+        self._queue = None
+        self._tasks = []
+        self._buckets = {}  # topic -> TokenBucket
+        self._pending = []  # submitted before start()
+        self._retry_handles = {}  # TimerHandle -> item waiting for its retry
+        self._recent_keys = {}  # (bin_id, alert type) -> last accepted submit time
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=1000)  # submit -> delivered, seconds
+        self._stats = {"submitted": 0, "sent": 0, "retried": 0, "deduplicated": 0, "dead_lettered": 0,
+                       "batches": 0, "rate_limited_s": 0.0, "in_flight": 0}
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    async def start(self):
+        """Start the workers on the running event loop."""
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue()
+        with self._lock:
+            for item in self._pending:
+                self._queue.put_nowait(item)
+            self._pending = []
+            self._loop = asyncio.get_running_loop()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        print(f"Notification dispatcher started: {self.workers} workers")
+
+    async def stop(self):
+        """Stop the workers; whatever is still queued or waiting for a retry goes to the dead letters."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        for handle, item in list(self._retry_handles.items()):
+            handle.cancel()
+            self._forget_key(item)
+            self.dead_letters.add(item, "shutdown")
+        self._retry_handles.clear()
+        while self._queue is not None and not self._queue.empty():
+            item = self._queue.get_nowait()
+            self._forget_key(item)
+            self.dead_letters.add(item, "shutdown")
+
+    def _forget_key(self, item: Dict[str, Any]):
+        """An undelivered alert must not hold back the next genuine one for the same key."""
+        with self._lock:
+            if item['key'] is not None and self._recent_keys.get(item['key']) == item['submitted_at']:
+                del self._recent_keys[item['key']]
+
+    def submit(self, message: messaging.Message, key: Optional[Tuple[str, str]] = None,
+               description: str = "notification") -> bool:
+        """
+        Queue a message from any thread. Returns False when an identical alert
+        (same key) was accepted less than dedup_window seconds ago.
+        """
+        now = time.time()
+        with self._lock:
+            if key is not None:
+                last = self._recent_keys.get(key)
+                if last is not None and now - last < self.dedup_window:
+                    self._stats["deduplicated"] += 1
+                    return False
+                self._recent_keys[key] = now
+                if len(self._recent_keys) > 10000:
+                    self._recent_keys = {k: t for k, t in self._recent_keys.items() if now - t < self.dedup_window}
+            self._stats["submitted"] += 1
+            item = {'message': message, 'key': key, 'description': description,
+                    'attempts': 0, 'submitted_at': now}
+            if self._loop is None:
+                self._pending.append(item)
+                return True
+        self._put(item)
+        return True
+
+    def _put(self, item: Dict[str, Any]):
+        try:
+            in_loop = asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            in_loop = False
+        if in_loop:
+            self._queue.put_nowait(item)
+        else:
+            self._loop.call_soon_threadsafe(self._queue.put_nowait, item)
+
+    def _bucket(self, topic: Optional[str]) -> TokenBucket:
+        topic = topic or ""
+        if topic not in self._buckets:
+            self._buckets[topic] = TokenBucket(self.topic_rate, self.topic_burst)
+        return self._buckets[topic]
+
+    def _retry(self, item: Dict[str, Any]):
+        delay = min(NOTIFY_BACKOFF_BASE * 2 ** (item['attempts'] - 1), NOTIFY_BACKOFF_MAX)
+        delay *= random.uniform(0.5, 1.0)  # jitter, so a failed batch does not retry in lockstep
+
+        def requeue():
+            self._retry_handles.pop(handle, None)
+            self._queue.put_nowait(item)
+
+        handle = self._loop.call_later(delay, requeue)
+        self._retry_handles[handle] = item
+        self._stats["retried"] += 1
+
+    async def _worker(self):
+        while True:
+            first = await self._queue.get()
+            self._stats["rate_limited_s"] += await self._bucket(first['message'].topic).acquire()
+            batch, deferred = [first], []
+            # Fill the batch with what is queued and has a token now; topics over
+            # their rate wait in the queue without holding up the others
+            for _ in range(self._queue.qsize()):
+                if len(batch) >= self.transport.batch_size:
+                    break
+                item = self._queue.get_nowait()
+                (batch if self._bucket(item['message'].topic).try_acquire() else deferred).append(item)
+            for item in deferred:
+                self._queue.put_nowait(item)
+            for item in batch:
+                item['attempts'] += 1
+
+            self._stats["in_flight"] += len(batch)
+            try:
+                results = await asyncio.to_thread(self.transport.send_batch, [item['message'] for item in batch])
+            except asyncio.CancelledError:
+                for item in batch:
+                    self._forget_key(item)
+                    self.dead_letters.add(item, "shutdown during send, delivery unknown")
+                raise
+            except Exception as e:
+                results = [{'success': False, 'message_id': None, 'error': e} for _ in batch]
+            finally:
+                self._stats["in_flight"] -= len(batch)
+            self._stats["batches"] += 1
+
+            now = time.time()
+            for item, result in zip(batch, results):
+                if result['success']:
+                    self._stats["sent"] += 1
+                    self._latencies.append(now - item['submitted_at'])
+                elif is_transient(result['error']) and item['attempts'] <= self.max_retries:
+                    self._retry(item)
+                else:
+                    self._stats["dead_lettered"] += 1
+                    self._forget_key(item)
+                    await asyncio.to_thread(self.dead_letters.add, item, str(result['error']))
+
+    def metrics(self) -> Dict[str, Any]:
+        latencies = sorted(self._latencies)
+
+        def percentile(p):
+            return round(latencies[min(int(p * len(latencies)), len(latencies) - 1)] * 1000, 2) if latencies else None
+
+        with self._lock:
+            stats = dict(self._stats)
+            pending = len(self._pending)
+        return {
+            "running": self.running,
+            "workers": self.workers,
+            "queue_depth": (self._queue.qsize() if self._queue is not None else 0) + pending,
+            "retry_pending": len(self._retry_handles),
+            **stats,
+            "rate_limited_s": round(stats["rate_limited_s"], 3),
+            "dead_letters_total": self.dead_letters.total,
+            "send_latency_ms": {"p50": percentile(0.5), "p95": percentile(0.95), "p99": percentile(0.99)},
+        }
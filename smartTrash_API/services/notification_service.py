@@ -1,16 +1,88 @@
+import asyncio
+import threading
+from typing import List, Optional, Tuple
 from firebase_admin import messaging, db
 from others.models import TrashData, GasLevelBin, GAS_LEVEL_BINS
-from utils.constants import TRASH_FULL_THRESHOLD
+from others.shared_state import AlertStateStore
+from services.notification_dispatcher import NotificationDispatcher
+from services.notification_transport import FirebaseTransport, NotificationTransport
+from utils.constants import GAS_ALERT_HYSTERESIS, GAS_ALERT_MIN_NIVEAU, TRASH_ALERT_HYSTERESIS, TRASH_FULL_THRESHOLD
 from utils.constants import FCM_TOPIC
 
 # --- Firebase Notification Service ---
 class NotificationService:
-    def __init__(self, db_mongo):
+    def __init__(self, db_mongo, transport: Optional[NotificationTransport] = None,
+                 dispatcher: Optional[NotificationDispatcher] = None,
+                 state_store: Optional[AlertStateStore] = None):
         self.db_mongo = db_mongo
+        self.transport = transport or FirebaseTransport()
+        self.dispatcher = dispatcher  # when set, messages go through it instead of the flush() queue
         self.last_known_trash_levels = {}
         self.last_known_gas_levels = {}  # Add this line
+        self._queue: List[Tuple[str, messaging.Message]] = []  # (description, message) waiting for flush()
+        self._queue_lock = threading.Lock()
+        self._flushes = set()  # flush() calls handed to a thread by enqueue() on the event loop
+        self.alert_state = {}  # bin_id -> {"full": alert active, "gas_band": min_niveau of the alerted gas range, "raised": alerts so far}
+        self.state_store = state_store or AlertStateStore()  # persisted so another worker can take over
+        self._state_lock = threading.RLock()  # listener thread and reconciliation sweep
+        self.stats = {"sent": 0, "failed": 0, "batches": 0, "evaluated": 0, "alerts": 0}
 
-    def send_fcm_notification(self, bin_id: str, bin_data: TrashData):
+    def load_alert_state(self):
+        """Restore the alert state saved by the previous leader, so active alerts are not sent again."""
+        stored = self.state_store.load()
+        with self._state_lock:
+            for bin_id, doc in stored.items():
+                self.alert_state[bin_id] = {"full": doc.get("full", False), "gas_band": doc.get("gas_band"),
+                                            "raised": doc.get("raised", 0)}
+                if doc.get("trash_level") is not None:
+                    self.last_known_trash_levels[bin_id] = doc["trash_level"]
+                if doc.get("gas_level") is not None:
+                    self.last_known_gas_levels[bin_id] = doc["gas_level"]
+        print(f"Alert state restored for {len(stored)} bins")
+
+    def enqueue(self, description: str, message: messaging.Message, key: Optional[Tuple[str, str]] = None):
+        """
+        Hand a message to the dispatcher, or queue it for the next flush() (sent right
+        away once a full batch is waiting, in a thread when called from the event loop).
+        key is (bin_id, alert type) for deduplication.
+        """
+        if self.dispatcher is not None:
+            self.dispatcher.submit(message, key=key, description=description)
+            return
+        with self._queue_lock:
+            self._queue.append((description, message))
+            full = len(self._queue) >= self.transport.batch_size
+        if not full:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.flush()  # listener or worker thread: sending here blocks nobody else
+            return
+        future = loop.run_in_executor(None, self.flush)
+        self._flushes.add(future)
+        future.add_done_callback(self._flushes.discard)
+
+    def flush(self) -> int:
+        """Send every queued message in batches; returns how many were delivered."""
+        with self._queue_lock:
+            queued, self._queue = self._queue, []
+        if not queued:
+            return 0
+        results = self.transport.send_all([message for _, message in queued])
+        delivered = 0
+        for (description, _), result in zip(queued, results):
+            if result['success']:
+                delivered += 1
+                print(f"Successfully sent {description}: {result['message_id']}")
+            else:
+                print(f"Error sending {description}: {result['error']}")
+        self.stats["sent"] += delivered
+        self.stats["failed"] += len(queued) - delivered
+        self.stats["batches"] += -(-len(queued) // self.transport.batch_size)
+        return delivered
+
+    def send_fcm_notification(self, bin_id: str, bin_data: TrashData, transition: int = 0):
         try:
             message = messaging.Message(
                 notification=messaging.Notification(
@@ -32,45 +104,65 @@ class NotificationService:
                 },
                 topic=FCM_TOPIC,
             )
-            response = messaging.send(message)
-            print(f"Successfully sent FCM notification for '{bin_data.name}': {response}")
+            self.enqueue(f"FCM notification for '{bin_data.name}'", message, key=(str(bin_id), f"full#{transition}"))
         except Exception as e:
-            print(f"Error sending FCM message for bin '{bin_id}': {e}")
+            print(f"Error building FCM message for bin '{bin_id}': {e}")
 
-    def _process_bin_data(self, bin_id: str, bin_data: TrashData):
-        # Process trash level alerts
-        if bin_data.trash_level >= TRASH_FULL_THRESHOLD:
-            if not self._should_send_notification(bin_id, bin_data.trash_level):
-                return
-            
-            print(f"Trash bin '{bin_data.name}' (ID: {bin_id}) is {bin_data.trash_level:.1f}% full.")
-            self.send_fcm_notification(bin_id, bin_data)
+    def _process_bin_data(self, bin_id: str, bin_data: TrashData) -> int:
+        """
+        Evaluate one reading as it arrives (RTDB listener) or during the reconciliation
+        sweep. Alerts fire when a threshold is crossed and re-arm only once the value
+        is back below it by the hysteresis margin. Each alert raised for a bin gets its
+        own dedup key (the "raised" counter), so the dispatcher's window only drops
+        repeats of the same transition, never a re-armed alert. Returns the number of alerts queued.
+        """
+        with self._state_lock:
+            state = self.alert_state.setdefault(bin_id, {"full": False, "gas_band": None, "raised": 0})
+            before = dict(state)
+            self.stats["evaluated"] += 1
+            alerts = 0
+
+            # Process trash level alerts
+            if not state["full"] and bin_data.trash_level >= TRASH_FULL_THRESHOLD:
+                state["full"] = True
+                state["raised"] = state.get("raised", 0) + 1
+                print(f"Trash bin '{bin_data.name}' (ID: {bin_id}) is {bin_data.trash_level:.1f}% full.")
+                self.send_fcm_notification(bin_id, bin_data, state["raised"])
+                alerts += 1
+            elif state["full"] and bin_data.trash_level < TRASH_FULL_THRESHOLD - TRASH_ALERT_HYSTERESIS:
+                state["full"] = False  # emptied, the next crossing alerts again
             self.last_known_trash_levels[bin_id] = bin_data.trash_level
-        
-        # Process gas level alerts
-        self._check_gas_level(bin_id, bin_data)
 
-    def _check_gas_level(self, bin_id: str, bin_data: TrashData):
+            # Process gas level alerts
+            alerts += self._check_gas_level(bin_id, bin_data, state)
+            self.stats["alerts"] += alerts
+            if state != before:
+                self.state_store.save(bin_id, {**state, "trash_level": bin_data.trash_level,
+                                               "gas_level": self.last_known_gas_levels.get(bin_id)})
+            return alerts
+
+    def _check_gas_level(self, bin_id: str, bin_data: TrashData, state: dict) -> int:
         # gas level is (0-20)
         niveau = int(bin_data.gaz_level)
+        gas_bin = next((b for b in GAS_LEVEL_BINS if b.min_niveau <= niveau <= b.max_niveau), None)
+        if gas_bin is None:
+            return 0
+        self.last_known_gas_levels[bin_id] = niveau
 
-        # Only send new notification if gas level changed significantly
-        if bin_id in self.last_known_gas_levels:
-            old_niveau = self.last_known_gas_levels[bin_id]
-            if old_niveau == niveau:
-                return
+        alerted = state["gas_band"]
+        if gas_bin.min_niveau >= GAS_ALERT_MIN_NIVEAU:
+            # New alert, or escalation to a more severe range
+            if alerted is None or gas_bin.min_niveau > alerted:
+                state["gas_band"] = gas_bin.min_niveau
+                state["raised"] = state.get("raised", 0) + 1
+                self.send_gas_notification(bin_id, bin_data, gas_bin, state["raised"])
+                print(f"Gas Alert - Bin: {bin_data.name}, Level: {niveau}, Message: {gas_bin.message}")
+                return 1
+        elif alerted is not None and niveau < alerted - GAS_ALERT_HYSTERESIS:
+            state["gas_band"] = None
+        return 0
 
-        # Find appropriate gas bin info
-        for gas_bin in GAS_LEVEL_BINS:
-            if gas_bin.min_niveau <= niveau <= gas_bin.max_niveau:
-                # Only send notifications for alert levels (niveau >= 5)
-                if gas_bin.min_niveau >= 15:  # Start sending alerts from niveau 14
-                    self.send_gas_notification(bin_id, bin_data, gas_bin)
-                    print(f"Gas Alert - Bin: {bin_data.name}, Level: {niveau}, Message: {gas_bin.message}")
-                self.last_known_gas_levels[bin_id] = niveau
-                break
-
-    def send_gas_notification(self, bin_id: str, bin_data: TrashData, gas_info: GasLevelBin):
+    def send_gas_notification(self, bin_id: str, bin_data: TrashData, gas_info: GasLevelBin, transition: int = 0):
         try:
             # Create notification message based on gas level severity
             message = messaging.Message(
@@ -94,8 +186,7 @@ class NotificationService:
                 topic=f"{FCM_TOPIC}_gas",  # Separate topic for gas alerts
             )
             
-            response = messaging.send(message)
-            print(f"Successfully sent gas alert for '{bin_data.name}': {response}")
+            self.enqueue(f"gas alert for '{bin_data.name}'", message, key=(str(bin_id), f"gas_{gas_info.min_niveau}#{transition}"))
             
             # For critical levels (niveau >= 17), send to emergency topic
             if gas_info.min_niveau >= 17:
@@ -114,11 +205,8 @@ class NotificationService:
                     },
                     topic=f"{FCM_TOPIC}_emergency"
                 )
-                messaging.send(emergency_message)
+                self.enqueue(f"emergency gas alert for '{bin_data.name}'", emergency_message,
+                             key=(str(bin_id), f"gas_emergency#{transition}"))
                 
         except Exception as e:
-            print(f"Error sending gas alert for bin '{bin_id}': {e}")
-
-    def _should_send_notification(self, bin_id: str, trash_level: float) -> bool:
-        return bin_id not in self.last_known_trash_levels or \
-               abs(self.last_known_trash_levels[bin_id] - trash_level) >= 1.0
+            print(f"Error building gas alert for bin '{bin_id}': {e}")
@@ -0,0 +1,82 @@
+import random
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional
+
+from firebase_admin import messaging
+
+from utils.constants import FCM_BATCH_SIZE
+
+
+def send_result(success: bool, message_id: Optional[str] = None,
+                error: Optional[Exception] = None) -> Dict[str, Any]:
+    return {'success': success, 'message_id': message_id, 'error': error}
+
+
+# --- Notification Transports ---
+class NotificationTransport(ABC):
+    """
+    Delivers FCM messages. send_batch returns one result per message, in
+    order: {'success', 'message_id', 'error'}. A failed round-trip fails
+    every message of that batch instead of raising.
+    """
+
+    batch_size = FCM_BATCH_SIZE
+
+    @abstractmethod
+    def send_batch(self, messages: List[messaging.Message]) -> List[Dict[str, Any]]:
+        ...
+
+    def send_all(self, messages: List[messaging.Message]) -> List[Dict[str, Any]]:
+        """Send any number of messages, batch_size per round-trip."""
+        results = []
+        for start in range(0, len(messages), self.batch_size):
+            results.extend(self.send_batch(messages[start:start + self.batch_size]))
+        return results
+
+
+class FirebaseTransport(NotificationTransport):
+    """Firebase Cloud Messaging through messaging.send_each (up to 500 messages per call)."""
+
+    def send_batch(self, messages: List[messaging.Message]) -> List[Dict[str, Any]]:
+        if not messages:
+            return []
+        try:
+            response = messaging.send_each(messages)
+        except Exception as e:
+            return [send_result(False, error=e) for _ in messages]
+        return [send_result(r.success, r.message_id, r.exception) for r in response.responses]
+
+
+class FakeTransport(NotificationTransport):
+    """
+    In-process stand-in for offline tests and benchmarks: keeps the sent
+    messages and simulates the round-trip latency of a send_each call.
+    """
+
+    def __init__(self, latency: float = 0.0, per_message: float = 0.0, failure_rate: float = 0.0,
+                 seed: int = 0, batch_size: int = FCM_BATCH_SIZE):
+        self.latency = latency  # seconds per round-trip
+        self.per_message = per_message  # extra seconds per message in the batch
+        self.failure_rate = failure_rate
+        self.batch_size = batch_size
+        self.sent = []
+        self.calls = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def send_batch(self, messages: List[messaging.Message]) -> List[Dict[str, Any]]:
+        if not messages:
+            return []
+        time.sleep(self.latency + self.per_message * len(messages))
+        results = []
+        with self._lock:
+            self.calls += 1
+            for message in messages:
+                if self._random.random() < self.failure_rate:
+                    results.append(send_result(False, error=RuntimeError("simulated FCM failure")))
+                    continue
+                self.sent.append(message)
+                results.append(send_result(True, message_id=f"fake/{len(self.sent)}"))
+        return results
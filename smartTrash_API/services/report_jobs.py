@@ -0,0 +1,229 @@
+import hashlib
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from others.shared_state import WORKER_ID
+from utils.constants import REPORT_JOB_DIR, REPORT_JOB_TIMEOUT, REPORT_JOB_TTL, REPORT_JOB_WORKERS
+
+_worker_db = None  # MongoDB connection of a report worker process
+
+
+def init_worker():
+    """Runs once per worker process: no display, figures are only ever saved to files."""
+    try:
+        import matplotlib
+        matplotlib.use("Agg")
+    except Exception as e:
+        print(f"Report worker could not select the Agg backend: {e}")
+
+
+def render_report(job_id: str, path: str) -> Dict[str, Any]:
+    """
+    Worker side of a job: read the history, render the figures into a
+    private scratch directory and publish the PDF at `path` atomically.
+    """
+    global _worker_db
+    from others.database import MongoDB
+    from reports.rapprot_generator import generate_rapport_form_data
+
+    if _worker_db is None:
+        _worker_db = MongoDB()
+    _worker_db.report_jobs.update_one({'_id': job_id}, {'$set': {'status': 'running', 'started_at': time.time()}})
+    data = _worker_db.get_all_data()
+    if not data:
+        raise ValueError("No history data to build a report from")
+
+    workdir = tempfile.mkdtemp(prefix=f"report_{job_id}_")
+    partial = f"{path}.{os.getpid()}.part"  # next to `path`, so the rename is atomic
+    try:
+        generate_rapport_form_data(data, filename=partial, workdir=workdir)
+        if not os.path.exists(partial):
+            raise RuntimeError("Report file was not generated")
+        os.replace(partial, path)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+        if os.path.exists(partial):
+            os.remove(partial)
+    return {'records': len(data), 'size': os.path.getsize(path)}
+
+
+# --- Report Job Manager ---
+class ReportJobManager:
+    """
+    Renders PDF reports in a process pool instead of on the event loop.
+    A job is identified by the history it covers (see MongoDB.history_fingerprint):
+    identical requests share the in-flight job and, once it is done, its PDF
+    until the history changes. Job documents live in the `report_jobs`
+    collection so any API worker can report their status and serve the file;
+    without a collection they are kept in process.
+    """
+
+    def __init__(self, max_workers: int = REPORT_JOB_WORKERS, ttl: float = REPORT_JOB_TTL,
+                 timeout: float = REPORT_JOB_TIMEOUT, directory: str = REPORT_JOB_DIR):
+        self.max_workers = max_workers
+        self.ttl = ttl
+        self.timeout = timeout
+        self.directory = directory
+        self.collection = None
+        self._pool = None
+        self._jobs = {}  # job_id -> job document, when there is no collection
+        self._futures = {}  # job_id -> Future of the jobs started by this process
+        self._lock = threading.Lock()
+
+    def bind(self, collection):
+        self.collection = collection
+
+    def _ensure_pool(self):
+        if self._pool is None:
+            context = multiprocessing.get_context("spawn")
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=context,
+                                             initializer=init_worker)
+
+    # Job documents, in MongoDB or in process
+    def _insert(self, doc: Dict[str, Any]) -> bool:
+        if self.collection is None:
+            return self._jobs.setdefault(doc['_id'], doc) is doc
+        try:
+            self.collection.insert_one(doc)
+            return True
+        except DuplicateKeyError:
+            return False
+
+    def _get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        if self.collection is None:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+        return self.collection.find_one({'_id': job_id})
+
+    def _set(self, job_id: str, fields: Dict[str, Any], expected: Optional[Dict[str, Any]] = None) -> bool:
+        """Update a job, only if it still matches `expected` when given."""
+        if self.collection is None:
+            job = self._jobs.get(job_id)
+            if job is None or any(job.get(k) != v for k, v in (expected or {}).items()):
+                return False
+            job.update(fields)
+            return True
+        doc = self.collection.find_one_and_update({'_id': job_id, **(expected or {})}, {'$set': fields},
+                                                  return_document=ReturnDocument.AFTER, projection={'_id': 1})
+        return doc is not None
+
+    def _finished(self):
+        if self.collection is None:
+            return [dict(job) for job in self._jobs.values() if job['finished_at']]
+        return list(self.collection.find({'finished_at': {'$ne': None}}))
+
+    def _delete(self, job_id: str):
+        if self.collection is None:
+            self._jobs.pop(job_id, None)
+        else:
+            self.collection.delete_one({'_id': job_id})
+
+    def _cleanup(self):
+        """Forget finished jobs older than the TTL and remove their PDFs; the latest report is kept."""
+        finished = sorted(self._finished(), key=lambda job: job['finished_at'])
+        now = time.time()
+        for job in finished[:-1]:
+            if now - job['finished_at'] > self.ttl:
+                self._delete(job['_id'])
+                if job.get('path') and os.path.exists(job['path']):
+                    os.remove(job['path'])
+
+    def _reusable(self, job: Dict[str, Any]) -> bool:
+        if job['status'] == 'done':
+            return os.path.exists(job['path'])
+        if job['status'] in ('queued', 'running'):
+            return time.time() - job['created_at'] < self.timeout
+        return False
+
+    def submit(self, fingerprint: str) -> Tuple[Dict[str, Any], str]:
+        """
+        Job for the history identified by `fingerprint`, with how it was
+        obtained: "cache" (report already rendered), "shared" (identical job
+        in flight) or "computed" (new job started).
+        """
+        job_id = hashlib.sha256(f"report:{fingerprint}".encode()).hexdigest()[:16]
+        with self._lock:
+            self._cleanup()
+            os.makedirs(self.directory, exist_ok=True)
+            doc = {
+                '_id': job_id, 'status': 'queued', 'fingerprint': fingerprint,
+                'path': os.path.join(self.directory, f"{job_id}.pdf"), 'error': None,
+                'records': None, 'size': None, 'worker': WORKER_ID, 'created_at': time.time(),
+                'started_at': None, 'finished_at': None,
+            }
+            if not self._insert(doc):
+                existing = self._get(job_id)
+                if self._reusable(existing):
+                    return self._public(existing), "cache" if existing['status'] == 'done' else "shared"
+                # Failed, lost or its PDF removed: restart it, unless another worker just did
+                expected = {'status': existing['status'], 'created_at': existing['created_at']}
+                if not self._set(job_id, {k: v for k, v in doc.items() if k != '_id'}, expected):
+                    return self._public(self._get(job_id)), "shared"
+
+            self._ensure_pool()
+            future = self._pool.submit(render_report, job_id, doc['path'])
+            self._futures[job_id] = future
+            future.add_done_callback(lambda f, job_id=job_id: self._finish(job_id, f))
+        return self._public(doc), "computed"
+
+    def _finish(self, job_id: str, future):
+        self._futures.pop(job_id, None)
+        try:
+            if future.cancelled():
+                self._set(job_id, {'status': 'failed', 'error': 'cancelled', 'finished_at': time.time()})
+                return
+            error = future.exception()
+            if error is not None:
+                self._set(job_id, {'status': 'failed', 'error': str(error), 'finished_at': time.time()})
+                print(f"Report job {job_id} failed: {error}")
+                return
+            self._set(job_id, {'status': 'done', 'finished_at': time.time(), **future.result()})
+        except Exception as e:
+            print(f"Failed to record report job {job_id}: {e}")
+
+    @staticmethod
+    def _public(job: Dict[str, Any]) -> Dict[str, Any]:
+        job = dict(job)
+        return {'job_id': job.pop('_id'), **{k: v for k, v in job.items() if k not in ('path', 'worker')}}
+
+    def status(self, job_id: str) -> Dict[str, Any]:
+        job = self._get(job_id)
+        if job is None:
+            raise KeyError(job_id)
+        future = self._futures.get(job_id)
+        if job['status'] == 'queued' and future is not None and future.running():
+            job['status'] = 'running'  # no MongoDB for the worker to report it
+        return self._public(job)
+
+    def artifact(self, job_id: str) -> Optional[str]:
+        """Path of the job's PDF, or None while it is not done."""
+        job = self._get(job_id)
+        if job is None:
+            raise KeyError(job_id)
+        if job['status'] != 'done':
+            return None
+        if not os.path.exists(job['path']):
+            raise KeyError(job_id)  # removed by a cleanup
+        return job['path']
+
+    def latest(self) -> Optional[str]:
+        """PDF of the most recently finished report, if any."""
+        done = [job for job in self._finished() if job['status'] == 'done' and os.path.exists(job['path'])]
+        return max(done, key=lambda job: job['finished_at'])['path'] if done else None
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+report_jobs = ReportJobManager()
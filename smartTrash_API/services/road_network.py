@@ -0,0 +1,224 @@
+import heapq
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from utils.constants import ROAD_DIJKSTRA_CHUNK, ROAD_GRAPH_PATH, ROAD_UNREACHABLE_FACTOR
+
+# Roads a collection truck may use
+TRUCK_HIGHWAYS = {
+    "motorway", "motorway_link", "trunk", "trunk_link", "primary", "primary_link",
+    "secondary", "secondary_link", "tertiary", "tertiary_link", "unclassified",
+    "residential", "living_street", "service", "road",
+}
+
+
+def build_csr(num_nodes: int, sources: np.ndarray, targets: np.ndarray,
+              weights: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Compact CSR arrays (indptr, indices, weights); parallel edges keep the shortest one."""
+    order = np.lexsort((weights, targets, sources))
+    sources, targets, weights = sources[order], targets[order], weights[order]
+    first = np.ones(len(sources), dtype=bool)
+    first[1:] = (sources[1:] != sources[:-1]) | (targets[1:] != targets[:-1])
+    sources, targets, weights = sources[first], targets[first], weights[first]
+    indptr = np.zeros(num_nodes + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sources, minlength=num_nodes), out=indptr[1:])
+    # Zero-length segments (duplicate nodes) must stay edges for sparse Dijkstra
+    return indptr, targets.astype(np.int32), np.maximum(weights, 1e-9).astype(np.float64)
+
+
+def build_graph_from_pbf(pbf_path: str, out_path: str = ROAD_GRAPH_PATH) -> Dict[str, int]:
+    """
+    Build the CSR road graph from an OSM extract (.osm.pbf) with pyosmium and
+    save it as .npz. Edge weights are segment lengths in km; one-way streets
+    only get their forward edge.
+    """
+    import osmium
+
+    from services.distance_matrix import EARTH_RADIUS_KM
+
+    node_ids = {}
+    node_coords = []
+    edges = []  # (from, to, oneway)
+
+    class RoadHandler(osmium.SimpleHandler):
+        def way(self, way):
+            if way.tags.get("highway") not in TRUCK_HIGHWAYS:
+                return
+            oneway = way.tags.get("oneway") in ("yes", "1", "true") or way.tags.get("junction") == "roundabout"
+            previous = None
+            for node in way.nodes:
+                if not node.location.valid():
+                    previous = None
+                    continue
+                index = node_ids.get(node.ref)
+                if index is None:
+                    index = node_ids[node.ref] = len(node_coords)
+                    node_coords.append((node.location.lat, node.location.lon))
+                if previous is not None:
+                    edges.append((previous, index, oneway))
+                previous = index
+
+    RoadHandler().apply_file(pbf_path, locations=True)
+    if not edges:
+        raise ValueError(f"No drivable roads found in {pbf_path}")
+
+    coords = np.array(node_coords, dtype=np.float64)
+    edges = np.array(edges, dtype=np.int64)
+    a, b, oneway = edges[:, 0], edges[:, 1], edges[:, 2].astype(bool)
+    # Haversine segment lengths, vectorised over all edges
+    lat_a, lon_a = np.radians(coords[a, 0]), np.radians(coords[a, 1])
+    lat_b, lon_b = np.radians(coords[b, 0]), np.radians(coords[b, 1])
+    h = np.sin((lat_b - lat_a) / 2) ** 2 + np.cos(lat_a) * np.cos(lat_b) * np.sin((lon_b - lon_a) / 2) ** 2
+    length = 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(h, 0.0, 1.0)))
+
+    sources = np.concatenate([a, b[~oneway]])
+    targets = np.concatenate([b, a[~oneway]])
+    weights = np.concatenate([length, length[~oneway]])
+    indptr, indices, data = build_csr(len(coords), sources, targets, weights)
+
+    os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+    np.savez_compressed(out_path, indptr=indptr, indices=indices, weights=data,
+                        node_lat=coords[:, 0], node_lon=coords[:, 1])
+    return {"nodes": len(coords), "edges": len(indices)}
+
+
+# --- Road Network ---
+class RoadNetwork:
+    """
+    Road graph in CSR form (indptr, indices, weights in km, node coordinates).
+    Bins are snapped to their nearest road node and many-to-many distances are
+    computed with multi-source Dijkstra (scipy if available, heapq otherwise).
+    """
+
+    def __init__(self, path: str = ROAD_GRAPH_PATH):
+        self.path = path
+        graph = np.load(path)
+        self.indptr = graph["indptr"]
+        self.indices = graph["indices"]
+        self.weights = graph["weights"]
+        self.node_coords = np.column_stack([graph["node_lat"], graph["node_lon"]])
+        self._csr = None
+        self._csr_transposed = None
+        self._tree = None
+        try:
+            from scipy.sparse import csr_matrix
+            from scipy.spatial import cKDTree
+
+            from services.distance_matrix import unit_vectors
+
+            n = len(self.node_coords)
+            self._csr = csr_matrix((self.weights, self.indices, self.indptr), shape=(n, n))
+            self._csr_transposed = self._csr.transpose().tocsr()
+            self._tree = cKDTree(unit_vectors(self.node_coords))
+        except ImportError:
+            print("scipy not installed, road distances use the pure Python Dijkstra")
+        print(f"Road graph loaded: {len(self.node_coords)} nodes, {len(self.indices)} edges")
+
+    @property
+    def fingerprint(self) -> str:
+        """Changes whenever the graph file is rebuilt, so cached distances are not reused."""
+        stat = os.stat(self.path)
+        return f"{stat.st_size}-{int(stat.st_mtime)}"
+
+    def snap(self, coords: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Nearest road node of each point and the straight-line offset to it (km)."""
+        from services.distance_matrix import chord_to_km, haversine_matrix, unit_vectors
+
+        if self._tree is not None:
+            chord, nodes = self._tree.query(unit_vectors(coords))
+            return nodes.astype(np.int64), chord_to_km(chord)
+        nodes = np.empty(len(coords), dtype=np.int64)
+        offsets = np.empty(len(coords))
+        for i, coord in enumerate(coords):
+            d = haversine_matrix(coord[None, :], self.node_coords)[0]
+            nodes[i] = int(np.argmin(d))
+            offsets[i] = d[nodes[i]]
+        return nodes, offsets
+
+    def _dijkstra(self, sources: np.ndarray, targets: np.ndarray, reverse: bool = False) -> np.ndarray:
+        """(len(sources), len(targets)) shortest path lengths, inf when unreachable."""
+        result = np.empty((len(sources), len(targets)))
+        if self._csr is not None:
+            from scipy.sparse.csgraph import dijkstra
+
+            graph = self._csr_transposed if reverse else self._csr
+            for start in range(0, len(sources), ROAD_DIJKSTRA_CHUNK):
+                chunk = sources[start:start + ROAD_DIJKSTRA_CHUNK]
+                result[start:start + len(chunk)] = dijkstra(graph, directed=True, indices=chunk)[:, targets]
+            return result
+        if reverse:
+            raise ValueError("Reverse search needs scipy")
+        for row, source in enumerate(sources):
+            result[row] = self._heap_dijkstra(int(source), targets)
+        return result
+
+    def _heap_dijkstra(self, source: int, targets: np.ndarray) -> np.ndarray:
+        """Single-source Dijkstra that stops once every target is settled."""
+        remaining = set(int(t) for t in targets)
+        settled = {}
+        heap = [(0.0, source)]
+        while heap and remaining:
+            d, node = heapq.heappop(heap)
+            if node in settled:
+                continue
+            settled[node] = d
+            remaining.discard(node)
+            for k in range(self.indptr[node], self.indptr[node + 1]):
+                neighbour = int(self.indices[k])
+                if neighbour not in settled:
+                    heapq.heappush(heap, (d + self.weights[k], neighbour))
+        return np.array([settled.get(int(t), np.inf) for t in targets])
+
+    def distance_matrix(self, coords_a: np.ndarray, coords_b: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Road distances in km between every row of coords_a and coords_b
+        (coords_a with itself when coords_b is None). The route solver works
+        on symmetric distances, so with one-way streets both directions are
+        averaged. Unreachable pairs fall back to ROAD_UNREACHABLE_FACTOR x
+        the straight-line distance.
+        """
+        from services.distance_matrix import haversine_matrix
+
+        if coords_b is None:
+            coords_b = coords_a
+        nodes_a, offsets_a = self.snap(coords_a)
+        nodes_b, offsets_b = self.snap(coords_b)
+        sources, source_rows = np.unique(nodes_a, return_inverse=True)
+        targets, target_cols = np.unique(nodes_b, return_inverse=True)
+
+        forward = self._dijkstra(sources, targets)
+        if self._csr is not None:
+            # Reverse search from the same sources gives target -> source distances
+            forward = (forward + self._dijkstra(sources, targets, reverse=True)) / 2
+        else:
+            forward = (forward + self._dijkstra(targets, sources).T) / 2
+
+        matrix = forward[np.ix_(source_rows, target_cols)] + offsets_a[:, None] + offsets_b[None, :]
+        straight = haversine_matrix(coords_a, coords_b)
+        unreachable = ~np.isfinite(matrix)
+        if unreachable.any():
+            print(f"Road graph: {int(unreachable.sum())} unreachable pairs, using straight-line distance")
+            matrix[unreachable] = straight[unreachable] * ROAD_UNREACHABLE_FACTOR
+        # Same point, or two bins snapped to the same node
+        same = nodes_a[:, None] == nodes_b[None, :]
+        matrix[same] = straight[same]
+        return matrix
+
+
+_network = None
+_network_lock = threading.Lock()
+
+
+def get_road_network() -> RoadNetwork:
+    """Shared road graph, loaded on first use from ROAD_GRAPH_PATH."""
+    global _network
+    with _network_lock:
+        if _network is None:
+            if not os.path.exists(ROAD_GRAPH_PATH):
+                raise ValueError(f"Road graph not found at {ROAD_GRAPH_PATH}, build it with "
+                                 "python -m others.build_road_graph <extract.osm.pbf>")
+            _network = RoadNetwork(ROAD_GRAPH_PATH)
+        return _network
@@ -0,0 +1,119 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Tuple
+
+from utils.constants import DISTANCE_METHOD, ROUTE_CACHE_PRECISION, ROUTE_CACHE_SIZE, ROUTE_CACHE_TTL
+
+
+def _location(location: Dict) -> Tuple[float, float]:
+    return (round(float(location['latitude']), ROUTE_CACHE_PRECISION),
+            round(float(location['longitude']), ROUTE_CACHE_PRECISION))
+
+
+def request_key(data: Dict) -> str:
+    """
+    Canonical hash of an /optimize request: bins sorted by name, coordinates
+    rounded to ROUTE_CACHE_PRECISION decimals and capacities to 3, so the same
+    problem re-sent in another order or with float noise maps to one entry.
+    """
+    container = data['container']
+    bins = sorted(
+        (str(b['name']), _location(b['location']), round(float(b['capacity']), 3),
+         round(float(b['volume']), 3), round(float(b['weight']), 3))
+        for b in data['bins']
+    )
+    canonical = {
+        'container': (_location(container['location']), round(float(container['volume']), 3),
+                      round(float(container['weight']), 3)),
+        'bins': bins,
+        'options': [data.get(k) for k in ('time_budget', 'mode', 'partitions', 'cluster_method')],
+        'distance_method': DISTANCE_METHOD,
+    }
+    return hashlib.sha256(json.dumps(canonical, separators=(',', ':')).encode()).hexdigest()
+
+
+# --- Route Result Cache ---
+class RouteResultCache:
+    """
+    Bounded LRU/TTL cache of /optimize responses keyed by request_key, with
+    single-flight: concurrent identical requests wait for the one solve in
+    progress instead of starting their own. Entries and in-flight solves are
+    per process: with several uvicorn workers, the same request reaching two
+    workers is solved twice and each worker keeps its own entries.
+    """
+
+    def __init__(self, max_entries: int = ROUTE_CACHE_SIZE, ttl: float = ROUTE_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> {"result", "created_at"}
+        self._inflight = {}  # key -> Future of the solve in progress
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "shared": 0, "misses": 0, "evictions": 0}
+
+    def get_or_compute(self, data: Dict, compute: Callable[[Dict], Dict]) -> Tuple[Dict, str]:
+        """
+        Return (response, source) where source is "cache", "shared" (waited on
+        an identical request being solved) or "computed". Blocking, call it
+        from a worker thread. Failures are not cached; waiters get the error.
+        """
+        key = request_key(data)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if now - entry["created_at"] <= self.ttl:
+                    self._entries.move_to_end(key)
+                    self._stats["hits"] += 1
+                    return entry["result"], "cache"
+                del self._entries[key]
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = Future()
+                self._stats["misses"] += 1
+            else:
+                self._stats["shared"] += 1
+
+        if not owner:
+            return future.result(), "shared"
+
+        try:
+            result = compute(data)
+        except BaseException as e:
+            with self._lock:
+                del self._inflight[key]
+            future.set_exception(e)
+            raise
+        with self._lock:
+            del self._inflight[key]
+            self._entries[key] = {"result": result, "created_at": time.time()}
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+        future.set_result(result)
+        return result, "computed"
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            size = len(self._entries)
+            inflight = len(self._inflight)
+        lookups = stats["hits"] + stats["shared"] + stats["misses"]
+        return {
+            "size": size,
+            "max_entries": self.max_entries,
+            "inflight": inflight,
+            **stats,
+            "hit_rate": round((stats["hits"] + stats["shared"]) / lookups, 4) if lookups else 0.0,
+        }
+
+
+route_cache = RouteResultCache()
@@ -0,0 +1,135 @@
+import time
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from services.bin_selection import bin_values
+from services.distance_matrix import DistanceMatrix
+from services.fleet_routing import bin_load
+from services.tsp_solver import END, EPSILON, route_length
+from utils.constants import INSERTION_REPAIR_BUDGET
+
+
+def cheapest_insertion(matrix: np.ndarray, route: List[int], node: int) -> Tuple[int, float]:
+    """
+    Best position to insert `node` into an open route that starts at route[0]
+    (which stays first). Returns (index in route, added distance).
+    """
+    route = np.array(route)
+    prev, nxt = route[:-1], route[1:]
+    between = matrix[prev, node] + matrix[node, nxt] - matrix[prev, nxt]
+    cost = np.append(between, matrix[route[-1], node])  # last option: after the final stop
+    k = int(np.argmin(cost))
+    return k + 1, float(cost[k])
+
+
+def detour(matrix: np.ndarray, route: List[int], k: int) -> float:
+    """Distance the stop at route[k] adds to the open route (k > 0)."""
+    prev, node = route[k - 1], route[k]
+    if k + 1 == len(route):
+        return float(matrix[prev, node])
+    nxt = route[k + 1]
+    return float(matrix[prev, node] + matrix[node, nxt] - matrix[prev, nxt])
+
+
+def reposition_inserted(matrix: np.ndarray, route: List[int], new_nodes: List[int],
+                        deadline: float) -> Tuple[List[int], int]:
+    """
+    Repair limited to the inserted stops: move each one to its cheapest
+    position given the others, until nothing improves. The planned stops
+    keep the order the driver already has. Returns (route, moves).
+    """
+    moves = 0
+    improved = True
+    while improved and time.perf_counter() < deadline:
+        improved = False
+        for node in new_nodes:
+            k = route.index(node)
+            rest = route[:k] + route[k + 1:]
+            p, cost = cheapest_insertion(matrix, rest, node)
+            if cost < detour(matrix, route, k) - EPSILON:
+                route = rest[:p] + [node] + rest[p:]
+                moves += 1
+                improved = True
+    return route, moves
+
+
+def insert_bins(data: Dict) -> Dict:
+    """
+    Add bins that filled up mid-run to the route a truck is driving, without replanning it.
+    Args:
+        data: Dictionary with the truck's current position, the remaining ordered
+              route, the new bins, the remaining truck capacity and the repair options
+    Returns:
+        Dictionary with the updated ordered bins, which new bins were inserted
+        (and where) or rejected, the route distance before/after and timing
+    """
+    started_at = time.perf_counter()
+    route_bins = data['route']
+    new_bins = data['new_bins']
+    position = {'name': 'truck', 'location': data['current_position']}
+
+    bins = route_bins + new_bins
+    distances = DistanceMatrix([position] + bins, transient=1)  # the truck position is not cached
+    matrix = distances.matrix
+    route = list(range(len(route_bins) + 1))  # 0 is the truck
+    initial_length = route_length(matrix, np.array(route + [END]))
+
+    # Capacity left once the bins already planned are collected
+    planned = np.array([bin_load(b) for b in route_bins]).reshape(-1, 2).sum(axis=0)
+    free_volume = float(data['remaining_volume'] - planned[0])
+    free_weight = float(data['remaining_weight'] - planned[1])
+
+    inserted, rejected, new_nodes = [], [], []
+    values = bin_values(new_bins)[0] if new_bins else []
+    # Most valuable bins first, so they get the capacity when not all fit
+    for k in sorted(range(len(new_bins)), key=lambda k: (-values[k], k)):
+        bin = new_bins[k]
+        volume, weight = bin_load(bin)
+        if volume > free_volume or weight > free_weight:
+            rejected.append({'name': bin['name'], 'reason': 'capacity'})
+            continue
+        node = len(route_bins) + 1 + k
+        position_index, cost = cheapest_insertion(matrix, route, node)
+        route.insert(position_index, node)
+        free_volume -= volume
+        free_weight -= weight
+        new_nodes.append(node)
+        inserted.append({'name': bin['name'], 'insertion_cost': cost})
+
+    insertion_length = route_length(matrix, np.array(route + [END]))
+    repair_moves = 0
+    if data.get('repair', True) and inserted and len(route) > 2:
+        # Short local search moving only the new stops; the truck position stays first
+        budget = data.get('time_budget')
+        budget = INSERTION_REPAIR_BUDGET if budget is None else budget
+        route, repair_moves = reposition_inserted(matrix, route, new_nodes, time.perf_counter() + budget)
+
+    ordered_bins = []
+    for node in route[1:]:
+        bin = bins[node - 1]
+        bin['distance'] = distances.distance(0, node)
+        ordered_bins.append(bin)
+    positions = {bins[node - 1]['name']: i for i, node in enumerate(route[1:])}
+    for entry in inserted:
+        entry['position'] = positions[entry['name']]
+        # Detour of the stop in the returned order (the repair may have moved it)
+        entry['added_distance'] = detour(matrix, route, entry['position'] + 1)
+
+    total_distance = route_length(matrix, np.array(route + [END]))
+    return {
+        'ordered_bins': ordered_bins,
+        'inserted': inserted,
+        'rejected': rejected,
+        'total_distance': total_distance,
+        'added_distance': total_distance - initial_length,
+        'solve_stats': {
+            'initial_length': initial_length,
+            'insertion_length': insertion_length,
+            'repair_moves': repair_moves,
+            'repair_gain': insertion_length - total_distance,
+            'remaining_volume': free_volume,
+            'remaining_weight': free_weight,
+            'solve_time_ms': round((time.perf_counter() - started_at) * 1000, 2),
+        },
+    }
@@ -0,0 +1,259 @@
+import multiprocessing
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Optional
+
+from others.shared_state import WORKER_ID
+from utils.constants import DISTANCE_METHOD, ROUTE_JOB_SYNC_INTERVAL, ROUTE_JOB_TTL, ROUTE_JOB_WORKERS
+from utils.helper import to_python_type
+
+CANCEL_POLL_INTERVAL = 0.25  # seconds between reads of the shared cancel flag
+
+
+def init_worker():
+    """Runs once per worker process: load the on-disk distance cache before the first job."""
+    from services.distance_cache import get_distance_cache
+    from services.distance_matrix import method_fingerprint
+
+    try:
+        cache = get_distance_cache(DISTANCE_METHOD, method_fingerprint(DISTANCE_METHOD))
+        cache.read_only = True  # only the leader API worker writes the shared files
+        cache.load()
+    except Exception as e:
+        print(f"Route worker could not preload distances: {e}")
+
+
+def run_route_job(kind: str, data: Dict, state) -> Optional[Dict]:
+    """
+    Worker side of a job. `state` is a Manager dict shared with the API
+    process: progress and the best solution so far are written to it, and
+    its "cancel" flag is polled by the solver.
+    """
+    from services.fleet_routing import optimize_fleet_collection
+    from services.rotage import optimize_waste_collection
+
+    if state.get('cancel'):
+        return None  # cancelled while waiting in the pool's call queue
+    state.update({'status': 'running', 'phase': 'started', 'started_at': time.time()})
+    time_budget = data.get('time_budget')
+    started_at = time.perf_counter()
+    last_poll = {'at': 0.0, 'cancel': False}
+
+    def cancelled():
+        now = time.perf_counter()
+        if not last_poll['cancel'] and now - last_poll['at'] > CANCEL_POLL_INTERVAL:
+            last_poll['at'] = now
+            last_poll['cancel'] = bool(state.get('cancel'))
+        return last_poll['cancel']
+
+    def progress(update):
+        if 'progress' not in update and time_budget:
+            update['progress'] = min((time.perf_counter() - started_at) / time_budget, 0.99)
+        state.update(update)
+
+    if kind == 'fleet':
+        result = optimize_fleet_collection(data, progress=progress, cancelled=cancelled)
+    else:
+        ordered_bins, total_volume, total_weight, total_distance, stats = optimize_waste_collection(
+            data, progress=progress, cancelled=cancelled)
+        result = {
+            'ordered_bins': ordered_bins,
+            'total_volume': total_volume,
+            'total_weight': total_weight,
+            'total_distance': total_distance,
+            'solve_stats': stats,
+            'routes': stats.pop('routes', None),
+        }
+    return result
+
+
+# --- Route Job Manager ---
+class RouteJobManager:
+    """
+    Runs large /optimize and /optimize/fleet solves in a process pool so they
+    never block the event loop. Each job has a Manager-backed state dict
+    (status, progress, best solution so far, cancel flag). With a bound
+    `route_jobs` collection, the worker that started a job mirrors it to a
+    document every `sync_interval` seconds, so any API worker can report its
+    status, return its result and request its cancellation; without one,
+    jobs are only known to the process that started them.
+    """
+
+    def __init__(self, max_workers: int = ROUTE_JOB_WORKERS, ttl: float = ROUTE_JOB_TTL,
+                 sync_interval: float = ROUTE_JOB_SYNC_INTERVAL):
+        self.max_workers = max_workers
+        self.ttl = ttl
+        self.sync_interval = sync_interval
+        self.collection = None
+        self._pool = None
+        self._manager = None
+        self._jobs = {}  # job_id -> {"state", "future", "kind", "result"}
+        self._synced = {}  # job_id -> state last written to the collection
+        self._sync_thread = None
+        self._stop = threading.Event()
+        self._lock = threading.RLock()  # submit() holds it when a done callback may run inline
+
+    def bind(self, collection):
+        self.collection = collection
+
+    def _ensure_pool(self):
+        if self._pool is None:
+            context = multiprocessing.get_context("spawn")
+            self._manager = context.Manager()
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=context,
+                                             initializer=init_worker)
+        if self.collection is not None and self._sync_thread is None:
+            self._stop.clear()
+            self._sync_thread = threading.Thread(target=self._sync_loop, daemon=True)
+            self._sync_thread.start()
+
+    def _sync_loop(self):
+        while not self._stop.wait(self.sync_interval):
+            try:
+                self._sync()
+            except Exception as e:
+                print(f"Failed to sync route jobs: {e}")
+
+    def _sync(self):
+        """Write the progress of this worker's unfinished jobs and apply cancellations requested elsewhere."""
+        with self._lock:
+            running = {job_id: job for job_id, job in self._jobs.items() if not job['state'].get('finished_at')}
+        if not running:
+            return
+        requested = self.collection.find({'_id': {'$in': list(running)}, 'cancel_requested': True}, {'_id': 1})
+        for doc in requested:
+            self._cancel_local(running[doc['_id']])
+        now = time.time()
+        for job_id, job in running.items():
+            state = self._state(job)
+            if state != self._synced.get(job_id):
+                self.collection.update_one({'_id': job_id}, {'$set': {**to_python_type(state), 'updated_at': now}})
+                self._synced[job_id] = state
+        # Heartbeat: a job whose worker died stops being updated and expires with the TTL
+        self.collection.update_many({'_id': {'$in': list(running)}}, {'$set': {'updated_at': now}})
+
+    def _cleanup(self):
+        """Forget finished jobs older than the TTL, and jobs whose worker stopped updating them."""
+        now = time.time()
+        for job_id, job in list(self._jobs.items()):
+            finished_at = job['state'].get('finished_at')
+            if finished_at and now - finished_at > self.ttl:
+                del self._jobs[job_id]
+                self._synced.pop(job_id, None)
+        if self.collection is not None:
+            self.collection.delete_many({'$or': [
+                {'finished_at': {'$lt': now - self.ttl}},
+                {'finished_at': None, 'updated_at': {'$lt': now - self.ttl}},
+            ]})
+
+    def submit(self, kind: str, data: Dict) -> str:
+        with self._lock:
+            self._ensure_pool()
+            self._cleanup()
+            job_id = uuid.uuid4().hex
+            initial = {
+                'status': 'queued', 'phase': None, 'progress': 0.0, 'best': None,
+                'error': None, 'cancel': False, 'created_at': time.time(),
+                'started_at': None, 'finished_at': None,
+            }
+            if self.collection is not None:
+                doc = {k: v for k, v in initial.items() if k != 'cancel'}
+                self.collection.insert_one({'_id': job_id, 'kind': kind, **doc, 'result': None,
+                                            'cancel_requested': False, 'worker': WORKER_ID,
+                                            'updated_at': initial['created_at']})
+            state = self._manager.dict(initial)
+            future = self._pool.submit(run_route_job, kind, data, state)
+            self._jobs[job_id] = {'state': state, 'future': future, 'kind': kind, 'result': None}
+            future.add_done_callback(lambda f, job_id=job_id: self._finish(job_id, f))
+        return job_id
+
+    def _finish(self, job_id: str, future):
+        # Pool callback thread; _cleanup may delete the job concurrently
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            state = job['state']
+            try:
+                if future.cancelled():
+                    state.update({'status': 'cancelled', 'finished_at': time.time()})
+                elif future.exception() is not None:
+                    state.update({'status': 'failed', 'error': str(future.exception()), 'finished_at': time.time()})
+                else:
+                    job['result'] = future.result()
+                    state.update({
+                        'status': 'cancelled' if state.get('cancel') else 'done',
+                        'phase': 'done', 'progress': 1.0, 'finished_at': time.time(),
+                    })
+                final = self._state(job)
+            except Exception as e:
+                print(f"Failed to record route job {job_id}: {e}")
+                return
+        if self.collection is None:
+            return
+        try:
+            self.collection.update_one({'_id': job_id}, {'$set': {
+                **to_python_type(final), 'result': to_python_type(job['result']), 'updated_at': time.time(),
+            }})
+        except Exception as e:
+            print(f"Failed to store route job {job_id}: {e}")
+
+    @staticmethod
+    def _state(job: Dict) -> Dict[str, Any]:
+        state = dict(job['state'])
+        state.pop('cancel', None)
+        return state
+
+    def _doc(self, job_id: str, projection: Dict[str, int]) -> Dict[str, Any]:
+        """Document of a job started by another worker."""
+        doc = self.collection.find_one({'_id': job_id}, projection) if self.collection is not None else None
+        if doc is None:
+            raise KeyError(job_id)
+        return doc
+
+    def status(self, job_id: str) -> Dict[str, Any]:
+        job = self._jobs.get(job_id)
+        if job is not None:
+            return {'job_id': job_id, 'kind': job['kind'], **self._state(job)}
+        doc = self._doc(job_id, {'result': 0, 'cancel_requested': 0, 'worker': 0, 'updated_at': 0})
+        return {'job_id': doc.pop('_id'), **doc}
+
+    def result(self, job_id: str) -> Optional[Dict]:
+        """Final result, or None while the job is still running."""
+        job = self._jobs.get(job_id)
+        if job is not None:
+            return job['result']
+        return self._doc(job_id, {'result': 1}).get('result')
+
+    def _cancel_local(self, job: Dict):
+        if not job['future'].cancel():
+            job['state']['cancel'] = True
+
+    def cancel(self, job_id: str) -> Dict[str, Any]:
+        """
+        Stop a job: queued jobs never start, running ones return their best solution so far.
+        Jobs of another worker are flagged in their document and stop at its next sync.
+        """
+        job = self._jobs.get(job_id)
+        if job is not None:
+            self._cancel_local(job)
+        elif self.collection is not None:
+            self.collection.update_one({'_id': job_id, 'finished_at': None}, {'$set': {'cancel_requested': True}})
+        return self.status(job_id)
+
+    def shutdown(self):
+        self._stop.set()
+        self._sync_thread = None
+        if self._pool is not None:
+            for job in self._jobs.values():
+                job['future'].cancel()
+                job['state']['cancel'] = True
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._manager.shutdown()
+            self._pool = None
+            self._manager = None
+
+
+route_jobs = RouteJobManager()
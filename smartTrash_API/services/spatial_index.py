@@ -0,0 +1,175 @@
+import threading
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from services.distance_matrix import chord_to_km, haversine_matrix, km_to_chord, unit_vectors
+from utils.constants import SPATIAL_INDEX_REBUILD_THRESHOLD
+
+try:
+    from scipy.spatial import cKDTree
+except ImportError:  # brute-force numpy search instead
+    cKDTree = None
+
+
+# --- Bin Spatial Index ---
+class BinSpatialIndex:
+    """
+    In-memory index of bin locations: a KD-tree over unit-sphere coordinates
+    for nearest/radius queries, plus a small buffer of bins added or moved
+    since the last rebuild, merged into every query.
+    """
+
+    def __init__(self, rebuild_threshold: int = SPATIAL_INDEX_REBUILD_THRESHOLD):
+        self.rebuild_threshold = rebuild_threshold
+        self._bins = {}  # bin_id -> {"latitude", "longitude", **payload}
+        self._ids = np.array([], dtype=object)  # rows of the tree
+        self._coords = np.zeros((0, 2))
+        self._rows = {}  # bin_id -> tree row
+        self._lat_order = np.zeros(0, dtype=int)  # tree rows sorted by latitude, for bounding boxes
+        self._sorted_lat = np.zeros(0)
+        self._tree = None
+        self._stale = set()  # tree rows whose bin moved or was removed
+        self._buffer = {}  # bin_id -> (latitude, longitude), not in the tree yet
+        self._loaded = False
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._bins)
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def load(self, bins: List[Dict[str, Any]]):
+        """Replace the index content with (bin_id, latitude, longitude, payload...) dicts."""
+        with self._lock:
+            self._bins = {
+                b['bin_id']: {k: v for k, v in b.items() if k != 'bin_id'}
+                for b in bins if b.get('latitude') is not None and b.get('longitude') is not None
+            }
+            self._buffer = {}
+            self._rebuild()
+            self._loaded = True
+        print(f"Spatial index loaded: {len(self._bins)} bins")
+
+    def _rebuild(self):
+        ids = list(self._bins)
+        self._ids = np.array(ids, dtype=object)
+        self._coords = np.array([[self._bins[i]['latitude'], self._bins[i]['longitude']] for i in ids],
+                                dtype=np.float64).reshape(-1, 2)
+        self._rows = {bin_id: row for row, bin_id in enumerate(ids)}
+        self._lat_order = np.argsort(self._coords[:, 0], kind="stable")
+        self._sorted_lat = self._coords[self._lat_order, 0]
+        self._tree = cKDTree(unit_vectors(self._coords)) \
+            if cKDTree is not None and len(ids) else None
+        self._stale = set()
+        self._buffer = {}
+
+    def upsert(self, bin_id: str, latitude: float, longitude: float, **payload):
+        """Add or update a bin; a new position goes to the buffer until the next rebuild."""
+        with self._lock:
+            current = self._bins.get(bin_id)
+            moved = current is None or (current['latitude'], current['longitude']) != (latitude, longitude)
+            self._bins[bin_id] = {**(current or {}), **payload, 'latitude': latitude, 'longitude': longitude}
+            if not moved:
+                return
+            row = self._rows.get(bin_id)
+            if row is not None:
+                self._stale.add(row)
+            self._buffer[bin_id] = (latitude, longitude)
+            if len(self._buffer) + len(self._stale) > self.rebuild_threshold:
+                self._rebuild()
+
+    def remove(self, bin_id: str):
+        with self._lock:
+            if self._bins.pop(bin_id, None) is None:
+                return
+            row = self._rows.get(bin_id)
+            if row is not None:
+                self._stale.add(row)
+            self._buffer.pop(bin_id, None)
+
+    def _result(self, bin_id: str, distance_km: Optional[float] = None) -> Dict[str, Any]:
+        result = {'bin_id': bin_id, **self._bins[bin_id]}
+        if distance_km is not None:
+            result['distance_km'] = round(float(distance_km), 4)
+        return result
+
+    def nearby(self, latitude: float, longitude: float, k: Optional[int] = None,
+               radius_km: Optional[float] = None) -> List[Dict[str, Any]]:
+        """The k nearest bins, the bins within radius_km, or the k nearest within radius_km, closest first."""
+        if k is None and radius_km is None:
+            raise ValueError("Give k, radius_km or both")
+        point = np.array([[latitude, longitude]])
+        with self._lock:
+            found = {}  # bin_id -> distance in km
+            if self._tree is not None:
+                x = unit_vectors(point)[0]
+                bound = km_to_chord(radius_km) if radius_km is not None else np.inf
+                if k is not None:
+                    # Ask for extra neighbours to make up for stale rows
+                    count = min(k + len(self._stale), len(self._ids))
+                    chords, rows = self._tree.query(x, k=count, distance_upper_bound=bound)
+                    chords, rows = np.atleast_1d(chords), np.atleast_1d(rows)
+                    keep = rows < len(self._ids)
+                    chords, rows = chords[keep], rows[keep]
+                else:
+                    rows = np.array(self._tree.query_ball_point(x, bound), dtype=int)
+                    chords = np.linalg.norm(self._tree.data[rows] - x, axis=1) if len(rows) else np.zeros(0)
+                for row, d in zip(rows, chord_to_km(chords)):
+                    if row not in self._stale:
+                        found[self._ids[row]] = d
+            elif len(self._ids):
+                distances = haversine_matrix(point, self._coords)[0]
+                for row, d in enumerate(distances):
+                    if row not in self._stale:
+                        found[self._ids[row]] = d
+            if self._buffer:
+                ids = list(self._buffer)
+                distances = haversine_matrix(point, np.array([self._buffer[i] for i in ids]))[0]
+                found.update(zip(ids, distances))
+
+            ranked = sorted(found.items(), key=lambda item: item[1])
+            if radius_km is not None:
+                ranked = [item for item in ranked if item[1] <= radius_km]
+            if k is not None:
+                ranked = ranked[:k]
+            return [self._result(bin_id, d) for bin_id, d in ranked]
+
+    def bbox(self, min_lat: float, min_lon: float, max_lat: float, max_lon: float,
+             limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Bins inside a latitude/longitude box (min_lon > max_lon crosses the antimeridian)."""
+        def lon_inside(lon):
+            if min_lon <= max_lon:
+                return (lon >= min_lon) & (lon <= max_lon)
+            return (lon >= min_lon) | (lon <= max_lon)
+
+        with self._lock:
+            # Latitude band by binary search, then longitude on that slice only
+            start = np.searchsorted(self._sorted_lat, min_lat, side="left")
+            end = np.searchsorted(self._sorted_lat, max_lat, side="right")
+            rows = self._lat_order[start:end]
+            rows = rows[lon_inside(self._coords[rows, 1])]
+            ids = [self._ids[row] for row in rows if row not in self._stale] if self._stale else list(self._ids[rows])
+            if self._buffer:
+                buffered = list(self._buffer)
+                coords = np.array([self._buffer[i] for i in buffered])
+                mask = (coords[:, 0] >= min_lat) & (coords[:, 0] <= max_lat) & lon_inside(coords[:, 1])
+                ids.extend(bin_id for bin_id, ok in zip(buffered, mask) if ok)
+            if limit is not None:
+                ids = ids[:limit]
+            return [self._result(bin_id) for bin_id in ids]
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'bins': len(self._bins),
+                'indexed': len(self._ids) - len(self._stale),
+                'buffered': len(self._buffer),
+                'stale_rows': len(self._stale),
+                'backend': 'kdtree' if cKDTree is not None else 'numpy',
+            }
+
+
+bin_index = BinSpatialIndex()
@@ -0,0 +1,169 @@
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from utils.constants import ROUTE_TIME_BUDGET
+
+END = -1  # virtual end node of an open path, at distance 0 from every point
+EPSILON = 1e-9
+
+
+def _dist(matrix: np.ndarray, a, b):
+    """Vectorised distance lookup that treats END as a free end point."""
+    a = np.asarray(a)
+    b = np.asarray(b)
+    d = matrix[np.maximum(a, 0), np.maximum(b, 0)]
+    return np.where((a == END) | (b == END), 0.0, d)
+
+
+def route_length(matrix: np.ndarray, route: np.ndarray) -> float:
+    return float(_dist(matrix, route[:-1], route[1:]).sum())
+
+
+def nearest_neighbour(matrix: np.ndarray, start: int, nodes: List[int]) -> List[int]:
+    """Construction: always move to the nearest unvisited node."""
+    order = []
+    remaining = np.array(nodes, dtype=int)
+    current = start
+    while len(remaining):
+        k = int(np.argmin(matrix[current, remaining]))
+        current = int(remaining[k])
+        order.append(current)
+        remaining = np.delete(remaining, k)
+    return order
+
+
+def two_opt(matrix: np.ndarray, route: np.ndarray, deadline: float,
+            cancelled: Optional[Callable[[], bool]] = None) -> Tuple[np.ndarray, int, bool]:
+    """
+    Reverse route[i..j] whenever it shortens the route; the first and last
+    positions stay fixed. Returns (route, moves, stopped early).
+    """
+    n = len(route)
+    moves = 0
+    improved = True
+    while improved:
+        improved = False
+        for i in range(1, n - 2):
+            if time.perf_counter() > deadline or (cancelled and cancelled()):
+                return route, moves, True
+            a, b = route[i - 1], route[i]
+            c, d = route[i + 1:n - 1], route[i + 2:n]
+            delta = _dist(matrix, a, c) + _dist(matrix, b, d) - _dist(matrix, a, b) - _dist(matrix, c, d)
+            k = int(np.argmin(delta))
+            if delta[k] < -EPSILON:
+                j = i + 1 + k
+                route[i:j + 1] = route[i:j + 1][::-1].copy()
+                moves += 1
+                improved = True
+    return route, moves, False
+
+
+def or_opt(matrix: np.ndarray, route: np.ndarray, deadline: float, max_segment: int = 3,
+           cancelled: Optional[Callable[[], bool]] = None) -> Tuple[np.ndarray, int, bool]:
+    """
+    Move segments of 1 to max_segment consecutive nodes (optionally reversed)
+    to their cheapest position. Returns (route, moves, stopped early).
+    """
+    moves = 0
+    improved = True
+    while improved:
+        improved = False
+        for length in range(1, max_segment + 1):
+            i = 1
+            while i + length < len(route):
+                if time.perf_counter() > deadline or (cancelled and cancelled()):
+                    return route, moves, True
+                segment = route[i:i + length]
+                first, last = segment[0], segment[-1]
+                prev, nxt = route[i - 1], route[i + length]
+                gain = float(_dist(matrix, prev, first) + _dist(matrix, last, nxt) - _dist(matrix, prev, nxt))
+
+                rest = np.concatenate([route[:i], route[i + length:]])
+                p, q = rest[:-1], rest[1:]
+                base = _dist(matrix, p, q)
+                forward = _dist(matrix, p, first) + _dist(matrix, last, q) - base
+                backward = _dist(matrix, p, last) + _dist(matrix, first, q) - base
+                forward[i - 1] = np.inf  # same place, same direction
+                k_fwd, k_bwd = int(np.argmin(forward)), int(np.argmin(backward))
+                if forward[k_fwd] <= backward[k_bwd]:
+                    k, cost, moved = k_fwd, forward[k_fwd], segment
+                else:
+                    k, cost, moved = k_bwd, backward[k_bwd], segment[::-1]
+
+                if cost < gain - EPSILON:
+                    route = np.concatenate([rest[:k + 1], moved, rest[k + 1:]])
+                    moves += 1
+                    improved = True
+                else:
+                    i += 1
+    return route, moves, False
+
+
+def solve_tsp(matrix: np.ndarray, start: int, nodes: List[int],
+              time_budget: Optional[float] = None, closed: bool = False,
+              progress: Optional[Callable[[List[int], float, Dict], None]] = None,
+              cancelled: Optional[Callable[[], bool]] = None) -> Tuple[List[int], float, Dict]:
+    """
+    Order `nodes` into a short route starting at `start`.
+    Nearest-neighbour construction followed by 2-opt and Or-opt improvement
+    until no move helps, the time budget (seconds) runs out or `cancelled()`
+    returns True.
+    closed: return to `start` at the end (otherwise the route ends at the last node)
+    progress: called with (best route so far, its length, stats) after each pass
+    Returns (route of matrix indices starting with `start`, length, stats).
+    """
+    started_at = time.perf_counter()
+    time_budget = ROUTE_TIME_BUDGET if time_budget is None else time_budget
+    deadline = started_at + time_budget
+    end = start if closed else END
+
+    order = nearest_neighbour(matrix, start, [n for n in nodes if n != start])
+    route = np.array([start] + order + [end], dtype=int)
+    initial_length = route_length(matrix, route)
+
+    stats = {
+        "construction": "nearest_neighbour",
+        "nodes": len(order),
+        "initial_length": initial_length,
+        "two_opt_moves": 0,
+        "or_opt_moves": 0,
+        "rounds": 0,
+        "timed_out": False,
+        "time_budget_s": time_budget,
+    }
+
+    def report():
+        if progress is not None:
+            stats["solve_time_s"] = round(time.perf_counter() - started_at, 4)
+            progress([int(node) for node in route if node != END], route_length(matrix, route), stats)
+
+    report()
+    while len(route) > 3:
+        stats["rounds"] += 1
+        route, moves_2opt, stopped = two_opt(matrix, route, deadline, cancelled)
+        stats["two_opt_moves"] += moves_2opt
+        if not stopped:
+            report()
+            route, moves_oropt, stopped = or_opt(matrix, route, deadline, cancelled=cancelled)
+            stats["or_opt_moves"] += moves_oropt
+        else:
+            moves_oropt = 0
+        report()
+        if stopped:
+            if cancelled and cancelled():
+                stats["cancelled"] = True
+            else:
+                stats["timed_out"] = True
+            break
+        if moves_oropt == 0:
+            break  # 2-opt already converged before this Or-opt pass
+
+    length = route_length(matrix, route)
+    stats["final_length"] = length
+    stats["improvement_pct"] = round(100 * (1 - length / initial_length), 2) if initial_length else 0.0
+    stats["solve_time_s"] = round(time.perf_counter() - started_at, 4)
+
+    path = [int(node) for node in route if node != END]
+    return path, length, stats
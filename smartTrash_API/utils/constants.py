@@ -7,4 +7,113 @@ REPORT_PATH = "generated_files/rapport_final_fr.pdf"
 
 LEVEL_PREDICTION_INTERVAL = 3600  # 1 hour in seconds
 HT_PREDICTION_INTERVAL = 3600  # 1 hour in seconds
-NOTIFICATION_INTERVAL = 3600  # 1 hour in seconds
\ No newline at end of file
+NOTIFICATION_INTERVAL = 6 * 3600  # reconciliation sweep over all bins, alerts are evaluated as readings arrive
+TRASH_ALERT_HYSTERESIS = 10.0  # a full-bin alert re-arms once the level is this many points below the threshold
+GAS_ALERT_MIN_NIVEAU = 15  # gas ranges starting at or above this niveau (0-20) send alerts
+GAS_ALERT_HYSTERESIS = 2  # a gas alert re-arms once niveau is this far below the alerted range
+
+# --- Notification dispatcher ---
+FCM_BATCH_SIZE = 500  # messages per messaging.send_each call (FCM limit)
+NOTIFY_WORKERS = 4  # worker tasks sending queued notifications
+NOTIFY_TOPIC_RATE = 20.0  # messages per second per FCM topic (token bucket refill)
+NOTIFY_TOPIC_BURST = 100  # token bucket size, messages sent at once before the rate applies
+NOTIFY_MAX_RETRIES = 5  # retries of a transient FCM error before dead-lettering
+NOTIFY_BACKOFF_BASE = 1.0  # seconds before the first retry, doubled on each attempt
+NOTIFY_BACKOFF_MAX = 60.0  # cap on the retry delay in seconds
+NOTIFY_DEDUP_WINDOW = 600  # seconds during which a repeat of the same bin + alert type is dropped
+NOTIFY_DEAD_LETTER_SIZE = 1000  # undeliverable notifications kept in memory (all are stored in MongoDB)
+
+# --- Multi-worker shared state ---
+SHARED_STATE_REFRESH = 5.0  # seconds between checks of the shared prediction snapshots by each worker
+LEADER_LEASE_TTL = 30.0  # seconds before a leader that stopped renewing loses the background loops
+LEADER_LEASE_RENEW = 10.0  # seconds between lease renewals (and takeover attempts by the other workers)
+SPATIAL_INDEX_REFRESH = 60.0  # seconds between spatial index reloads on workers that are not the leader
+
+# --- Inference executor ---
+INFERENCE_WORKERS = 4  # threads dedicated to model inference
+INFERENCE_TORCH_THREADS = 2  # torch intra-op threads, process-wide and shared by every model; keeps workers from oversubscribing the CPU
+INFERENCE_INTEROP_THREADS = 1  # torch inter-op threads (can only be set once per process)
+INFERENCE_MODEL_CONCURRENCY = {  # max concurrent jobs per model
+    "level": 1,
+    "ht": 1,
+    "trash_type": 2,
+    "preprocess": 4,
+}
+
+# --- Image classification micro-batching ---
+BATCH_MAX_SIZE = 16  # images per forward pass
+BATCH_MAX_WAIT_MS = 5  # how long the first image waits for others to join its batch
+MAX_UPLOAD_BYTES = 15 * 1024 * 1024  # 15 MB, larger uploads are rejected before decoding
+
+# --- Classification result cache ---
+CLASSIFICATION_TOP_K = 3  # probabilities returned with each classification
+CLASSIFICATION_CACHE_SIZE = 2048  # max cached results (LRU eviction)
+CLASSIFICATION_CACHE_TTL = 7 * 24 * 3600  # 7 days in seconds
+CLASSIFICATION_CACHE_PHASH = True  # also match near-duplicate photos with a perceptual hash
+CLASSIFICATION_CACHE_PHASH_DISTANCE = 4  # max differing bits (out of 64) for a near-duplicate
+CLASSIFICATION_CACHE_PATH = "generated_files/classification_cache.json"  # None to keep the cache in memory only
+
+# --- Prediction store ---
+MODEL_VERSIONS = {  # stored with every prediction so accuracy can be compared across model settings
+    "level": "lstm-level-v1",
+    "ht": "lstm-ht-v1",
+    "trash_type": "densenet201-garbage-v1",  # also part of the classification cache fingerprint
+}
+ACCURACY_EVALUATION_INTERVAL = 3600  # 1 hour in seconds
+
+# --- Recent readings window ---
+RECENT_WINDOW_SIZE = 14  # readings kept per bin in bins_recent (level model needs 14, HT model 7)
+
+# --- Model registry ---
+TYPE_MODEL_PATH = "weights_pth/densenet201_garbage.pth"
+REQUIRED_MODELS = ("level", "ht")  # /ready waits for these; a failed optional model only disables its endpoints
+MODEL_WARMUP_ON_STARTUP = True  # load all models in a background thread at startup instead of on first use
+
+# --- CPU tuning ---
+QUANTIZATION = {  # False, "dynamic" (int8 LSTM/Linear) or "static" (int8 post-training, classifier only)
+    "level": False,
+    "ht": False,
+    "trash_type": False,
+}
+TYPE_CALIBRATION_DIR = "weights_pth/calibration"  # sample images used for static quantisation of the classifier
+
+# --- Route optimisation ---
+DISTANCE_METHOD = "haversine"  # "haversine" (vectorised), "geodesic" (exact ellipsoid, slower) or "road" (local road graph)
+ROUTE_TIME_BUDGET = 2.0  # default solver time budget in seconds
+DISTANCE_CACHE_ENABLED = True  # reuse distances between known bin locations across requests
+DISTANCE_CACHE_DIR = "generated_files"  # memory-mapped matrix + index, one pair of files per distance method
+DISTANCE_CACHE_PRECISION = 6  # decimals of latitude/longitude in cache keys (about 0.1 m)
+DISTANCE_CACHE_MAX_POINTS = 10000  # least recently used points are dropped beyond this (float32 matrix of at most 10000², 400 MB in memory and on disk)
+SELECTION_WEIGHTS = {"fullness": 0.6, "volume": 0.2, "weight": 0.4}  # bin priority value used to pick bins for one truck
+ROUTE_COST_WEIGHT = 0.2  # value lost per DETOUR_SCALE_KM of a bin's estimated detour (0 ignores travel cost)
+DETOUR_SCALE_KM = 2.0  # fixed scale, so one remote bin does not change the penalty of all the others
+KNAPSACK_GRID = 64  # volume/weight capacity steps of the selection knapsack
+KNAPSACK_MAX_CELLS = 20_000_000  # bins x grid cells above which selection falls back to the greedy
+SAVINGS_NEIGHBOURS = 40  # Clarke-Wright savings are only computed between each bin and its nearest neighbours
+ROAD_GRAPH_PATH = "statics/road_graph.npz"  # CSR road graph built from an OSM extract (python -m others.build_road_graph)
+ROAD_DIJKSTRA_CHUNK = 32  # Dijkstra sources per scipy call (memory is chunk x graph nodes)
+ROAD_UNREACHABLE_FACTOR = 1.4  # unreachable pairs use this multiple of the straight-line distance
+INSERTION_REPAIR_BUDGET = 0.05  # seconds of local search after inserting bins into a running route
+ROUTE_JOB_WORKERS = 2  # processes solving /optimize/jobs in the background
+ROUTE_JOB_TTL = 3600  # seconds a finished job and its result are kept
+ROUTE_JOB_SYNC_INTERVAL = 1.0  # seconds between writes of running jobs' progress to MongoDB (read by the other workers)
+CLUSTER_METHOD = "kmeans"  # /optimize mode "cluster" partitioning: "kmeans" (capacity-balanced) or "sweep" (polar angle)
+CLUSTER_MAX_BINS = 400  # bins per partition, keeps every partition's matrix and tour search small
+CLUSTER_CAPACITY_SLACK = 0.1  # extra partitions over total demand / truck capacity, so balancing has room
+CLUSTER_WORKERS = 4  # processes solving partitions in parallel
+CLUSTER_DISPATCH_MARGIN = 0.05  # seconds per wave kept out of the partitions' budget for sending requests and collecting results
+CLUSTER_WARMUP_ON_STARTUP = True  # start the partition workers at API startup instead of on the first cluster request
+ROUTE_CACHE_SIZE = 256  # /optimize responses kept for identical re-sent requests (LRU eviction)
+ROUTE_CACHE_TTL = 300  # seconds a cached /optimize response is served
+ROUTE_CACHE_PRECISION = 6  # decimals of latitude/longitude in the request hash (about 0.1 m)
+
+# --- Report jobs ---
+REPORT_JOB_DIR = "generated_files/reports"  # one PDF per history snapshot, shared by all API workers
+REPORT_JOB_WORKERS = 1  # processes rendering reports (pandas + matplotlib + ReportLab)
+REPORT_JOB_TTL = 24 * 3600  # seconds a finished report and its PDF are kept
+REPORT_JOB_TIMEOUT = 900  # a job queued or running for longer is considered lost and can be restarted
+
+# --- Spatial index ---
+SPATIAL_INDEX_REBUILD_THRESHOLD = 256  # bins added/moved since the last KD-tree rebuild before rebuilding
+NEARBY_DEFAULT_K = 10  # /bins/nearby result count when neither k nor radius is given
+BBOX_MAX_RESULTS = 5000  # cap on /bins/bbox results
@@ -9,7 +9,7 @@ def to_python_type(obj):
         return [to_python_type(v) for v in obj]
     elif isinstance(obj, np.ndarray):
         return obj.tolist()
-    elif isinstance(obj, (np.float32, np.float64, np.float_, np.int32, np.int64, np.integer)):
+    elif isinstance(obj, (np.floating, np.integer)):
         return obj.item()
     else:
         return obj